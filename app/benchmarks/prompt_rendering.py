@@ -0,0 +1,77 @@
+"""
+Microbenchmark of the output response prompt render for every layer type.
+
+Compares the previous build_prompt, which ran str.replace over the whole base prompt once per
+injection, against rendering the base prompt compiled once at layer startup.
+
+Run from the app folder:
+    python -m benchmarks.prompt_rendering
+"""
+
+# DEPENDENCIES
+## Built-In
+from timeit import timeit
+## Local
+from components.layer.injections import InjectionMap, OUTPUT_RESPONSE_MAP, VariableMap
+from components.layer.layer_messages import LayerSubMessage
+from components.layer.layers import BASE_PROMPT_MAPS
+from components.layer.prompt_builder import build_prompt, compile_template, render_template, PromptTemplate
+from constants.layer import LayerKeys, Layers
+from constants.prompts import PromptFilePaths, PromptKeys
+
+
+# CONSTANTS
+ITERATIONS: int = 2000
+
+
+# PREVIOUS IMPLEMENTATION
+def _replace_build_prompt(text_with_variables: str, injection_map: InjectionMap, variable_map: VariableMap) -> str:
+    for injection_variable, injection in injection_map.items():
+        injection_text: str = injection.get_injection(variable_map)
+        sub_injection_map: InjectionMap = getattr(injection, "sub_injection_map", None) or {}
+        if sub_injection_map:
+            injection_text = _replace_build_prompt(injection_text, sub_injection_map, variable_map)
+        text_with_variables = text_with_variables.replace(f"{{{{ {injection_variable} }}}}", injection_text)
+    return text_with_variables
+
+
+# BENCHMARK
+def _get_variable_map(layer_type: str) -> VariableMap:
+    sub_messages: tuple[LayerSubMessage, ...] = tuple(
+        LayerSubMessage(heading=f"heading {index}", content=tuple(f"item {item}" for item in range(8)))
+        for index in range(4)
+    )
+    return {
+        LayerKeys.NAME: layer_type,
+        LayerKeys.TYPE: layer_type,
+        LayerKeys.GUIDANCE: sub_messages,
+        LayerKeys.DATA: sub_messages,
+        LayerKeys.TELEMETRY: frozenset(),
+        PromptKeys.MISSION: "Benchmark mission"
+    }
+
+def main() -> None:
+    with open(PromptFilePaths.LAYER, "r", encoding="utf-8") as base_prompt_file:
+        base_prompt_text: str = base_prompt_file.read()
+    print(f"Output response prompt render time ({ITERATIONS} iterations):")
+    print(f"{'layer type':<20} {'replace (us)':>14} {'compiled (us)':>14} {'speedup':>8}")
+    for layer_type in Layers.get_frozen_values():
+        variable_map: VariableMap = _get_variable_map(layer_type)
+        base_prompt: str = build_prompt(base_prompt_text, BASE_PROMPT_MAPS[layer_type], variable_map)
+        output_template: PromptTemplate = compile_template(base_prompt)
+        if _replace_build_prompt(base_prompt, OUTPUT_RESPONSE_MAP, variable_map) != render_template(output_template, OUTPUT_RESPONSE_MAP, variable_map):
+            raise AssertionError(f"Rendered prompts differ for {layer_type}!")
+        replace_time: float = timeit(
+            lambda: _replace_build_prompt(base_prompt, OUTPUT_RESPONSE_MAP, variable_map),
+            number=ITERATIONS
+        )
+        compiled_time: float = timeit(
+            lambda: render_template(output_template, OUTPUT_RESPONSE_MAP, variable_map),
+            number=ITERATIONS
+        )
+        replace_us: float = replace_time / ITERATIONS * 1_000_000
+        compiled_us: float = compiled_time / ITERATIONS * 1_000_000
+        print(f"{layer_type:<20} {replace_us:>14.1f} {compiled_us:>14.1f} {replace_us / compiled_us:>7.2f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Benchmark of the per-request overhead of the LLM SDK clients, against a local mock OpenAI server.
+
+Compares the previous stream, which built a new OpenAI client for every request, against the
+long-lived pooled client each LLM now owns. The mock answers instantly, so the times are the
+client and connection overhead alone. Requests to real providers also skip the TLS handshake
+when the connection is reused, so the savings there are larger.
+
+Run from the app folder:
+    python -m benchmarks.sdk_clients
+"""
+
+# DEPENDENCIES
+## Built-In
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+from threading import Thread
+from time import perf_counter
+from typing import Callable
+## Third-Party
+from openai import OpenAI
+## Local
+from components.model_provider.llm.llms import LLMDetails, OpenAILLM
+
+
+# CONSTANTS
+REQUESTS: int = 200
+MODEL: str = "mock"
+API_KEY: str = "benchmark"
+CHUNK: dict = {
+    "id": "benchmark",
+    "object": "chat.completion.chunk",
+    "created": 0,
+    "model": MODEL,
+    "choices": [{"index": 0, "delta": {"content": "ok"}, "finish_reason": None}]
+}
+STREAM_BODY: bytes = f"data: {json.dumps(CHUNK)}\n\ndata: [DONE]\n\n".encode("utf-8")
+
+
+# MOCK SERVER
+class _MockOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    connections: int = 0
+
+    def setup(self) -> None:
+        _MockOpenAIHandler.connections += 1
+        super().setup()
+
+    def do_POST(self) -> None:
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Content-Length", str(len(STREAM_BODY)))
+        self.end_headers()
+        self.wfile.write(STREAM_BODY)
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+
+# BENCHMARK
+def _stream_with_new_client(base_url: str) -> str:
+    client = OpenAI(api_key=API_KEY, base_url=base_url)
+    stream = client.chat.completions.create(
+        model=MODEL,
+        messages=[{"role": "system", "content": "benchmark"}],
+        stream=True
+    )
+    return "".join(chunk.choices[0].delta.content or "" for chunk in stream)
+
+def _time_requests(stream: Callable[[], str]) -> tuple[float, int]:
+    connections_before: int = _MockOpenAIHandler.connections
+    start: float = perf_counter()
+    for _ in range(REQUESTS):
+        stream()
+    elapsed: float = perf_counter() - start
+    return elapsed / REQUESTS * 1000, _MockOpenAIHandler.connections - connections_before
+
+def main() -> None:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _MockOpenAIHandler)
+    Thread(target=server.serve_forever, daemon=True).start()
+    base_url: str = f"http://127.0.0.1:{server.server_port}/v1"
+
+    pooled_llm = OpenAILLM(LLMDetails(api_key=API_KEY, model=MODEL))
+    pooled_llm.client = pooled_llm.client.with_options(base_url=base_url)
+    stream_with_pool: Callable[[], str] = lambda: "".join(pooled_llm.stream(system_prompt="benchmark", assistant_begin=""))
+    # Warm both paths up before timing
+    _stream_with_new_client(base_url)
+    stream_with_pool()
+
+    print(f"OpenAI streamed request overhead ({REQUESTS} requests):")
+    print(f"{'client':<20} {'per request (ms)':>18} {'connections':>12}")
+    new_client_ms, new_client_connections = _time_requests(lambda: _stream_with_new_client(base_url))
+    print(f"{'new per request':<20} {new_client_ms:>18.3f} {new_client_connections:>12}")
+    pooled_ms, pooled_connections = _time_requests(stream_with_pool)
+    print(f"{'pooled':<20} {pooled_ms:>18.3f} {pooled_connections:>12}")
+    print(f"Speedup: {new_client_ms / pooled_ms:.2f}x")
+
+    pooled_llm.close()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
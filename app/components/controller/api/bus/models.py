@@ -15,3 +15,7 @@ class BusMessage(BaseModel):
 # RESPONSES
 class BusResponse(BaseModel):
     success: bool
+
+class BusObservation(BaseModel):
+    observed: dict[str, int]
+    last_messages: dict[str, LayerMessage]
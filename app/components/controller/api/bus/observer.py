@@ -0,0 +1,63 @@
+# DEPENDENCIES
+## Third-Party
+from nats.aio.client import Client as NatsClient
+from nats.aio.msg import Msg as NatsMsg
+from nats.aio.subscription import Subscription
+## Local
+from components.layer.codec import decode_layer_message
+from components.layer.layer_messages import LayerMessage
+from constants.queue import QUEUES
+from constants.settings import DebugLevels
+from helpers import debug_print
+
+
+# OBSERVER
+class BusObserver:
+    """
+    Passively watches every layer queue, without consuming from the JetStream streams
+
+    Layers routing directly to each other never go through the controller bus routes,
+    so this is how the controller keeps track of what is moving on the bus
+
+    Attributes:
+        subscriptions (list[Subscription]): The core NATS subscriptions for each queue
+        observed (dict[str, int]): The number of messages observed on each queue
+        last_messages (dict[str, LayerMessage]): The last message observed on each queue
+
+    Methods:
+        start(nats_client: NatsClient) -> None: Start observing every queue
+        stop() -> None: Stop observing
+    """
+    def __init__(self) -> None:
+        self.subscriptions: list[Subscription] = []
+        self.observed: dict[str, int] = {queue: 0 for queue in QUEUES}
+        self.last_messages: dict[str, LayerMessage] = {}
+
+    async def _observe(self, message: NatsMsg) -> None:
+        self.observed[message.subject] = self.observed.get(message.subject, 0) + 1
+        try:
+            layer_message: LayerMessage = decode_layer_message(message.data, message.headers)
+        except ValueError as error:
+            debug_print(f"Observed incorrect message format on {message.subject}!\n{error}", DebugLevels.WARNING)
+            return
+        self.last_messages[message.subject] = layer_message
+        debug_print(f"Observed {layer_message.message_type} on {message.subject}...", DebugLevels.DEBUG)
+
+    async def start(self, nats_client: NatsClient) -> None:
+        print("Starting bus observer...")
+        for queue in QUEUES:
+            subscription: Subscription = await nats_client.subscribe(queue, cb=self._observe)
+            self.subscriptions.append(subscription)
+
+    async def stop(self) -> None:
+        print("Stopping bus observer...")
+        for subscription in self.subscriptions:
+            try:
+                await subscription.unsubscribe()
+            except Exception as error:
+                debug_print(f"Bus observer unsubscribe error: {error}...", DebugLevels.ERROR)
+        self.subscriptions.clear()
+
+
+# SHARED
+bus_observer = BusObserver()
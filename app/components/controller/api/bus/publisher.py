@@ -0,0 +1,156 @@
+# DEPENDENCIES
+## Built-in
+import asyncio
+from asyncio import Queue, Task
+from typing import Optional
+## Third-Party
+from nats.aio.client import Client as NatsClient
+from nats.js.client import JetStreamContext
+## Local
+from components import broker
+from constants.queue import PublisherDefaults
+from constants.settings import DebugLevels
+from helpers import debug_print
+
+
+# TYPES
+PendingPublish = tuple[str, bytes, dict[str, str]]
+"""(queue, message, headers)"""
+
+
+# PUBLISHER
+class BusPublisher:
+    """
+    A long lived JetStream publisher, shared by all of the controller bus routes
+
+    Messages are queued without waiting on NATS, then published in pipelined batches,
+    with the acks for a whole batch being awaited together
+
+    Attributes:
+        nats_client (NatsClient): The shared NATS connection
+        stream (JetStreamContext): The shared JetStream context
+        pending (Queue[PendingPublish]): The messages waiting to be published
+        publish_task (Task): The background task draining the pending messages
+        running (bool): Whether the publisher has been started
+        connected (asyncio.Event): Set while the NATS connection is up
+
+    Methods:
+        start() -> None: Connect to NATS and start publishing in the background
+        stop() -> None: Flush the pending messages and close the connection
+        publish(queue: str, message: bytes, headers: dict[str, str]) -> None: Queue a message to be published
+    """
+    def __init__(self) -> None:
+        self.nats_client: NatsClient
+        self.stream: JetStreamContext
+        self.pending: Queue[PendingPublish]
+        self.publish_task: Task
+        self.running: bool = False
+        self.connected = asyncio.Event()
+
+    # Connection
+    async def _on_disconnected(self) -> None:
+        debug_print("Bus publisher disconnected from NATS...", DebugLevels.WARNING)
+        self.connected.clear()
+
+    async def _on_reconnected(self) -> None:
+        debug_print("Bus publisher reconnected to NATS...", DebugLevels.INFO)
+        self.connected.set()
+
+    async def _connect(self) -> None:
+        self.nats_client, self.stream = await broker.connect(
+            max_reconnect_attempts=-1,
+            disconnected_cb=self._on_disconnected,
+            reconnected_cb=self._on_reconnected
+        )
+        self.connected.set()
+
+    async def _ensure_connected(self) -> None:
+        if self.nats_client.is_closed:
+            debug_print("Bus publisher connection closed, reconnecting...", DebugLevels.WARNING)
+            self.connected.clear()
+            await self._connect()
+            return
+        try:
+            await asyncio.wait_for(self.connected.wait(), timeout=PublisherDefaults.RETRY_WAIT)
+        except asyncio.TimeoutError:
+            pass
+
+    # Publishing
+    def _drain_batch(self, first: PendingPublish) -> list[PendingPublish]:
+        batch: list[PendingPublish] = [first]
+        while len(batch) < PublisherDefaults.MAX_BATCH and not self.pending.empty():
+            batch.append(self.pending.get_nowait())
+        return batch
+
+    async def _publish_batch(self, batch: list[PendingPublish]) -> None:
+        retries: int = 0
+        while batch:
+            results: list[Optional[BaseException]] = await asyncio.gather(
+                *(
+                    broker.publish(stream=self.stream, queue=queue, message=message, headers=headers)
+                    for queue, message, headers in batch
+                ),
+                return_exceptions=True
+            )
+            batch = [pending for pending, result in zip(batch, results) if isinstance(result, BaseException)]
+            if not batch:
+                return
+            retries += 1
+            if retries > PublisherDefaults.MAX_RETRIES:
+                debug_print(f"Dropping {len(batch)} bus messages after {PublisherDefaults.MAX_RETRIES} retries!", DebugLevels.ERROR)
+                return
+            debug_print(f"Failed to publish {len(batch)} bus messages, retrying...", DebugLevels.WARNING)
+            await self._ensure_connected()
+
+    async def _publish_loop(self) -> None:
+        while True:
+            first: PendingPublish = await self.pending.get()
+            batch: list[PendingPublish] = self._drain_batch(first)
+            try:
+                await self._publish_batch(batch)
+            except Exception as error:
+                debug_print(f"Bus publisher error: {error}...", DebugLevels.ERROR)
+            finally:
+                _ = [self.pending.task_done() for _ in batch]
+
+    # Lifecycle
+    async def start(self) -> None:
+        if self.running:
+            return
+        print("Starting bus publisher...")
+        self.pending = Queue(maxsize=PublisherDefaults.MAX_PENDING)
+        await self._connect()
+        self.publish_task = asyncio.create_task(self._publish_loop())
+        self.running = True
+
+    async def stop(self) -> None:
+        if not self.running:
+            return
+        print("Stopping bus publisher...")
+        self.running = False
+        try:
+            await asyncio.wait_for(self.pending.join(), timeout=PublisherDefaults.SHUTDOWN_TIMEOUT)
+        except asyncio.TimeoutError:
+            debug_print(f"Bus publisher stopped with {self.pending.qsize()} unpublished messages!", DebugLevels.WARNING)
+        self.publish_task.cancel()
+        try:
+            await self.nats_client.drain()
+        except Exception as error:
+            debug_print(f"Bus publisher drain error: {error}...", DebugLevels.ERROR)
+
+    async def publish(self, queue: str, message: bytes, headers: dict[str, str]) -> None:
+        """
+        Queue a message to be published, only waiting if the pending queue is full
+
+        Arguments:
+            queue (str): The queue to publish the message to
+            message (bytes): The encoded message to publish
+            headers (dict[str, str]): The NATS headers to publish with the message
+        """
+        if not self.running:
+            raise RuntimeError("Bus publisher has not been started!")
+        await self.pending.put((queue, message, headers))
+
+
+# SHARED
+bus_publisher = BusPublisher()
@@ -7,7 +7,8 @@ from constants.api import APIRoutes
 from constants.queue import BusKeys
 from constants.layer import LayerKeys, LayerCommands 
 from components.layer.layer_messages import LayerSubMessage
-from .models import BusMessage, BusResponse
+from .models import BusMessage, BusObservation, BusResponse
+from .observer import bus_observer
 from .service import bus_down, bus_up
 
 
@@ -28,14 +29,18 @@ router = APIRouter(
 async def down(bus_message: BusMessage) -> BusResponse:
     # VERIFY PAYLOAD HERE
     print(f"Bus Message: {bus_message.model_dump_json()}")
-    bus_down(bus_message)
+    await bus_down(bus_message)
     response = BusResponse(success=True)
     return response
 
 @router.post(f"/{BusKeys.UP}", response_model=BusResponse)
 async def up(bus_message: BusMessage) -> BusResponse:
     # VERIFY PAYLOAD HERE
-    bus_up(bus_message)
+    await bus_up(bus_message)
     response = BusResponse(success=True)
     return response
-    
\ No newline at end of file
+
+@router.get("/observed", response_model=BusObservation)
+async def observed() -> BusObservation:
+    response = BusObservation(observed=bus_observer.observed, last_messages=bus_observer.last_messages)
+    return response
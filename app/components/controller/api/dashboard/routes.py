@@ -24,6 +24,6 @@ router = APIRouter(
 @router.get("/power_on_self_test", response_class=HTMLResponse)
 async def start(request: Request) -> _TemplateResponse:
     context: dict = {"request": request}
-    start_ace()
+    await start_ace()
     return HTML_TEMPLATES.TemplateResponse("components/dashboard/run_button.html", context)
     
\ No newline at end of file
@@ -1,6 +1,7 @@
 # DEPENDENCIES
 ## Built-In
-from typing import Optional
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
 ## Third-Party
 from fastapi import FastAPI, Request, Header
 from fastapi.responses import FileResponse
@@ -10,11 +11,23 @@ from starlette.templating import _TemplateResponse
 ## Local
 from . import ROUTERS
 from constants.api import APIPaths, HTML_TEMPLATES
+from .bus.observer import bus_observer
+from .bus.publisher import bus_publisher
 from .user.service import test_toml
 
 
+# LIFECYCLE
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    await bus_publisher.start()
+    await bus_observer.start(bus_publisher.nats_client)
+    yield
+    await bus_observer.stop()
+    await bus_publisher.stop()
+
+
 # SETUP
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 _ = [app.include_router(router) for router in ROUTERS]
 app.mount("/assets", StaticFiles(directory=f"{APIPaths.UI}/assets"), name="assets")
 
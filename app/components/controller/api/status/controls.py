@@ -10,7 +10,7 @@ from ..bus.models import BusMessage
 
 
 # PRIVATE
-def _power_on_self_test() -> None:
+async def _power_on_self_test() -> None:
     commands_dict: dict[str, Union[str, dict[str, str]]] = {
         LayerKeys.MESSAGE_TYPE: LayerKeys.COMMANDS, 
         LayerKeys.MESSAGES: {
@@ -21,14 +21,14 @@ def _power_on_self_test() -> None:
     commands_message: LayerMessage = LayerMessage.model_validate(commands_dict)
     post_payload = BusMessage(source_queue=Queues.CONTROLLER, layer_message=commands_message)
     try:
-        bus_down(post_payload)
+        await bus_down(post_payload)
     except Exception as error:
         raise error
 
 
 # PUBLIC
-def start_ace() -> None:
+async def start_ace() -> None:
     try:
-        _power_on_self_test()
+        await _power_on_self_test()
     except Exception as error:
         raise error
@@ -0,0 +1,176 @@
+"""
+Wire codecs for sending LayerMessages over the bus.
+
+The codec used for a message is sent in the `constants.queue.BusHeaders.CODEC` NATS header as
+`<codec>/<version>`, so receivers can decode any supported codec, and messages without the header
+are treated as JSON. The deployment codec is set with `wire_codec` in the layer config base information.
+
+MSGPACK v1 layout:
+    [message_type, [[heading, [content, ...]], ...]]
+    Strings found in _INTERNED_V1 are sent as their index in it instead of the full string.
+"""
+
+# DEPENDENCIES
+## Built-In
+import os
+from typing import Any, Optional, Union
+## Third-Party
+import msgpack
+import toml
+## Local
+from constants.generic import GenericKeys, TOMLConfig
+from constants.layer import LayerKeys, LayerPaths, LayerCommands
+from constants.queue import BusHeaders, BusKeys, WireCodecs
+from constants.settings import DebugLevels
+from helpers import debug_print
+from .layer_messages import LayerMessage, LayerSubMessage
+
+
+# CONSTANTS
+DEFAULT_WIRE_CODEC: str = WireCodecs.MSGPACK
+
+_MSGPACK_VERSION: int = 1
+
+_INTERNED_V1: tuple[str, ...] = (
+    GenericKeys.EMPTY,
+    GenericKeys.NONE,
+    # Message Types
+    LayerKeys.COMMANDS,
+    LayerKeys.INTERNAL,
+    LayerKeys.GUIDANCE,
+    LayerKeys.DATA,
+    LayerKeys.TELEMETRY,
+    BusKeys.UP,
+    BusKeys.DOWN,
+    # Headings
+    LayerKeys.ACTIONS,
+    LayerCommands.POST,
+    "reasoning",
+    "refine",
+    "request",
+    "tools",
+    "paramaters",
+    "parameters",
+    "capabilities",
+    "objectives",
+    "self_state",
+    "chosen_task",
+    "instructions",
+    "directives",
+    "logic",
+    "allowable_actions",
+    "success_conditions",
+    "current_task",
+    "task_progress",
+    "workflows",
+    "success_criteria",
+    "resource_limitations",
+    "potential_risks",
+    "potential_mititgations",
+    "strategies",
+    "world_state",
+    "abstract_objectives"
+)
+"""Append only! Changing existing entries requires a new msgpack version"""
+
+_INTERNED_INDEXES_V1: dict[str, int] = {interned: index for index, interned in enumerate(_INTERNED_V1)}
+
+WireHeaders = dict[str, str]
+
+
+# CONFIG
+def get_wire_codec() -> str:
+    """
+    Get the wire codec for this deployment from the layer config
+
+    Returns:
+        str: One of `constants.queue.WireCodecs`, falling back to the default if unset or unknown
+    """
+    if not os.path.isfile(LayerPaths.CONFIG):
+        return DEFAULT_WIRE_CODEC
+    with open(LayerPaths.CONFIG, "r", encoding="utf-8") as config_file:
+        config: TOMLConfig = toml.load(config_file)
+    base_information: dict[str, Any] = config.get(LayerKeys.BASE_INFORMATION, {})
+    wire_codec: str = base_information.get(LayerKeys.WIRE_CODEC, DEFAULT_WIRE_CODEC)
+    if wire_codec not in WireCodecs.get_frozen_values():
+        debug_print(f"Unknown wire codec {wire_codec}! Falling back to {DEFAULT_WIRE_CODEC}...", DebugLevels.WARNING)
+        return DEFAULT_WIRE_CODEC
+    return wire_codec
+
+
+# MSGPACK
+def _intern(text: str) -> Union[int, str]:
+    return _INTERNED_INDEXES_V1.get(text, text)
+
+def _unintern(packed: Union[int, str]) -> str:
+    if isinstance(packed, int):
+        return _INTERNED_V1[packed]
+    if isinstance(packed, str):
+        return packed
+    raise ValueError(f"Invalid packed string: {packed!r}")
+
+def _pack(layer_message: LayerMessage) -> bytes:
+    packed_messages: list[tuple[Union[int, str], tuple[str, ...]]] = [
+        (_intern(sub_message.heading), sub_message.content)
+        for sub_message in layer_message.messages
+    ]
+    return msgpack.packb((_intern(layer_message.message_type), packed_messages), use_bin_type=True)
+
+def _unpack(data: bytes) -> LayerMessage:
+    message_type, packed_messages = msgpack.unpackb(data, raw=False, use_list=False)
+    messages: tuple[LayerSubMessage, ...] = tuple(
+        LayerSubMessage(heading=_unintern(heading), content=content)
+        for heading, content in packed_messages
+    )
+    return LayerMessage(message_type=_unintern(message_type), messages=messages)
+
+
+# INTERFACE
+def encode_layer_message(layer_message: LayerMessage, wire_codec: str = DEFAULT_WIRE_CODEC) -> tuple[bytes, WireHeaders]:
+    """
+    Encode a LayerMessage to be sent over the bus
+
+    Arguments:
+        layer_message (LayerMessage): The message to encode
+        wire_codec (str): One of `constants.queue.WireCodecs`
+
+    Returns:
+        tuple[bytes, WireHeaders]: The encoded message and the NATS headers to send with it
+    """
+    match wire_codec:
+        case WireCodecs.MSGPACK:
+            headers: WireHeaders = {BusHeaders.CODEC: f"{WireCodecs.MSGPACK}/{_MSGPACK_VERSION}"}
+            return _pack(layer_message), headers
+        case WireCodecs.JSON:
+            return layer_message.model_dump_json().encode(), {BusHeaders.CODEC: WireCodecs.JSON}
+        case _:
+            raise NotImplementedError(f"{wire_codec} is not implemented...")
+
+def decode_layer_message(data: bytes, headers: Optional[WireHeaders]) -> LayerMessage:
+    """
+    Decode a LayerMessage received from the bus, using the codec from its headers
+
+    Arguments:
+        data (bytes): The encoded message
+        headers (Optional[WireHeaders]): The NATS headers received with the message
+
+    Returns:
+        LayerMessage: The decoded message
+
+    Raises:
+        ValueError: If the message or its codec is invalid
+    """
+    codec_header: str = (headers or {}).get(BusHeaders.CODEC, WireCodecs.JSON)
+    wire_codec, _, version = codec_header.partition("/")
+    match wire_codec:
+        case WireCodecs.MSGPACK:
+            if version != str(_MSGPACK_VERSION):
+                raise ValueError(f"Unsupported {WireCodecs.MSGPACK} version: {version}")
+            try:
+                return _unpack(data)
+            except (ValueError, TypeError, IndexError, msgpack.UnpackException) as error:
+                raise ValueError(f"Invalid {WireCodecs.MSGPACK} message: {error}") from error
+        case WireCodecs.JSON:
+            return LayerMessage.model_validate_json(data)
+        case _:
+            raise ValueError(f"Unsupported wire codec: {codec_header}")
@@ -14,17 +14,21 @@ from watchdog.events import FileSystemEvent, FileSystemEventHandler
 from components import broker
 from constants.containers import VolumePaths
 from constants.generic import GenericKeys, TOMLConfig
-from constants.layer import LayerKeys, LayerPaths
+from constants.layer import EvictionPolicies, LayerDefaults, LayerKeys, LayerPaths
+from constants.queue import ConsumerDefaults, ConsumerKeys, RoutingModes
 from constants.settings import DebugLevels
 from exceptions.error_handling import exit_on_error
 from helpers import debug_print
+from .codec import get_wire_codec
 from .layers import layer_factory, Layer
+from .message_store import MessageStoreOptions
 
 
 # CONSTANTS
 BASE_CONFIG: TOMLConfig = {
     LayerKeys.BASE_INFORMATION: {
-        LayerKeys.CURRENT_ACE: GenericKeys.NONE
+        LayerKeys.CURRENT_ACE: GenericKeys.NONE,
+        LayerKeys.ROUTING_MODE: RoutingModes.CONTROLLER
     }
 }
 
@@ -36,6 +40,52 @@ def _set_current_ace(new_ace: str) -> None:
     with open(LayerPaths.CONFIG, "w", encoding="utf-8") as config_file:
         toml.dump(config, config_file)
 
+def _get_base_information() -> dict[str, Any]:
+    with open(LayerPaths.CONFIG, "r", encoding="utf-8") as config_file:
+        config: TOMLConfig = toml.load(config_file)
+    return config.get(LayerKeys.BASE_INFORMATION, {})
+
+def _get_routing_mode() -> str:
+    base_information: dict[str, Any] = _get_base_information()
+    routing_mode: str = base_information.get(LayerKeys.ROUTING_MODE, RoutingModes.CONTROLLER)
+    if routing_mode not in RoutingModes.get_frozen_values():
+        debug_print(f"Unknown routing mode {routing_mode}! Falling back to {RoutingModes.CONTROLLER}...", DebugLevels.WARNING)
+        return RoutingModes.CONTROLLER
+    return routing_mode
+
+def _get_consumer_options(queue: str) -> tuple[int, int]:
+    consumers: dict[str, dict[str, int]] = _get_base_information().get(ConsumerKeys.CONSUMERS, {})
+    consumer: dict[str, int] = consumers.get(queue, {})
+    batch_size: int = consumer.get(ConsumerKeys.BATCH_SIZE, ConsumerDefaults.BATCH_SIZE)
+    max_in_flight: int = consumer.get(ConsumerKeys.MAX_IN_FLIGHT, ConsumerDefaults.MAX_IN_FLIGHT)
+    return max(1, batch_size), max(1, max_in_flight)
+
+def _get_coalescing_options(queue: str) -> tuple[int, int]:
+    coalescing: dict[str, dict[str, int]] = _get_base_information().get(LayerKeys.COALESCING, {})
+    layer_coalescing: dict[str, int] = coalescing.get(queue, {})
+    window_ms: int = layer_coalescing.get(LayerKeys.WINDOW_MS, LayerDefaults.COALESCE_WINDOW)
+    max_messages: int = layer_coalescing.get(LayerKeys.MAX_MESSAGES, LayerDefaults.COALESCE_MAX_MESSAGES)
+    return max(0, window_ms), max(1, max_messages)
+
+def _get_message_store_options(queue: str) -> MessageStoreOptions:
+    message_stores: dict[str, dict[str, Any]] = _get_base_information().get(LayerKeys.MESSAGE_STORE, {})
+    message_store: dict[str, Any] = message_stores.get(queue, {})
+    eviction_policy: str = message_store.get(LayerKeys.EVICTION_POLICY, EvictionPolicies.OLDEST)
+    if eviction_policy not in EvictionPolicies.get_frozen_values():
+        debug_print(f"Unknown eviction policy {eviction_policy}! Falling back to {EvictionPolicies.OLDEST}...", DebugLevels.WARNING)
+        eviction_policy = EvictionPolicies.OLDEST
+    return MessageStoreOptions(
+        max_heading_items=max(1, message_store.get(LayerKeys.MAX_HEADING_ITEMS, LayerDefaults.MAX_HEADING_ITEMS)),
+        max_items=max(1, message_store.get(LayerKeys.MAX_ITEMS, LayerDefaults.MAX_ITEMS)),
+        eviction_policy=eviction_policy,
+        heading_priorities=message_store.get(LayerKeys.HEADING_PRIORITIES, {})
+    )
+
+def _get_speculative_samples(queue: str) -> int:
+    speculation: dict[str, dict[str, int]] = _get_base_information().get(LayerKeys.SPECULATION, {})
+    samples: int = speculation.get(queue, {}).get(LayerKeys.SAMPLES, LayerDefaults.SPECULATIVE_SAMPLES)
+    return max(1, samples)
+
 def _setup() -> None:
     if os.path.isfile(LayerPaths.CONFIG):
         with open(LayerPaths.CONFIG, "r", encoding="utf-8") as config_file:
@@ -57,8 +107,15 @@ class LayerBroker:
         self.nats_client: NatsClient
         self.stream: JetStreamContext
         self.queue = queue
+        self.layer: Layer
         self.broker_task: Task
         self.running: bool = False
+
+    async def _reconnect(self) -> JetStreamContext:
+        print(f"Reconnecting broker for {self.queue}...")
+        self.nats_client, self.stream = await broker.connect()
+        self.layer.stream = self.stream
+        return self.stream
     
     async def run_broker(self, layer_name: str) -> None:
         print(f"Layer: {layer_name}")
@@ -69,11 +126,32 @@ class LayerBroker:
             return
 
         self.nats_client, self.stream = await broker.connect()
-        print(f"Starting Broker for {layer_name} on {self.queue}...")
-        layer: Layer = layer_factory(name=layer_name, layer_type=self.queue)
+        routing_mode: str = _get_routing_mode()
+        coalesce_window, coalesce_max_messages = _get_coalescing_options(self.queue)
+        print(f"Starting Broker for {layer_name} on {self.queue} with {routing_mode} routing...")
+        self.layer = layer_factory(
+            name=layer_name,
+            layer_type=self.queue,
+            routing_mode=routing_mode,
+            wire_codec=get_wire_codec(),
+            stream=self.stream,
+            coalesce_window=coalesce_window,
+            coalesce_max_messages=coalesce_max_messages,
+            message_store_options=_get_message_store_options(self.queue),
+            speculative_samples=_get_speculative_samples(self.queue)
+        )
+        self.layer.start_worker()
+        batch_size, max_in_flight = _get_consumer_options(self.queue)
         try:
             self.broker_task: Task = asyncio.ensure_future(
-                broker.subscribe(stream=self.stream, handler=layer.get_message_from_bus, queue=self.queue)
+                broker.subscribe(
+                    stream=self.stream,
+                    handler=self.layer.get_message_from_bus,
+                    queue=self.queue,
+                    batch_size=batch_size,
+                    max_in_flight=max_in_flight,
+                    reconnect=self._reconnect
+                )
             )
             self.running = True
             await self.broker_task
@@ -88,6 +166,7 @@ class LayerBroker:
         print(f"Stopping broker for {self.queue}...")
         self.running = False
         try:
+            self.layer.stop_worker()
             await self.nats_client.drain()
             self.broker_task.cancel()
         except Exception as error:
@@ -1,2 +1,3 @@
+from .file_cache import prompt_file_cache, PromptFileCacheStats
 from .maps import BASE_PROMPT_MAP, ASPIRATIONAL_PROMPT_MAP, OUTPUT_RESPONSE_MAP
-from .types import InjectionMap, VariableMap
\ No newline at end of file
+from .types import Injection, InjectionMap, VariableMap
\ No newline at end of file
@@ -0,0 +1,84 @@
+# DEPENDENCIES
+## Built-In
+import os
+from typing import final, Optional
+## Third-Party
+from pydantic import BaseModel
+## Local
+from constants.settings import DebugLevels
+from helpers import debug_print
+
+
+# TYPES
+FileSignature = tuple[int, int, int]
+"""(inode, modified time in nanoseconds, size)"""
+
+class PromptFileCacheStats(BaseModel):
+    """
+    Attributes:
+        files (int): The prompt files held
+        hits (int): The reads served from the cache
+        misses (int): The reads that had to load the file from disk
+    """
+    files: int
+    hits: int
+    misses: int
+
+
+# CACHE
+@final
+class PromptFileCache:
+    """
+    A shared cache of prompt files, keyed by path
+
+    Files are re-read when their inode, modified time or size change, so prompts can still be edited live
+
+    Attributes:
+        files (dict[str, tuple[FileSignature, str]]): The signature and text of each cached file
+        hits (int): The number of reads served from the cache
+        misses (int): The number of reads that had to load the file from disk
+
+    Methods:
+        read(file_path: str) -> str: Get the text of a file, loading it from disk only if it changed
+        clear() -> None: Empty the cache and reset the counters
+        get_stats() -> PromptFileCacheStats: The file, hit and miss counts
+    """
+    def __init__(self) -> None:
+        self.files: dict[str, tuple[FileSignature, str]] = {}
+        self.hits: int = 0
+        self.misses: int = 0
+
+    def read(self, file_path: str) -> str:
+        """
+        Get the text of a file, loading it from disk only if it changed since it was cached
+
+        Arguments:
+            file_path (str): The path of the file to read
+
+        Returns:
+            str: The text of the file
+        """
+        file_stat: os.stat_result = os.stat(file_path)
+        signature: FileSignature = (file_stat.st_ino, file_stat.st_mtime_ns, file_stat.st_size)
+        cached: Optional[tuple[FileSignature, str]] = self.files.get(file_path)
+        if cached and cached[0] == signature:
+            self.hits += 1
+            return cached[1]
+        self.misses += 1
+        debug_print(f"Loading prompt file {file_path} ({self.hits} hits, {self.misses} misses)...", DebugLevels.DEBUG)
+        with open(file_path, "r", encoding="utf-8") as file:
+            text: str = file.read()
+        self.files[file_path] = (signature, text)
+        return text
+
+    def clear(self) -> None:
+        self.files.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def get_stats(self) -> PromptFileCacheStats:
+        return PromptFileCacheStats(files=len(self.files), hits=self.hits, misses=self.misses)
+
+
+# SHARED
+prompt_file_cache = PromptFileCache()
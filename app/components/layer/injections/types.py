@@ -5,8 +5,7 @@ from dataclasses import dataclass
 from typing import Any, Callable, final, Optional, Union
 ## Local
 from constants.generic import GenericKeys
-from constants.settings import DebugLevels
-from helpers import debug_print
+from .file_cache import prompt_file_cache
 from .inputs import build_text_from_sub_layer_messages
 
 
@@ -53,8 +52,7 @@ class FileInjection(BaseFileInjection):
     load_file_path: str
 
     def load_file(self, variable_map: VariableMap) -> str:
-        with open(self.load_file_path, "r", encoding="utf-8") as file:
-            return file.read()
+        return prompt_file_cache.read(self.load_file_path)
 
     def get_injection(self, variable_map: VariableMap) -> str:
         return self.load_file(variable_map)
@@ -66,15 +64,13 @@ class ParamateriseFileInjection(BaseFileInjection):
     load_file_variable_name: str
 
     def load_file(self, variable_map: VariableMap) -> str:
-        debug_print("Loading paramaterised file...", DebugLevels.INFO)
         if not variable_map:
             raise AttributeError("No variable_map found! Assign it first using assign_variable_map before calling load_file from a ParamateriseFileInjection!")
         file_name: Any = variable_map.get(self.load_file_variable_name, GenericKeys.EMPTY)
         if not isinstance(file_name, str):
             raise ValueError(f"Variable injection {self.replace_variable_name} is not a string!")
         load_file_path: str = f"{self.load_file_folder}/{file_name}"
-        with open(load_file_path, "r", encoding="utf-8") as file:
-            return file.read()
+        return prompt_file_cache.read(load_file_path)
     
     def get_injection(self, variable_map: VariableMap) -> str:
         self.variable_map: VariableMap = variable_map
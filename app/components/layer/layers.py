@@ -5,65 +5,52 @@ The Layer class encapsulates attributes and methods for managing layer-specific
 and communication with other components via a message bus. Subclasses can override certain methods
 to customize behavior for specific layer types.
 
-The module also includes helper functions for merging messages, sending requests to other components,
+The module also includes helper functions for sending requests to other components,
 and instantiating Layer objects using a factory function.
 """
 
 # DEPENDENCIES
 ## Built-In
 import asyncio
-from threading import Thread
-from typing import Any, final, Optional, Union
+from asyncio import Queue, Task
+import random
+from contextlib import aclosing
+from typing import Any, AsyncIterator, final, Optional
 ## Third-Party
 from nats.aio.msg import Msg as NatsMsg
-from pydantic import ValidationError
+from nats.js.client import JetStreamContext
 import toml
 ## Local
 from constants.containers import ComponentPorts
 from constants.generic import GenericKeys
 from constants.layer import (
-    LayerKeys, Layers, LayerCommands, LayerPaths
+    LayerKeys, Layers, LayerCommands, LayerDefaults, LayerPaths,
+    PROMPT_VARIABLES
 )
-from constants.model_provider import LLMStackTypes
+from constants.model_provider import LLMStackTypes, ModelProviderHeaders, ResponseFormats
 from constants.prompts import PromptFilePaths
-from constants.queue import BusKeys
+from constants.queue import BusKeys, RoutingModes
 from constants.settings import DebugLevels
+from components import broker
 from components.controller.api.bus.models import BusMessage, BusResponse
-from components.model_provider import ModelPrompt, ModelResponse
-from helpers import debug_print, get_api, post_api
+from components.model_provider import ModelPrompt
+from helpers import debug_print, post_api, stream_api
+from .codec import decode_layer_message, encode_layer_message, DEFAULT_WIRE_CODEC
 from .injections import InjectionMap, BASE_PROMPT_MAP, ASPIRATIONAL_PROMPT_MAP, OUTPUT_RESPONSE_MAP
 from .layer_messages import LayerMessage, LayerMessageLoader, LayerSubMessage
+from .message_store import MessageStore, MessageStoreOptions
 from .presets import LayerPreset, LAYER_PRESET_MAP
-from .prompt_builder import build_prompt, VariableMap
+from .prompt_builder import build_prompt, compile_template, render_template, PromptTemplate, VariableMap
+from .response_validation import get_response_json_schema, get_response_schema, ResponseSchema, StreamingResponseValidator
+from .token_budget import TokenBudget
 
 
 # CONSTANTS
 _ASSISTANT_BEGIN: str = '```toml\n[internal]\nreasoning = """'
 """Must match the start of the response schemas"""
 
-
-# PARSING
-def _merge_messages(new_messages: tuple[LayerSubMessage, ...], old_messages: tuple[LayerSubMessage, ...]) -> tuple[LayerSubMessage, ...]:
-    debug_print("Merging Messages...", DebugLevels.INFO)
-    merged_messages: list[LayerSubMessage] = []
-    old_headings: tuple[str, ...] = tuple([old_message.heading for old_message in old_messages])
-    matched_headings: list[str] = []
-    for new_message in new_messages:
-        if new_message.heading in old_headings:
-            matched_headings.append(new_message.heading)
-            index: int = old_headings.index(new_message.heading)
-            original_content: tuple[str, ...] = old_messages[index].content
-            merged_messages.append(LayerSubMessage(
-                heading=new_message.heading,
-                content=(*original_content, *new_message.content),
-            ))
-            continue
-        merged_messages.append(new_message)
-    for index, old_heading in enumerate(old_headings):
-        if old_heading in matched_headings:
-            continue
-        merged_messages.append(old_messages[index])
-    return tuple(merged_messages)
+_SPECULATIVE_TEMPERATURES: tuple[float, ...] = (0.4, 0.7, 0.9, 1.1)
+"""Sampling temperatures for the extra speculative samples, the first sample uses the configured temperature"""
 
 
 # COMMUNICATION
@@ -73,11 +60,42 @@ async def _try_send(direction: str, source_queue: str, layer_message: LayerMessa
     response_validated = BusResponse.model_validate_json(response)
     return response_validated
 
-async def _model_response(system_prompt: str) -> ModelResponse:
-    model_request = ModelPrompt(stack_type=LLMStackTypes.GENERALIST, system_prompt=system_prompt, assistant_begin=_ASSISTANT_BEGIN)
-    response: str = await get_api(api_port=ComponentPorts.MODEL_PROVIDER, endpoint="generate", payload=model_request)
-    response_validated = ModelResponse.model_validate_json(response)
-    return response_validated
+async def _try_publish(
+    stream: JetStreamContext,
+    direction: str,
+    source_queue: str,
+    layer_message: LayerMessage,
+    wire_codec: str
+) -> None:
+    queue: str = broker.get_bus_queue(bus_direction=direction, source_queue=source_queue)
+    if not queue:
+        print(f"Queue {source_queue} cannot send {direction}!")
+        return
+    message, headers = encode_layer_message(layer_message, wire_codec)
+    await broker.publish(stream=stream, queue=queue, message=message, headers=headers)
+
+def _stream_model_response(
+    system_prompt: str,
+    assistant_begin: str,
+    temperature: Optional[float] = None,
+    seed: Optional[int] = None,
+    response_schema: Optional[dict[str, Any]] = None,
+    response_headers: Optional[dict[str, str]] = None
+) -> AsyncIterator[str]:
+    model_request = ModelPrompt(
+        stack_type=LLMStackTypes.GENERALIST,
+        system_prompt=system_prompt,
+        assistant_begin=assistant_begin,
+        temperature=temperature,
+        seed=seed,
+        response_schema=response_schema
+    )
+    return stream_api(
+        api_port=ComponentPorts.MODEL_PROVIDER,
+        endpoint="generate/stream",
+        payload=model_request,
+        response_headers=response_headers
+    )
 
 
 # BASE LAYER
@@ -96,8 +114,9 @@ class Layer:
         name (str): The name of the layer
         layer_type (str): The type of the layer
         base_prompt (str): The base system prompt for this layer
-        guidance (tuple[LayerSubMessage]): The guidance for this layer
-        data (tuple[LayerSubMessage]): The data for this layer
+        output_template (PromptTemplate): The base prompt compiled once, ready to render the output response prompt
+        guidance (tuple[LayerSubMessage]): The guidance for the current processing run
+        data (tuple[LayerSubMessage]): The data for the current processing run
         telemetry (frozenset[str]): The telemetry inputs this layer has access to
         first_run (bool): Whether this layer has been run for the first time
         processing (bool): Whether this layer is currently processing
@@ -105,11 +124,25 @@ class Layer:
         default_guidance (tuple[LayerSubMessage]): The default guidance for this layer
         has_data (bool): Whether this layer has data
         default_data (tuple[LayerSubMessage]): The default data for this layer
+        routing_mode (str): Whether to send messages through the controller or directly onto the next queue
+        wire_codec (str): The codec used to encode messages published directly onto the bus
+        stream (Optional[JetStreamContext]): The broker stream used for direct routing
+        inbox (Queue[LayerMessage]): The bounded queue of bus messages waiting for the worker
+        worker (Optional[Task]): The single task processing the inbox on the broker event loop
+        coalesce_window (int): Milliseconds to keep merging incoming messages before processing them in one run
+        coalesce_max_messages (int): The number of merged messages that triggers processing before the window closes
+        guidance_store (MessageStore): The bounded guidance received since the last processing run
+        data_store (MessageStore): The bounded data received since the last processing run
+        token_budget (TokenBudget): Keeps the output response prompt under the prompt token limit
+        speculative_samples (int): The number of generations raced against each other on the first attempt, 1 disables speculation
+        prompt_variables (tuple[str, ...]): The attributes available to prompts as variables
     """
+    prompt_variables: tuple[str, ...] = PROMPT_VARIABLES
     __slots__: list[str] = [
         LayerKeys.NAME,
         LayerKeys.TYPE,
         LayerKeys.BASE_PROMPT,
+        LayerKeys.OUTPUT_TEMPLATE,
         LayerKeys.GUIDANCE,
         LayerKeys.DATA,
         LayerKeys.TELEMETRY,
@@ -118,10 +151,33 @@ class Layer:
         LayerKeys.MAX_RETRIES,
         LayerKeys.DEFAULT_GUIDANCE,
         LayerKeys.HAS_DATA,
-        LayerKeys.DEFAULT_DATA
+        LayerKeys.DEFAULT_DATA,
+        LayerKeys.ROUTING_MODE,
+        LayerKeys.WIRE_CODEC,
+        LayerKeys.STREAM,
+        LayerKeys.INBOX,
+        LayerKeys.WORKER,
+        LayerKeys.COALESCE_WINDOW,
+        LayerKeys.COALESCE_MAX_MESSAGES,
+        LayerKeys.GUIDANCE_STORE,
+        LayerKeys.DATA_STORE,
+        LayerKeys.TOKEN_BUDGET,
+        LayerKeys.SPECULATIVE_SAMPLES
     ]
     @final
-    def __init__(self, name: str, layer_type: str, preset: LayerPreset) -> None:
+    def __init__(
+        self,
+        name: str,
+        layer_type: str,
+        preset: LayerPreset,
+        routing_mode: str = RoutingModes.CONTROLLER,
+        wire_codec: str = DEFAULT_WIRE_CODEC,
+        stream: Optional[JetStreamContext] = None,
+        coalesce_window: int = LayerDefaults.COALESCE_WINDOW,
+        coalesce_max_messages: int = LayerDefaults.COALESCE_MAX_MESSAGES,
+        message_store_options: Optional[MessageStoreOptions] = None,
+        speculative_samples: int = LayerDefaults.SPECULATIVE_SAMPLES
+    ) -> None:
         self.name: str = name
         self.layer_type: str = layer_type
         self.guidance: tuple[LayerSubMessage, ...] = ()
@@ -133,13 +189,44 @@ class Layer:
         self.default_guidance: tuple[LayerSubMessage, ...] = ()
         self.has_data: bool = True
         self.default_data: tuple[LayerSubMessage, ...] = ()
+        self.routing_mode: str = routing_mode
+        self.wire_codec: str = wire_codec
+        self.stream: Optional[JetStreamContext] = stream
+        self.inbox: Queue[LayerMessage] = Queue(maxsize=LayerDefaults.INBOX_SIZE)
+        self.worker: Optional[Task] = None
+        self.coalesce_window: int = coalesce_window
+        self.coalesce_max_messages: int = coalesce_max_messages
+        self.guidance_store: MessageStore = MessageStore(message_store_options)
+        self.data_store: MessageStore = MessageStore(message_store_options)
+        self.token_budget: TokenBudget = TokenBudget()
+        self.speculative_samples: int = speculative_samples
         self._custom_init()
         self.base_prompt: str = ""
+        self.output_template: PromptTemplate = ()
         self.base_prompt = self._build_base_prompt()
+        self.output_template = compile_template(self.base_prompt)
     
     def _custom_init(self) -> None:
         pass
     
+    # Communication
+    @final
+    async def _send(self, direction: str, layer_message: LayerMessage) -> None:
+        if self.routing_mode == RoutingModes.DIRECT and self.stream:
+            await _try_publish(
+                stream=self.stream,
+                direction=direction,
+                source_queue=self.layer_type,
+                layer_message=layer_message,
+                wire_codec=self.wire_codec
+            )
+            return
+        await _try_send(
+            direction=direction,
+            source_queue=self.layer_type,
+            layer_message=layer_message
+        )
+
     # Layer Controls
     @final
     async def _process_controller_message(self, layer_message: LayerMessage) -> None:
@@ -147,18 +234,14 @@ class Layer:
         for action in actions:
             match action:
                 case LayerCommands.POST:
-                    await _try_send(
-                        direction=BusKeys.DOWN,
-                        source_queue=self.layer_type,
-                        layer_message=layer_message,
-                    )
+                    await self._send(direction=BusKeys.DOWN, layer_message=layer_message)
                 case _:
                     print(f"{action} Does not match any known layer actions!")
 
     # System Prompt
     @final
     def _get_variable_map(self) -> VariableMap:
-        return {slot: getattr(self, slot) for slot in self.__slots__}
+        return {variable: getattr(self, variable) for variable in self.prompt_variables}
 
     @final
     def _build_base_prompt(self) -> str:
@@ -174,44 +257,127 @@ class Layer:
 
     # Layer Messages
     @final
-    def _process_layer_message(self) -> None:
+    async def _sample_output(
+        self,
+        system_prompt: str,
+        assistant_begin: str,
+        response_schema: ResponseSchema,
+        temperature: Optional[float] = None,
+        seed: Optional[int] = None
+    ) -> StreamingResponseValidator:
+        """Constrained generations are validated once complete, everything else is validated as it streams in"""
+        validator = StreamingResponseValidator(response_schema)
+        validator.feed(assistant_begin)
+        response_headers: dict[str, str] = {}
+        json_chunks: list[str] = []
+        try:
+            async with aclosing(_stream_model_response(
+                system_prompt,
+                assistant_begin,
+                temperature,
+                seed,
+                response_schema=get_response_json_schema(self.layer_type),
+                response_headers=response_headers
+            )) as chunks:
+                async for chunk in chunks:
+                    if response_headers.get(ModelProviderHeaders.RESPONSE_FORMAT) == ResponseFormats.JSON:
+                        json_chunks.append(chunk)
+                        continue
+                    if not validator.feed(chunk) or validator.finished:
+                        break
+        except Exception as error:
+            validator.error = f"Error streaming llm response: {error}"
+            return validator
+        if json_chunks:
+            validator.validate_json("".join(json_chunks))
+            return validator
+        validator.finish()
+        return validator
+
+    @final
+    async def _speculate_output(self, system_prompt: str, response_schema: ResponseSchema) -> StreamingResponseValidator:
+        """
+        Races speculative_samples generations with varied temperatures and seeds, cancelling the rest once one is valid
+
+        Returns:
+            StreamingResponseValidator: The first valid sample, or the sample with the longest valid prefix if none are valid
+        """
+        samples: list[Task[StreamingResponseValidator]] = [
+            asyncio.create_task(self._sample_output(
+                system_prompt,
+                _ASSISTANT_BEGIN,
+                response_schema,
+                temperature=_SPECULATIVE_TEMPERATURES[(index - 1) % len(_SPECULATIVE_TEMPERATURES)] if index else None,
+                seed=random.randrange(2**31)
+            ))
+            for index in range(self.speculative_samples)
+        ]
+        best: Optional[StreamingResponseValidator] = None
+        try:
+            for sample in asyncio.as_completed(samples):
+                validator: StreamingResponseValidator = await sample
+                if not validator.error:
+                    return validator
+                if best is None or validator.valid_end > best.valid_end:
+                    best = validator
+        finally:
+            _ = [sample.cancel() for sample in samples if not sample.done()]
+        return best
+
+    @final
+    async def _generate_output(self, system_prompt: str) -> Optional[dict[str, Any]]:
+        """
+        Streams the model response, validating it against the response schema as it arrives.
+        Invalid generations are aborted straight away and retried from the last valid statement.
+        The first attempt is speculative when speculative_samples is above 1.
+
+        Returns:
+            Optional[dict[str, Any]]: The validated response, or None if every retry failed
+        """
+        response_schema: ResponseSchema = get_response_schema(self.layer_type)
+        assistant_begin: str = _ASSISTANT_BEGIN
+        for retry in range(1, self.max_retries + 1):
+            validator: StreamingResponseValidator
+            if retry == 1 and self.speculative_samples > 1:
+                validator = await self._speculate_output(system_prompt, response_schema)
+            else:
+                validator = await self._sample_output(system_prompt, assistant_begin, response_schema)
+            if not validator.error:
+                return validator.parse()
+            debug_print(f"Invalid llm response from {self.layer_type}: {validator.error}", DebugLevels.WARNING)
+            valid_prefix: str = validator.valid_prefix()
+            if len(valid_prefix) > len(_ASSISTANT_BEGIN):
+                assistant_begin = valid_prefix
+            print(f"Retries: {retry}")
+        return None
+
+    @final
+    async def _process_layer_message(self) -> None:
         print(f"Checking if should process {self.layer_type}...")
-        if self.processing:
-            print(f"{self.layer_type} still processing...")
-            return
-        has_enough_data: bool = self.guidance != self.default_guidance and self.data != self.default_data
+        has_enough_data: bool = bool(self.guidance_store) and bool(self.data_store)
         if not self.has_data:
-            has_enough_data = self.guidance != self.default_guidance
+            has_enough_data = bool(self.guidance_store)
         if has_enough_data or self.first_run:
             self.first_run = False
             print(f"Processing {self.layer_type}...")
             self.processing = True
-            output_response_prompt: str = build_prompt(
-                text_with_variables=self.base_prompt,
+            self.guidance = self.guidance_store.snapshot() or self.default_guidance
+            self.data = self.data_store.snapshot() or self.default_data
+            output_response_prompt: str = render_template(
+                template=self.output_template,
                 injection_map=OUTPUT_RESPONSE_MAP,
-                variable_map=self._get_variable_map()
+                variable_map=self._get_variable_map(),
+                token_budget=self.token_budget
             )
+            self.guidance_store.clear()
+            self.data_store.clear()
             self.guidance = self.default_guidance
             self.data = self.default_data
             debug_print(f"Output Response Prompt for {self.layer_type}: {output_response_prompt}", DebugLevels.INFO)
-            is_output_valid: bool = False
-            formatted_response: dict[str, dict[str, Union[str, list[str]]]] = {}
+            debug_print(f"Output Response Prompt for {self.layer_type} is ~{self.token_budget.last_report.total_tokens} tokens", DebugLevels.INFO)
             print("Getting output from model...")
-            retries: int = 0
-            while not is_output_valid and retries < self.max_retries:
-                response: ModelResponse = asyncio.run(_model_response(system_prompt=output_response_prompt))
-                response_text: str = response.response
-                if response_text.startswith("```toml"):
-                    response_text = response_text.replace("```toml", "")
-                try:
-                    formatted_response = toml.loads(response_text)
-                    is_output_valid = True
-                except Exception as error:
-                    debug_print(f"Error formatting llm response from {self.layer_type}: {error}", DebugLevels.WARNING)
-                finally:
-                    retries += 1
-                print(f"Retries: {retries}")
-            if not is_output_valid:
+            formatted_response: Optional[dict[str, Any]] = await self._generate_output(output_response_prompt)
+            if formatted_response is None:
                 print(f"Failed to get output from {self.layer_type} after {self.max_retries} retries!")
                 self.processing = False
                 return
@@ -221,46 +387,108 @@ class Layer:
             layer_message_loader = LayerMessageLoader(formatted_response)
             southbound: Optional[LayerMessage] = layer_message_loader.guidance
             if southbound:
-                asyncio.run(_try_send(
-                    direction=BusKeys.DOWN,
-                    source_queue=self.layer_type,
-                    layer_message=southbound
-                ))
+                await self._send(direction=BusKeys.DOWN, layer_message=southbound)
             northbound: Optional[LayerMessage] = layer_message_loader.data
             if northbound:
-                asyncio.run(_try_send(
-                    direction=BusKeys.UP,
-                    source_queue=self.layer_type,
-                    layer_message=northbound
-                ))
+                await self._send(direction=BusKeys.UP, layer_message=northbound)
             self.processing = False
             return
         print(f"{self.layer_type} waiting to have enough guidance and data to process...")
 
     # Queue Processing
+    @final
+    async def _merge_inbox_message(self, layer_message: LayerMessage) -> bool:
+        """Returns whether the message should trigger processing"""
+        try:
+            if layer_message.message_type == LayerKeys.COMMANDS:
+                await self._process_controller_message(layer_message)
+                return False
+            match layer_message.message_type:
+                case LayerKeys.GUIDANCE | BusKeys.DOWN:
+                    self.guidance_store.merge(layer_message.messages)
+                case LayerKeys.DATA | BusKeys.UP:
+                    self.data_store.merge(layer_message.messages)
+            return True
+        except Exception as error:
+            debug_print(f"Error merging {layer_message.message_type} in {self.layer_type}: {error}", DebugLevels.ERROR)
+            return False
+        finally:
+            self.inbox.task_done()
+
+    @final
+    async def _coalesce_inbox(self) -> bool:
+        """
+        Waits for a message, then keeps merging messages until the coalescing window closes,
+        the inbox is empty past the window, or coalesce_max_messages have been merged.
+        Messages that arrived during the last run are already waiting, so they are merged straight away.
+
+        Returns:
+            bool: Whether any merged message should trigger processing
+        """
+        should_process: bool = await self._merge_inbox_message(await self.inbox.get())
+        collected: int = 1
+        event_loop = asyncio.get_running_loop()
+        deadline: float = event_loop.time() + self.coalesce_window / 1000
+        while collected < self.coalesce_max_messages:
+            layer_message: LayerMessage
+            if self.inbox.empty():
+                remaining: float = deadline - event_loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    layer_message = await asyncio.wait_for(self.inbox.get(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    break
+            else:
+                layer_message = self.inbox.get_nowait()
+            should_process = await self._merge_inbox_message(layer_message) or should_process
+            collected += 1
+        debug_print(f"Coalesced {collected} messages in {self.layer_type}...", DebugLevels.DEBUG)
+        return should_process
+
+    @final
+    async def _run_worker(self) -> None:
+        while True:
+            if not await self._coalesce_inbox():
+                continue
+            try:
+                await self._process_layer_message()
+            except Exception as error:
+                self.processing = False
+                debug_print(f"Error processing {self.layer_type}: {error}", DebugLevels.ERROR)
+
+    @final
+    def start_worker(self) -> None:
+        if self.worker and not self.worker.done():
+            return
+        self.worker = asyncio.create_task(self._run_worker())
+
+    @final
+    def stop_worker(self) -> None:
+        if self.worker:
+            self.worker.cancel()
+        self.worker = None
+
+    @final
+    def queue_depth(self) -> int:
+        return self.inbox.qsize()
+
     @final
     async def get_message_from_bus(self, message: NatsMsg) -> None:
         try:
-            layer_message = LayerMessage.model_validate_json(message.data)
-        except ValidationError as error:
+            layer_message: LayerMessage = decode_layer_message(message.data, message.headers)
+        except ValueError as error:
             print(f"Incorrect message format!\n{error}")
             return
         print(f"Received {layer_message.model_dump_json()} on {message.subject} queue...")
-        if layer_message.message_type == LayerKeys.COMMANDS:
-            asyncio.create_task(self._process_controller_message(layer_message))
-        else:
-            match layer_message.message_type:
-                case LayerKeys.GUIDANCE:
-                    self.guidance = _merge_messages(new_messages=layer_message.messages, old_messages=self.guidance)
-                case LayerKeys.DATA:
-                    self.data = _merge_messages(new_messages=layer_message.messages, old_messages=self.data)
-            thread = Thread(target=self._process_layer_message)
-            thread.start()
-        await message.ack()
+        await self.inbox.put(layer_message)
+        debug_print(f"{self.layer_type} queue depth: {self.queue_depth()}", DebugLevels.DEBUG)
 
 
 # INHERITED
 class Aspirational(Layer):
+    prompt_variables: tuple[str, ...] = (*PROMPT_VARIABLES, LayerKeys.MISSION)
+
     def _custom_init(self) -> None:
         self.default_guidance = (
             LayerSubMessage(
@@ -268,7 +496,6 @@ class Aspirational(Layer):
                 content=(GenericKeys.EMPTY,)
             ),
         )
-        self.__slots__.append(LayerKeys.MISSION)
         with open(LayerPaths.CONFIG, "r", encoding="utf-8") as config_file:
             config = toml.load(config_file)
         base_information: dict[str, Any] = config.get(self.name, {})
@@ -289,10 +516,31 @@ LAYER_MAP: dict[str, type[Layer]] = {
     Layers.TASK_PROSECUTION: TaskProsecution
 }
 
-def layer_factory(name: str, layer_type: str) -> Layer:
+def layer_factory(
+    name: str,
+    layer_type: str,
+    routing_mode: str = RoutingModes.CONTROLLER,
+    wire_codec: str = DEFAULT_WIRE_CODEC,
+    stream: Optional[JetStreamContext] = None,
+    coalesce_window: int = LayerDefaults.COALESCE_WINDOW,
+    coalesce_max_messages: int = LayerDefaults.COALESCE_MAX_MESSAGES,
+    message_store_options: Optional[MessageStoreOptions] = None,
+    speculative_samples: int = LayerDefaults.SPECULATIVE_SAMPLES
+) -> Layer:
     try:
         layer: type[Layer] = LAYER_MAP[layer_type]
         preset: type[LayerPreset] = LAYER_PRESET_MAP[layer_type]
-        return layer(name=name, layer_type=layer_type, preset=preset())
+        return layer(
+            name=name,
+            layer_type=layer_type,
+            preset=preset(),
+            routing_mode=routing_mode,
+            wire_codec=wire_codec,
+            stream=stream,
+            coalesce_window=coalesce_window,
+            coalesce_max_messages=coalesce_max_messages,
+            message_store_options=message_store_options,
+            speculative_samples=speculative_samples
+        )
     except Exception as error:
         raise error
@@ -0,0 +1,148 @@
+# DEPENDENCIES
+## Built-In
+from collections import deque
+from dataclasses import dataclass, field
+from typing import final, Optional
+## Local
+from constants.layer import EvictionPolicies, LayerDefaults
+from constants.settings import DebugLevels
+from helpers import debug_print
+from .layer_messages import LayerSubMessage
+
+
+# TYPES
+StoredItem = tuple[int, str]
+"""(sequence, content)"""
+
+@final
+@dataclass(frozen=True)
+class MessageStoreOptions:
+    """
+    Attributes:
+        max_heading_items (int): The most content items kept under a single heading
+        max_items (int): The most content items kept across all headings
+        eviction_policy (str): One of `constants.layer.EvictionPolicies`, used when max_items is reached
+        heading_priorities (dict[str, int]): Priority of each heading, lower priorities are evicted first, unlisted headings are 0
+    """
+    max_heading_items: int = LayerDefaults.MAX_HEADING_ITEMS
+    max_items: int = LayerDefaults.MAX_ITEMS
+    eviction_policy: str = EvictionPolicies.OLDEST
+    heading_priorities: dict[str, int] = field(default_factory=dict)
+
+
+# STORE
+@final
+class MessageStore:
+    """
+    Bounded store of the sub messages a layer has received since it last processed, keyed by heading
+
+    Headings only hold their newest max_heading_items content items, and once max_items is reached
+    the eviction policy decides which heading loses its oldest item
+
+    Attributes:
+        options (MessageStoreOptions): The size caps and eviction policy
+        headings (dict[str, deque[StoredItem]]): The content items under each heading, oldest first
+        order (deque[tuple[int, str]]): The sequence and heading of every item in arrival order, may hold already evicted items
+        size (int): The number of content items held
+        sequence (int): The sequence of the last item added
+        evicted (int): The number of content items evicted since the store was created
+
+    Methods:
+        merge(sub_messages: tuple[LayerSubMessage, ...]) -> int: Add the content of the sub messages, returning how many items were evicted
+        snapshot() -> tuple[LayerSubMessage, ...]: The held messages, rebuilt only after a change
+        clear() -> None: Remove every held message
+    """
+    __slots__: tuple[str, ...] = ("options", "headings", "order", "size", "sequence", "evicted", "_snapshot")
+
+    def __init__(self, options: Optional[MessageStoreOptions] = None) -> None:
+        self.options: MessageStoreOptions = options or MessageStoreOptions()
+        self.headings: dict[str, deque[StoredItem]] = {}
+        self.order: deque[tuple[int, str]] = deque()
+        self.size: int = 0
+        self.sequence: int = 0
+        self.evicted: int = 0
+        self._snapshot: Optional[tuple[LayerSubMessage, ...]] = ()
+
+    def __len__(self) -> int:
+        return self.size
+
+    # Eviction
+    def _is_live(self, entry: tuple[int, str]) -> bool:
+        sequence, heading = entry
+        items: Optional[deque[StoredItem]] = self.headings.get(heading)
+        return bool(items) and items[0][0] <= sequence
+
+    def _evict_from(self, heading: str) -> None:
+        self.headings[heading].popleft()
+        self.size -= 1
+        self.evicted += 1
+
+    def _evict_oldest(self) -> None:
+        while self.order:
+            entry: tuple[int, str] = self.order.popleft()
+            if self._is_live(entry):
+                self._evict_from(entry[1])
+                return
+
+    def _evict_lowest_priority(self) -> None:
+        heading: str = min(
+            (heading for heading, items in self.headings.items() if items),
+            key=lambda heading: (self.options.heading_priorities.get(heading, 0), self.headings[heading][0][0])
+        )
+        self._evict_from(heading)
+
+    def _evict(self) -> None:
+        match self.options.eviction_policy:
+            case EvictionPolicies.PRIORITY:
+                self._evict_lowest_priority()
+            case _:
+                self._evict_oldest()
+
+    def _compact_order(self) -> None:
+        if len(self.order) > 2 * self.size:
+            self.order = deque(entry for entry in self.order if self._is_live(entry))
+
+    # Interface
+    def merge(self, sub_messages: tuple[LayerSubMessage, ...]) -> int:
+        """
+        Add the content of the sub messages under their headings, evicting to stay within the caps
+
+        Arguments:
+            sub_messages (tuple[LayerSubMessage, ...]): The sub messages to add
+
+        Returns:
+            int: The number of content items evicted to make room
+        """
+        evicted_before: int = self.evicted
+        for sub_message in sub_messages:
+            items: deque[StoredItem] = self.headings.setdefault(sub_message.heading, deque())
+            for content in sub_message.content:
+                if len(items) >= self.options.max_heading_items:
+                    self._evict_from(sub_message.heading)
+                self.sequence += 1
+                items.append((self.sequence, content))
+                self.order.append((self.sequence, sub_message.heading))
+                self.size += 1
+                if self.size > self.options.max_items:
+                    self._evict()
+        self._compact_order()
+        self._snapshot = None
+        evicted: int = self.evicted - evicted_before
+        if evicted:
+            debug_print(f"Message store evicted {evicted} items...", DebugLevels.DEBUG)
+        return evicted
+
+    def snapshot(self) -> tuple[LayerSubMessage, ...]:
+        if self._snapshot is None:
+            self._snapshot = tuple(
+                LayerSubMessage(heading=heading, content=tuple(content for _, content in items))
+                for heading, items in self.headings.items()
+                if items
+            )
+        return self._snapshot
+
+    def clear(self) -> None:
+        self.headings.clear()
+        self.order.clear()
+        self.size = 0
+        self._snapshot = ()
@@ -1,19 +1,89 @@
 # DEPENDENCIES
+## Built-In
+from dataclasses import dataclass
+from functools import lru_cache
+import re
+from typing import final, Optional, Union
 ## Local
-from .injections import InjectionMap, VariableMap
+from .injections import Injection, InjectionMap, VariableMap
+from .token_budget import estimate_tokens, TokenBudget
 
 
+# TEMPLATES
+_SLOT_PATTERN: re.Pattern = re.compile(r"\{\{ (\w+) \}\}")
+
+@final
+@dataclass(frozen=True)
+class PromptSlot:
+    name: str
+
+PromptTemplate = tuple[Union[str, PromptSlot], ...]
+"""Literal chunks of text and the slots between them"""
+
+@lru_cache(maxsize=256)
+def compile_template(text_with_variables: str) -> PromptTemplate:
+    """
+    Compiles text containing {{ variable }} slots into a template, so it can be rendered with a single join
+
+    Arguments:
+        text_with_variables (str): The text to compile
+
+    Returns:
+        PromptTemplate: The literal chunks of the text and the slots between them
+    """
+    segments: list[Union[str, PromptSlot]] = []
+    position: int = 0
+    for match in _SLOT_PATTERN.finditer(text_with_variables):
+        if match.start() > position:
+            segments.append(text_with_variables[position:match.start()])
+        segments.append(PromptSlot(name=match.group(1)))
+        position = match.end()
+    if position < len(text_with_variables):
+        segments.append(text_with_variables[position:])
+    return tuple(segments)
+
+def _render_injection(injection: Injection, variable_map: VariableMap) -> str:
+    injection_text: str = injection.get_injection(variable_map)
+    sub_injection_map: InjectionMap = getattr(injection, "sub_injection_map", None) or {}
+    if sub_injection_map:
+        injection_text = render_template(compile_template(injection_text), sub_injection_map, variable_map)
+    return injection_text
+
+def render_template(
+    template: PromptTemplate,
+    injection_map: InjectionMap,
+    variable_map: VariableMap,
+    token_budget: Optional[TokenBudget] = None
+) -> str:
+    """
+    Renders a compiled template, leaving any slots without an injection in place for a later stage
+
+    Arguments:
+        template (PromptTemplate): The compiled template
+        injection_map (InjectionMap): The injections for the slots to render
+        variable_map (VariableMap): The variables used by the injections
+        token_budget (Optional[TokenBudget]): Trims the rendered injections to fit the budget if given
+
+    Returns:
+        str: The rendered text
+    """
+    rendered_injections: dict[str, str] = {}
+    for segment in template:
+        if isinstance(segment, str) or segment.name in rendered_injections:
+            continue
+        injection: Union[Injection, None] = injection_map.get(segment.name)
+        rendered_injections[segment.name] = (
+            f"{{{{ {segment.name} }}}}" if injection is None else _render_injection(injection, variable_map)
+        )
+    if token_budget:
+        fixed_text: str = "".join(segment for segment in template if isinstance(segment, str))
+        rendered_injections = token_budget.fit(estimate_tokens(fixed_text), rendered_injections)
+    return "".join(
+        segment if isinstance(segment, str) else rendered_injections[segment.name]
+        for segment in template
+    )
+
+
+# BUILDING
 def build_prompt(text_with_variables: str, injection_map: InjectionMap, variable_map: VariableMap) -> str:
-    for injection_variable, injection in injection_map.items():
-        injection_text: str = injection.get_injection(variable_map)
-        if hasattr(injection, "sub_injection_map"):
-            sub_injection_map: InjectionMap = getattr(injection, "sub_injection_map")
-            if sub_injection_map:
-                injection_text = build_prompt(
-                    text_with_variables=injection_text,
-                    injection_map=sub_injection_map,
-                    variable_map=variable_map
-                )
-        replace_variable: str = "{{ injection_variable }}".replace("injection_variable", injection_variable)
-        text_with_variables = text_with_variables.replace(replace_variable, injection_text)
-    return text_with_variables
+    return render_template(compile_template(text_with_variables), injection_map, variable_map)
@@ -0,0 +1,301 @@
+"""
+Incremental validation of streamed layer responses against the layer's response schema.
+
+Responses are checked line by line while they stream in, so a generation can be aborted as soon as it
+can no longer match the schema, and retried by continuing from the last valid statement instead of
+regenerating the whole response.
+"""
+
+# DEPENDENCIES
+## Built-In
+from functools import lru_cache
+import json
+import re
+from typing import Any, final, Optional
+## Third-Party
+import toml
+## Local
+from constants.prompts import PromptFilePaths
+from .injections.file_cache import prompt_file_cache
+
+
+# CONSTANTS
+_HEADER_PATTERN: re.Pattern = re.compile(r"^\[\s*([A-Za-z_][\w-]*(?:\.[A-Za-z_][\w-]*)?)\s*\]\s*$")
+_KEY_PATTERN: re.Pattern = re.compile(r"^([A-Za-z_][\w-]*)\s*=")
+_FENCE: str = "```"
+_MULTILINE_QUOTES: tuple[str, ...] = ('"""', "'''")
+
+_SCHEMA_TYPES: dict[str, type] = {
+    "str": str,
+    "list": list,
+    "dict": dict
+}
+
+_JSON_SCHEMA_TYPES: dict[type, dict[str, Any]] = {
+    str: {"type": "string"},
+    list: {"type": "array", "items": {"type": "string"}},
+    dict: {"type": "object", "additionalProperties": {"type": "string"}}
+}
+
+ResponseSchema = dict[str, dict[str, type]]
+"""{section: {key: value type}}"""
+
+
+# SCHEMA
+@lru_cache(maxsize=16)
+def parse_response_schema(schema_text: str) -> ResponseSchema:
+    """
+    Parse a response schema, where every key is declared as `key = str[...]`, `list[...]` or `dict[...]`
+
+    Arguments:
+        schema_text (str): The text of the schema file
+
+    Returns:
+        ResponseSchema: The value type of every key in every section
+    """
+    schema: ResponseSchema = {}
+    section: Optional[dict[str, type]] = None
+    for line in schema_text.splitlines():
+        stripped: str = line.strip()
+        header: Optional[re.Match] = _HEADER_PATTERN.match(stripped)
+        if header:
+            section = schema.setdefault(header.group(1), {})
+            continue
+        key: Optional[re.Match] = _KEY_PATTERN.match(stripped)
+        if key and section is not None:
+            schema_type: str = stripped[key.end():].strip().split("[", 1)[0]
+            section[key.group(1)] = _SCHEMA_TYPES.get(schema_type, str)
+    return schema
+
+@lru_cache(maxsize=16)
+def _build_json_schema(schema_text: str) -> dict[str, Any]:
+    schema: ResponseSchema = parse_response_schema(schema_text)
+    return {
+        "type": "object",
+        "properties": {
+            section: {
+                "type": "object",
+                "properties": {key: _JSON_SCHEMA_TYPES[value_type] for key, value_type in keys.items()},
+                "required": list(keys)
+            }
+            for section, keys in schema.items()
+        },
+        "required": list(schema)
+    }
+
+def get_response_schema(layer_type: str) -> ResponseSchema:
+    return parse_response_schema(prompt_file_cache.read(f"{PromptFilePaths.SCHEMAS}/{layer_type}"))
+
+def get_response_json_schema(layer_type: str) -> dict[str, Any]:
+    """The response schema as a JSON schema, for providers that can constrain their output"""
+    return _build_json_schema(prompt_file_cache.read(f"{PromptFilePaths.SCHEMAS}/{layer_type}"))
+
+
+# VALIDATION
+def _in_multiline_string(text: str) -> bool:
+    return any(text.count(quotes) % 2 for quotes in _MULTILINE_QUOTES)
+
+def _starts_statement(line: str) -> bool:
+    return bool(_HEADER_PATTERN.match(line) or _KEY_PATTERN.match(line) or line.startswith(_FENCE))
+
+@final
+class StreamingResponseValidator:
+    """
+    Validates a TOML response against a response schema as it streams in, one complete line at a time
+
+    Attributes:
+        schema (ResponseSchema): The schema the response must match
+        text (str): Everything fed so far
+        valid_end (int): The end of the last complete statement that matched the schema
+        error (str): Why the response can no longer be valid, empty while it still can be
+        finished (bool): Whether the closing fence has been reached
+
+    Methods:
+        feed(chunk: str) -> bool: Validate the next chunk, returning whether the response can still be valid
+        finish() -> bool: Validate the end of the response, returning whether the whole response is valid
+        validate_json(text: str) -> bool: Validate a whole JSON response from a constrained generation instead of streamed TOML
+        valid_prefix() -> str: The response up to the end of the last valid statement
+        parse() -> dict[str, Any]: The validated response
+    """
+    def __init__(self, schema: ResponseSchema) -> None:
+        self.schema: ResponseSchema = schema
+        self.text: str = ""
+        self.valid_end: int = 0
+        self.error: str = ""
+        self.finished: bool = False
+        self._line_start: int = 0
+        self._section: Optional[str] = None
+        self._sub_table: Optional[str] = None
+        self._seen: dict[str, set[str]] = {}
+        self._statement_start: Optional[int] = None
+        self._statement_key: str = ""
+        self._parsed: Optional[dict[str, Any]] = None
+
+    # Statements
+    def _fail(self, error: str) -> None:
+        self.error = error
+
+    def _complete_statement(self, end: int) -> None:
+        if self._statement_start is None or self._section is None:
+            return
+        statement: str = self.text[self._statement_start:end]
+        if _in_multiline_string(statement):
+            return
+        try:
+            value: Any = toml.loads(statement)[self._statement_key]
+        except Exception:
+            return
+        self._statement_start = None
+        if self._sub_table:
+            if not isinstance(value, str):
+                self._fail(f"{self._section}.{self._sub_table}.{self._statement_key} should be a str")
+            self.valid_end = end
+            return
+        expected_type: type = self.schema[self._section][self._statement_key]
+        if not isinstance(value, expected_type):
+            self._fail(f"{self._section}.{self._statement_key} should be a {expected_type.__name__}")
+            return
+        self._seen[self._section].add(self._statement_key)
+        self.valid_end = end
+
+    def _start_header(self, name: str, end: int) -> None:
+        section, _, sub_table = name.partition(".")
+        if sub_table:
+            if section != self._section or self.schema[section].get(sub_table) is not dict or sub_table in self._seen[section]:
+                self._fail(f"Unexpected table [{name}]")
+                return
+            self._seen[section].add(sub_table)
+            self._sub_table = sub_table
+            self.valid_end = end
+            return
+        if section not in self.schema or section in self._seen:
+            self._fail(f"Unexpected section [{name}]")
+            return
+        self._section = section
+        self._sub_table = None
+        self._seen[section] = set()
+        self.valid_end = end
+
+    def _start_key(self, key: str, start: int, end: int) -> None:
+        if self._section is None:
+            self._fail(f"Key {key} is outside of a section")
+            return
+        if not self._sub_table and (key not in self.schema[self._section] or key in self._seen[self._section]):
+            self._fail(f"Unexpected key {self._section}.{key}")
+            return
+        self._statement_start = start
+        self._statement_key = key
+        self._complete_statement(end)
+
+    def _process_line(self, line: str, start: int, end: int) -> None:
+        stripped: str = line.strip()
+        if self._statement_start is not None:
+            open_statement: str = self.text[self._statement_start:start]
+            if _starts_statement(stripped) and not _in_multiline_string(open_statement):
+                self._fail(f"Incomplete value for {self._section}.{self._statement_key}")
+                return
+            self._complete_statement(end)
+            return
+        if not stripped:
+            self.valid_end = end
+            return
+        if stripped.startswith(_FENCE):
+            if self.text[:start].strip():
+                self.finished = True
+            else:
+                self.valid_end = end
+            return
+        header: Optional[re.Match] = _HEADER_PATTERN.match(stripped)
+        if header:
+            self._start_header(header.group(1), end)
+            return
+        key: Optional[re.Match] = _KEY_PATTERN.match(stripped)
+        if key:
+            self._start_key(key.group(1), start, end)
+            return
+        self._fail(f"Unexpected line: {stripped[:40]}")
+
+    # Interface
+    def feed(self, chunk: str) -> bool:
+        """
+        Validate the next chunk of the response
+
+        Arguments:
+            chunk (str): The next chunk of streamed text
+
+        Returns:
+            bool: Whether the response can still be valid
+        """
+        if self.error or self.finished:
+            return not self.error
+        self.text += chunk
+        while not self.error and not self.finished:
+            line_end: int = self.text.find("\n", self._line_start)
+            if line_end == -1:
+                break
+            self._process_line(self.text[self._line_start:line_end], self._line_start, line_end + 1)
+            self._line_start = line_end + 1
+        return not self.error
+
+    def finish(self) -> bool:
+        """
+        Validate the end of the response, after the stream has ended or the closing fence was reached
+
+        Returns:
+            bool: Whether the whole response is valid
+        """
+        if not self.error and not self.finished and self._line_start < len(self.text):
+            self.feed("\n")
+        if self.error:
+            return False
+        if self._statement_start is not None:
+            self._fail(f"Incomplete value for {self._section}.{self._statement_key}")
+            return False
+        for section, keys in self.schema.items():
+            missing: set[str] = set(keys) - self._seen.get(section, set())
+            if missing:
+                self._fail(f"Missing {section} keys: {', '.join(sorted(missing))}")
+                return False
+        return True
+
+    def validate_json(self, text: str) -> bool:
+        """
+        Validate a whole JSON response, for constrained generations that can't be checked incrementally
+
+        Arguments:
+            text (str): The JSON response
+
+        Returns:
+            bool: Whether the response matches the schema
+        """
+        try:
+            response: Any = json.loads(text)
+        except ValueError as error:
+            self._fail(f"Invalid JSON: {error}")
+            return False
+        if not isinstance(response, dict):
+            self._fail("Response is not an object")
+            return False
+        for section, keys in self.schema.items():
+            values: Any = response.get(section)
+            if not isinstance(values, dict):
+                self._fail(f"Missing section [{section}]")
+                return False
+            for key, expected_type in keys.items():
+                if not isinstance(values.get(key), expected_type):
+                    self._fail(f"{section}.{key} should be a {expected_type.__name__}")
+                    return False
+        self._parsed = response
+        self.finished = True
+        return True
+
+    def valid_prefix(self) -> str:
+        return self.text[:self.valid_end]
+
+    def parse(self) -> dict[str, Any]:
+        if self._parsed is not None:
+            return self._parsed
+        lines: list[str] = [line for line in self.text[:self._line_start].splitlines() if not line.strip().startswith(_FENCE)]
+        if not self.finished:
+            lines.append(self.text[self._line_start:])
+        return toml.loads("\n".join(lines))
@@ -0,0 +1,183 @@
+# DEPENDENCIES
+## Built-In
+from dataclasses import dataclass, field
+from typing import final
+## Local
+from constants.prompts import PromptKeys, TokenBudgetDefaults
+from constants.settings import DebugLevels
+from helpers import debug_print
+
+
+# ESTIMATION
+def estimate_tokens(text: str) -> int:
+    """Fast approximation of the token count, without loading a tokenizer"""
+    return -(-len(text) // TokenBudgetDefaults.CHARS_PER_TOKEN)
+
+
+# TYPES
+@final
+@dataclass(frozen=True)
+class SectionBudget:
+    """
+    Attributes:
+        weight (int): The share of the available tokens this section gets when the prompt is over budget
+        drop_oldest (bool): Whether to drop the first lines of the section first, otherwise the last lines are dropped first
+    """
+    weight: int
+    drop_oldest: bool
+
+@final
+@dataclass
+class BudgetReport:
+    """
+    Attributes:
+        max_tokens (int): The token budget for the whole prompt
+        fixed_tokens (int): The tokens used by the parts of the prompt that can't be trimmed
+        section_tokens (dict[str, int]): The tokens used by each trimmable section after fitting
+        dropped_lines (dict[str, int]): The lines dropped from each trimmable section
+        dropped_tokens (dict[str, int]): The tokens dropped from each trimmable section
+    """
+    max_tokens: int
+    fixed_tokens: int = 0
+    section_tokens: dict[str, int] = field(default_factory=dict)
+    dropped_lines: dict[str, int] = field(default_factory=dict)
+    dropped_tokens: dict[str, int] = field(default_factory=dict)
+
+    @property
+    def total_tokens(self) -> int:
+        return self.fixed_tokens + sum(self.section_tokens.values())
+
+    @property
+    def total_dropped_tokens(self) -> int:
+        return sum(self.dropped_tokens.values())
+
+
+DEFAULT_SECTION_BUDGETS: dict[str, SectionBudget] = {
+    PromptKeys.GUIDANCE: SectionBudget(weight=3, drop_oldest=True),
+    PromptKeys.DATA: SectionBudget(weight=2, drop_oldest=True),
+    PromptKeys.TELEMETRY: SectionBudget(weight=1, drop_oldest=False)
+}
+"""Guidance and data arrive oldest first, telemetry is ordered most relevant first"""
+
+
+# TRIMMING
+def _is_droppable(line: str) -> bool:
+    return bool(line.strip()) and not line.startswith("#")
+
+def _drop_empty_headings(lines: list[str], kept: list[bool]) -> None:
+    heading_index: int = -1
+    heading_has_content: bool = True
+    for index, line in enumerate(lines):
+        if line.startswith("#"):
+            if not heading_has_content:
+                kept[heading_index] = False
+            heading_index, heading_has_content = index, False
+            continue
+        if kept[index] and _is_droppable(line):
+            heading_has_content = True
+    if not heading_has_content:
+        kept[heading_index] = False
+
+def _trim_section(text: str, max_tokens: int, drop_oldest: bool) -> tuple[str, int]:
+    max_chars: int = max_tokens * TokenBudgetDefaults.CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return text, 0
+    lines: list[str] = text.split("\n")
+    kept: list[bool] = [True] * len(lines)
+    droppable: list[int] = [index for index, line in enumerate(lines) if _is_droppable(line)]
+    if not drop_oldest:
+        droppable.reverse()
+    chars: int = len(text)
+    dropped: int = 0
+    for index in droppable:
+        if chars <= max_chars:
+            break
+        kept[index] = False
+        chars -= len(lines[index]) + 1
+        dropped += 1
+    if dropped == len(droppable):
+        return "", dropped
+    _drop_empty_headings(lines, kept)
+    return "\n".join(line for line, keep in zip(lines, kept) if keep), dropped
+
+def _allocate(available: int, section_tokens: dict[str, int], budgets: dict[str, SectionBudget]) -> dict[str, int]:
+    allocations: dict[str, int] = {}
+    remaining_weight: int = sum(budgets[section].weight for section in section_tokens)
+    # Sections needing less than their share free up tokens for the rest
+    for section in sorted(section_tokens, key=lambda section: section_tokens[section] / budgets[section].weight):
+        weight: int = budgets[section].weight
+        share: int = available * weight // remaining_weight if remaining_weight else 0
+        allocations[section] = min(section_tokens[section], share)
+        available -= allocations[section]
+        remaining_weight -= weight
+    return allocations
+
+
+# BUDGET
+@final
+class TokenBudget:
+    """
+    Keeps rendered prompts under a token budget by trimming the lowest priority lines of the trimmable sections
+
+    Attributes:
+        max_tokens (int): The token budget for the whole prompt
+        section_budgets (dict[str, SectionBudget]): How each trimmable section is weighted and trimmed
+        last_report (BudgetReport): The report from the last prompt fitted
+
+    Methods:
+        fit(fixed_text_tokens: int, rendered_sections: dict[str, str]) -> dict[str, str]: Trim the rendered sections to fit the budget
+    """
+    def __init__(
+        self,
+        max_tokens: int = TokenBudgetDefaults.MAX_PROMPT_TOKENS,
+        section_budgets: dict[str, SectionBudget] = DEFAULT_SECTION_BUDGETS
+    ) -> None:
+        self.max_tokens: int = max_tokens
+        self.section_budgets: dict[str, SectionBudget] = section_budgets
+        self.last_report: BudgetReport = BudgetReport(max_tokens=max_tokens)
+
+    def fit(self, fixed_text_tokens: int, rendered_sections: dict[str, str]) -> dict[str, str]:
+        """
+        Trim the rendered sections so the whole prompt fits the budget
+
+        Arguments:
+            fixed_text_tokens (int): The tokens used by the literal text of the template
+            rendered_sections (dict[str, str]): The rendered text of each slot, slots without a section budget are kept whole
+
+        Returns:
+            dict[str, str]: The rendered text of each slot after trimming
+        """
+        report = BudgetReport(max_tokens=self.max_tokens, fixed_tokens=fixed_text_tokens)
+        section_tokens: dict[str, int] = {}
+        for section, text in rendered_sections.items():
+            if section in self.section_budgets:
+                section_tokens[section] = estimate_tokens(text)
+            else:
+                report.fixed_tokens += estimate_tokens(text)
+        report.section_tokens = section_tokens.copy()
+        self.last_report = report
+        available: int = max(0, self.max_tokens - report.fixed_tokens)
+        if report.fixed_tokens > self.max_tokens:
+            debug_print(f"Fixed prompt text uses {report.fixed_tokens} tokens, over the {self.max_tokens} token budget!", DebugLevels.WARNING)
+        if sum(section_tokens.values()) <= available:
+            return rendered_sections
+
+        fitted_sections: dict[str, str] = rendered_sections.copy()
+        allocations: dict[str, int] = _allocate(available, section_tokens, self.section_budgets)
+        for section, allocation in allocations.items():
+            if allocation >= section_tokens[section]:
+                continue
+            text, dropped_lines = _trim_section(
+                rendered_sections[section],
+                max_tokens=allocation,
+                drop_oldest=self.section_budgets[section].drop_oldest
+            )
+            fitted_sections[section] = text
+            report.section_tokens[section] = estimate_tokens(text)
+            report.dropped_lines[section] = dropped_lines
+            report.dropped_tokens[section] = section_tokens[section] - report.section_tokens[section]
+        debug_print(
+            f"Prompt over budget, dropped {report.total_dropped_tokens} tokens: {report.dropped_tokens}",
+            DebugLevels.WARNING
+        )
+        return fitted_sections
@@ -1,12 +1,29 @@
 # DEPENDENCIES
+## Built-in
+import base64
+from contextlib import asynccontextmanager
+import json
+from typing import Any, AsyncIterator, Hashable, Iterator, Optional, Union
 ## Third-Party
-from fastapi import FastAPI
-from pydantic import BaseModel
+from fastapi import FastAPI, HTTPException, Response
+from fastapi.responses import StreamingResponse
+import numpy
+from pydantic import BaseModel, Field
+from starlette.background import BackgroundTask
+from starlette.concurrency import iterate_in_threadpool, run_in_threadpool
 ## Local
 from helpers import debug_print
 from constants.api import APIRoutes
+from constants.model_provider import EmbeddingEncodings, MemoryDefaults, ModelProviderHeaders, ResourceDefaults, ResponseFormats
 from constants.settings import DebugLevels
-from .provider import generate_response
+from .limiter import generation_limiter, GenerationQueueFull, GenerationQueueStats
+from .llm import PruneQuery, RerankQuery
+from .micro_batch import MicroBatcher, MicroBatchStats
+from .provider import (
+    cached_response, embed_batch, find_resources, generate_response, is_constrained, prune_batch, recall, remember, rerank_batch, stream_response
+)
+from .response_cache import response_cache, ResponseCacheStats
+from .single_flight import single_flight, SingleFlightStats, StreamSubscription
 
 
 # VALIDATION
@@ -14,20 +31,256 @@ class ModelPrompt(BaseModel):
     stack_type: str
     system_prompt: str
     assistant_begin: str = " "
+    temperature: Optional[float] = None
+    seed: Optional[int] = None
+    response_schema: Optional[dict[str, Any]] = None
+    """JSON schema to constrain the response to, only applied by providers that support it"""
 
 class ModelResponse(BaseModel):
     response: str
 
+class MemoryRequest(BaseModel):
+    memories: list[str]
+
+class MemoryStoreResponse(BaseModel):
+    added: int
+
+class MemoryQuery(BaseModel):
+    context: str
+    top_k: int = MemoryDefaults.TOP_K
+
+class MemoryResponse(BaseModel):
+    memories: tuple[str, ...]
+
+class ResourceQuery(BaseModel):
+    context: str
+    top_k: int = ResourceDefaults.TOP_K
+
+class ResourceResponse(BaseModel):
+    resources: tuple[str, ...]
+
+class EmbedRequest(BaseModel):
+    texts: list[str]
+    encoding: str = EmbeddingEncodings.BASE64
+
+class EmbedResponse(BaseModel):
+    count: int
+    dimensions: int
+    embeddings: str
+    """Base64 of the row-major, little-endian float32 matrix with a row per text"""
+
+class RerankRequest(BaseModel):
+    query: str
+    documents: list[str]
+    top_k: Optional[int] = Field(default=None, ge=1)
+    candidates: Optional[int] = Field(default=None, ge=1)
+    """Prune the documents to this many by embedding similarity before reranking"""
+    min_similarity: Optional[float] = None
+    """Prune documents less similar to the query by embedding before reranking"""
+
+class RerankResponse(BaseModel):
+    documents: tuple[str, ...]
+
+
+# LIFECYCLE
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    yield
+    response_cache.save()
+
 
 # SETUP
-api = FastAPI()
+api = FastAPI(lifespan=lifespan)
+
+
+# BATCHING
+def _rerank_requests(requests: list[RerankRequest]) -> list[tuple[str, ...]]:
+    # The whole batch is pruned in one embedder invocation and reranked in one reranker invocation
+    pruned_documents: list[frozenset[str]] = prune_batch([
+        PruneQuery(query=request.query, documents=frozenset(request.documents), keep=request.candidates, min_similarity=request.min_similarity)
+        for request in requests
+    ])
+    rerank_queries: list[RerankQuery] = [
+        RerankQuery(query=request.query, documents=documents, top_k=request.top_k)
+        for request, documents in zip(requests, pruned_documents)
+    ]
+    return rerank_batch(rerank_queries)
+
+embed_batcher: MicroBatcher[list[str], numpy.ndarray] = MicroBatcher(embed_batch)
+rerank_batcher: MicroBatcher[RerankRequest, tuple[str, ...]] = MicroBatcher(_rerank_requests)
+
+
+# GENERATION
+def _generation_key(prompt: ModelPrompt) -> Hashable:
+    """The temperature isn't part of the key, as generate always samples at the LLM's own temperature"""
+    return (prompt.stack_type, prompt.system_prompt, prompt.assistant_begin)
+
+def _stream_key(prompt: ModelPrompt) -> Hashable:
+    response_schema: Optional[str] = json.dumps(prompt.response_schema, sort_keys=True) if prompt.response_schema else None
+    return (prompt.stack_type, prompt.system_prompt, prompt.assistant_begin, prompt.temperature, prompt.seed, response_schema)
+
+async def _generate_with_slot(prompt: ModelPrompt) -> tuple[str, float]:
+    async with generation_limiter.acquire(prompt.stack_type) as wait_ms:
+        generated: str = await run_in_threadpool(
+            generate_response,
+            stack_type=prompt.stack_type,
+            system_prompt=prompt.system_prompt,
+            assistant_begin=prompt.assistant_begin
+        )
+    return generated, wait_ms
+
+async def _stream_with_slot(stack_type: str, chunks: Iterator[str]) -> AsyncIterator[str]:
+    """The slot is only taken once the response starts streaming, so a client that disconnects first never holds one"""
+    try:
+        async with generation_limiter.acquire(stack_type):
+            async for chunk in iterate_in_threadpool(chunks):
+                yield chunk
+    finally:
+        close = getattr(chunks, "close", None)
+        if close:
+            close()
 
 
 # ROUTES
 @api.get(f"{APIRoutes.VONE}/generate", response_model=ModelResponse)
-async def generate(prompt: ModelPrompt) -> ModelResponse:
+async def generate(prompt: ModelPrompt, response: Response) -> ModelResponse:
+    """
+    Generates in the threadpool, so the event loop keeps serving other requests.
+    Generations wait for a free slot of their stack type, and are rejected with a 503 when too many are already waiting.
+    Identical requests made while a generation is running share its response.
+    Cached responses are served without waiting for a slot, so they're never queued or rejected
+    """
     print(f"Generating response for {prompt.stack_type}...")
-    response: str = generate_response(stack_type=prompt.stack_type, system_prompt=prompt.system_prompt, assistant_begin=prompt.assistant_begin)
-    debug_print(f"Response: {response}", debug_level=DebugLevels.INFO)
-    model_response = ModelResponse(response=response)
+    cached: Optional[str] = await run_in_threadpool(
+        cached_response,
+        stack_type=prompt.stack_type,
+        system_prompt=prompt.system_prompt,
+        assistant_begin=prompt.assistant_begin
+    )
+    if cached is not None:
+        response.headers[ModelProviderHeaders.QUEUE_WAIT] = "0.0"
+        return ModelResponse(response=cached)
+    try:
+        generated, wait_ms = await single_flight.call(_generation_key(prompt), lambda: _generate_with_slot(prompt))
+    except GenerationQueueFull as error:
+        raise HTTPException(status_code=503, detail=str(error))
+    debug_print(f"Response: {generated}", debug_level=DebugLevels.INFO)
+    response.headers[ModelProviderHeaders.QUEUE_WAIT] = f"{wait_ms:.1f}"
+    model_response = ModelResponse(response=generated)
     return model_response
+
+@api.post(f"{APIRoutes.VONE}/generate/stream", response_class=StreamingResponse)
+async def generate_stream(prompt: ModelPrompt) -> StreamingResponse:
+    """
+    Streams the generated text without the assistant_begin, generation stops when the client disconnects.
+    Constrained responses are streamed as JSON, which is flagged in the response format header.
+    Identical requests made while a stream is running join it, starting from its first chunk.
+    Cached responses to prompts without sampling overrides or a schema are served as one chunk, without waiting for a slot
+    """
+    print(f"Streaming response for {prompt.stack_type}...")
+    if prompt.temperature is None and prompt.seed is None and not prompt.response_schema:
+        cached: Optional[str] = await run_in_threadpool(
+            cached_response,
+            stack_type=prompt.stack_type,
+            system_prompt=prompt.system_prompt,
+            assistant_begin=prompt.assistant_begin
+        )
+        if cached is not None:
+            return StreamingResponse(
+                iter((cached.removeprefix(prompt.assistant_begin),)),
+                media_type="text/plain",
+                headers={ModelProviderHeaders.RESPONSE_FORMAT: ResponseFormats.TEXT}
+            )
+    stream_key: Hashable = _stream_key(prompt)
+    if not single_flight.is_streaming(stream_key):
+        try:
+            generation_limiter.check(prompt.stack_type)
+        except GenerationQueueFull as error:
+            raise HTTPException(status_code=503, detail=str(error))
+
+    def start_stream() -> AsyncIterator[str]:
+        chunks: Iterator[str] = stream_response(
+            stack_type=prompt.stack_type,
+            system_prompt=prompt.system_prompt,
+            assistant_begin=prompt.assistant_begin,
+            temperature=prompt.temperature,
+            seed=prompt.seed,
+            response_schema=prompt.response_schema
+        )
+        return _stream_with_slot(prompt.stack_type, chunks)
+
+    response_format: str = ResponseFormats.JSON if is_constrained(prompt.stack_type, prompt.response_schema) else ResponseFormats.TEXT
+    subscription: StreamSubscription = single_flight.stream(stream_key, start_stream)
+    # Releases the subscription even when the client leaves before the body starts
+    return StreamingResponse(
+        subscription,
+        media_type="text/plain",
+        headers={ModelProviderHeaders.RESPONSE_FORMAT: response_format},
+        background=BackgroundTask(subscription.aclose)
+    )
+
+@api.get(f"{APIRoutes.VONE}/generate/queues", response_model=dict[str, GenerationQueueStats])
+async def generation_queues() -> dict[str, GenerationQueueStats]:
+    """Queue depth and wait times of every stack type used so far"""
+    return generation_limiter.get_stats()
+
+@api.get(f"{APIRoutes.VONE}/generate/cache", response_model=ResponseCacheStats)
+async def generation_cache() -> ResponseCacheStats:
+    """Hit, miss and eviction counts of the response cache"""
+    return response_cache.get_stats()
+
+@api.get(f"{APIRoutes.VONE}/generate/flights", response_model=SingleFlightStats)
+async def generation_flights() -> SingleFlightStats:
+    """How many identical concurrent requests joined a running generation instead of starting their own"""
+    return single_flight.get_stats()
+
+@api.post(f"{APIRoutes.VONE}/memory", response_model=MemoryStoreResponse)
+async def store_memories(request: MemoryRequest) -> MemoryStoreResponse:
+    """Embeds and stores the memories that aren't stored yet"""
+    added: int = await run_in_threadpool(remember, memories=request.memories)
+    return MemoryStoreResponse(added=added)
+
+@api.get(f"{APIRoutes.VONE}/memory", response_model=MemoryResponse)
+async def query_memories(query: MemoryQuery) -> MemoryResponse:
+    """The stored memories most relevant to the context, most relevant first"""
+    memories: tuple[str, ...] = await run_in_threadpool(recall, context=query.context, top_k=query.top_k)
+    return MemoryResponse(memories=memories)
+
+@api.get(f"{APIRoutes.VONE}/resources", response_model=ResourceResponse)
+async def query_resources(query: ResourceQuery) -> ResourceResponse:
+    """The passages of the resource files most relevant to the context, each prefixed by its file"""
+    resources: tuple[str, ...] = await run_in_threadpool(find_resources, context=query.context, top_k=query.top_k)
+    return ResourceResponse(resources=resources)
+
+@api.post(f"{APIRoutes.VONE}/embed", response_model=EmbedResponse)
+async def embed(request: EmbedRequest) -> Union[EmbedResponse, Response]:
+    """
+    Embeds the texts with the stack's embedder, gathering concurrent requests into one invocation.
+    The binary encoding returns the raw little-endian float32 matrix, with its shape in the embedding headers
+    """
+    if request.encoding not in EmbeddingEncodings.get_frozen_values():
+        raise HTTPException(status_code=400, detail=f"{request.encoding} is not an embedding encoding...")
+    embeddings: numpy.ndarray = await embed_batcher.submit(request.texts)
+    payload: bytes = numpy.ascontiguousarray(embeddings, dtype="<f4").tobytes()
+    count, dimensions = embeddings.shape
+    if request.encoding == EmbeddingEncodings.BINARY:
+        return Response(
+            content=payload,
+            media_type="application/octet-stream",
+            headers={ModelProviderHeaders.EMBEDDING_COUNT: str(count), ModelProviderHeaders.EMBEDDING_DIMENSIONS: str(dimensions)}
+        )
+    return EmbedResponse(count=count, dimensions=dimensions, embeddings=base64.b64encode(payload).decode("ascii"))
+
+@api.post(f"{APIRoutes.VONE}/rerank", response_model=RerankResponse)
+async def rerank(request: RerankRequest) -> RerankResponse:
+    """
+    Reranks the documents with the stack's reranker, gathering concurrent requests into one invocation.
+    Documents can first be pruned by embedding similarity, so the reranker scores at most the candidates
+    """
+    documents: tuple[str, ...] = await rerank_batcher.submit(request)
+    return RerankResponse(documents=documents)
+
+@api.get(f"{APIRoutes.VONE}/batches", response_model=dict[str, MicroBatchStats])
+async def batches() -> dict[str, MicroBatchStats]:
+    """How many embed and rerank requests were gathered into each model invocation"""
+    return {"embed": embed_batcher.get_stats(), "rerank": rerank_batcher.get_stats()}
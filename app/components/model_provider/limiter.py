@@ -0,0 +1,136 @@
+# DEPENDENCIES
+## Built-In
+import asyncio
+from contextlib import asynccontextmanager
+from time import perf_counter
+from typing import AsyncIterator, final, Optional
+## Third-Party
+from pydantic import BaseModel
+## Local
+from constants.model_provider import GenerationDefaults
+
+
+# TYPES
+class GenerationQueueStats(BaseModel):
+    """
+    Attributes:
+        max_running (int): The most generations allowed to run at once
+        max_waiting (int): The most generations allowed to wait for a free slot
+        running (int): The generations running now
+        waiting (int): The generations waiting for a free slot now
+        completed (int): The generations that have finished
+        rejected (int): The generations rejected because the wait queue was full
+        last_wait_ms (float): How long the last generation waited for a slot
+        average_wait_ms (float): The average time generations waited for a slot
+        max_wait_ms (float): The longest time a generation waited for a slot
+    """
+    max_running: int
+    max_waiting: int
+    running: int = 0
+    waiting: int = 0
+    completed: int = 0
+    rejected: int = 0
+    last_wait_ms: float = 0.0
+    average_wait_ms: float = 0.0
+    max_wait_ms: float = 0.0
+
+class GenerationQueueFull(Exception):
+    """Raised when a stack type already has max_waiting generations waiting"""
+
+
+# QUEUES
+@final
+class _StackQueue:
+    def __init__(self, max_running: int, max_waiting: int) -> None:
+        self.stats = GenerationQueueStats(max_running=max_running, max_waiting=max_waiting)
+        self.total_wait_ms: float = 0.0
+        self.free = asyncio.Condition()
+
+    def _has_free_slot(self) -> bool:
+        return self.stats.running < self.stats.max_running
+
+    def check(self, stack_type: str) -> None:
+        if self.stats.waiting >= self.stats.max_waiting and not self._has_free_slot():
+            self.stats.rejected += 1
+            raise GenerationQueueFull(f"{stack_type} already has {self.stats.waiting} generations waiting!")
+
+    async def reserve(self) -> float:
+        start: float = perf_counter()
+        self.stats.waiting += 1
+        try:
+            async with self.free:
+                await self.free.wait_for(self._has_free_slot)
+                self.stats.running += 1
+        finally:
+            self.stats.waiting -= 1
+        wait_ms: float = (perf_counter() - start) * 1000
+        self.total_wait_ms += wait_ms
+        self.stats.last_wait_ms = wait_ms
+        self.stats.max_wait_ms = max(self.stats.max_wait_ms, wait_ms)
+        return wait_ms
+
+    async def release(self) -> None:
+        async with self.free:
+            self.stats.running -= 1
+            self.stats.completed += 1
+            self.stats.average_wait_ms = self.total_wait_ms / self.stats.completed
+            self.free.notify()
+
+
+# LIMITER
+@final
+class GenerationLimiter:
+    """
+    Limits how many generations run at once for each stack type, with a bounded queue of waiting generations,
+    so a slow stack type never blocks requests for the others
+
+    Attributes:
+        limits (dict[str, int]): The most generations allowed to run at once for each stack type
+        max_waiting (int): The most generations allowed to wait for each stack type
+
+    Methods:
+        configure(limits: dict[str, int], max_waiting: int) -> None: Set the limits, applied as running generations finish
+        check(stack_type: str) -> None: Raise GenerationQueueFull if a generation for the stack type would be rejected
+        acquire(stack_type: str) -> AsyncIterator[float]: Hold a generation slot, yielding how long it waited in milliseconds
+        get_stats() -> dict[str, GenerationQueueStats]: The queue stats for every stack type used so far
+    """
+    def __init__(self) -> None:
+        self.limits: dict[str, int] = {}
+        self.max_waiting: int = GenerationDefaults.MAX_WAITING
+        self._queues: dict[str, _StackQueue] = {}
+
+    def _get_queue(self, stack_type: str) -> _StackQueue:
+        queue: Optional[_StackQueue] = self._queues.get(stack_type)
+        if queue is None:
+            queue = self._queues[stack_type] = _StackQueue(
+                max_running=self.limits.get(stack_type, GenerationDefaults.MAX_RUNNING),
+                max_waiting=self.max_waiting
+            )
+        return queue
+
+    def configure(self, limits: dict[str, int], max_waiting: int) -> None:
+        self.limits = {stack_type: max(1, limit) for stack_type, limit in limits.items()}
+        self.max_waiting = max(0, max_waiting)
+        for stack_type, queue in self._queues.items():
+            queue.stats.max_running = self.limits.get(stack_type, GenerationDefaults.MAX_RUNNING)
+            queue.stats.max_waiting = self.max_waiting
+
+    def check(self, stack_type: str) -> None:
+        self._get_queue(stack_type).check(stack_type)
+
+    @asynccontextmanager
+    async def acquire(self, stack_type: str) -> AsyncIterator[float]:
+        queue: _StackQueue = self._get_queue(stack_type)
+        queue.check(stack_type)
+        wait_ms: float = await queue.reserve()
+        try:
+            yield wait_ms
+        finally:
+            await queue.release()
+
+    def get_stats(self) -> dict[str, GenerationQueueStats]:
+        return {stack_type: queue.stats for stack_type, queue in self._queues.items()}
+
+
+# SHARED
+generation_limiter = GenerationLimiter()
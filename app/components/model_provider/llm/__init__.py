@@ -1 +1,5 @@
-from .factories import LLMStack
\ No newline at end of file
+from .embedding_store import embedding_cache
+from .factories import LLMStack
+from .llms import JSONSchema, LLM
+from .model_cache import resident_model_cache
+from .rag import prune_by_similarity, prune_many_by_similarity, PruneQuery, RerankQuery
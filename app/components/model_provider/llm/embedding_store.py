@@ -0,0 +1,230 @@
+# DEPENDENCIES
+## Built-In
+import glob
+from hashlib import sha256
+import json
+import os
+import re
+from threading import Lock
+from typing import final, Optional
+## Third-Party
+import numpy
+## Local
+from constants.model_provider import EmbeddingCacheDefaults, ModelProviderPaths
+from constants.settings import DebugLevels
+from helpers import debug_print
+
+
+# CONSTANTS
+KEY_BYTES: int = 32
+"""Length of a sha256 digest"""
+_COMPACT_CHUNK_ROWS: int = 4096
+_META_FILE: str = "meta.json"
+_UNSAFE_PATH_CHARACTERS: re.Pattern = re.compile(r"[^\w.-]")
+
+
+# HELPERS
+def _text_key(text: str) -> bytes:
+    return sha256(text.encode("utf-8")).digest()
+
+def _model_folder(model: str) -> str:
+    return f"{ModelProviderPaths.EMBEDDING_CACHE}/{_UNSAFE_PATH_CHARACTERS.sub('_', model)}"
+
+
+# STORE
+@final
+class EmbeddingStore:
+    """
+    Embeddings of one model, stored as a float32 matrix file that's memory-mapped for lookups and a key file
+    holding the sha256 of each row's text, so only the keys are held in memory
+
+    Both files are append only, rows are written before their keys and a partly written row is dropped on open.
+    Compaction rewrites them as a new generation, which is switched to by atomically replacing the meta file
+
+    Attributes:
+        folder (str): The folder holding the store's files
+        max_entries (int): The most embeddings kept by compaction, which runs once rows pass it by the slack
+        dimensions (int): The length of each embedding, 0 until the first insert
+        generation (int): The generation of the current files
+        index (dict[bytes, int]): The row of each key
+        rows (int): The rows in the files, including rows no longer indexed
+
+    Methods:
+        lookup(keys: list[bytes]) -> dict[bytes, numpy.ndarray]: The embeddings of the keys that are stored
+        insert(keys: list[bytes], vectors: numpy.ndarray) -> None: Store the embeddings of keys that aren't stored yet
+        compact() -> None: Rewrite the files with only the newest max_entries indexed rows
+    """
+    def __init__(self, folder: str, max_entries: int = EmbeddingCacheDefaults.MAX_ENTRIES) -> None:
+        self.folder: str = folder
+        self.max_entries: int = max_entries
+        self.dimensions: int = 0
+        self.generation: int = 0
+        self.index: dict[bytes, int] = {}
+        self.rows: int = 0
+        self._vectors: Optional[numpy.memmap] = None
+        self._lock = Lock()
+        self._open()
+
+    # Files
+    def _vectors_path(self, generation: int) -> str:
+        return f"{self.folder}/vectors.{generation}.f32"
+
+    def _keys_path(self, generation: int) -> str:
+        return f"{self.folder}/keys.{generation}.bin"
+
+    def _write_meta(self) -> None:
+        temporary_path: str = f"{self.folder}/{_META_FILE}.tmp"
+        with open(temporary_path, "w", encoding="utf-8") as meta_file:
+            json.dump({"dimensions": self.dimensions, "generation": self.generation}, meta_file)
+        os.replace(temporary_path, f"{self.folder}/{_META_FILE}")
+
+    def _remove_other_generations(self) -> None:
+        current_files: set[str] = {self._vectors_path(self.generation), self._keys_path(self.generation)}
+        for path in glob.glob(f"{self.folder}/vectors.*.f32") + glob.glob(f"{self.folder}/keys.*.bin"):
+            if path not in current_files:
+                os.remove(path)
+
+    def _open(self) -> None:
+        os.makedirs(self.folder, exist_ok=True)
+        meta_path: str = f"{self.folder}/{_META_FILE}"
+        if not os.path.isfile(meta_path):
+            return
+        with open(meta_path, "r", encoding="utf-8") as meta_file:
+            meta: dict[str, int] = json.load(meta_file)
+        self.dimensions, self.generation = meta["dimensions"], meta["generation"]
+        self._remove_other_generations()
+        vectors_path, keys_path = self._vectors_path(self.generation), self._keys_path(self.generation)
+        for path in (vectors_path, keys_path):
+            open(path, "ab").close()
+        self.rows = min(os.path.getsize(vectors_path) // (4 * self.dimensions), os.path.getsize(keys_path) // KEY_BYTES)
+        os.truncate(vectors_path, self.rows * 4 * self.dimensions)
+        os.truncate(keys_path, self.rows * KEY_BYTES)
+        with open(keys_path, "rb") as keys_file:
+            keys: bytes = keys_file.read()
+        self.index = {keys[row * KEY_BYTES:(row + 1) * KEY_BYTES]: row for row in range(self.rows)}
+        debug_print(f"Opened embedding cache {self.folder} with {len(self.index)} embeddings...", DebugLevels.INFO)
+
+    def _map(self) -> numpy.memmap:
+        if self._vectors is None or len(self._vectors) < self.rows:
+            self._vectors = numpy.memmap(self._vectors_path(self.generation), dtype=numpy.float32, mode="r", shape=(self.rows, self.dimensions))
+        return self._vectors
+
+    # Interface
+    def lookup(self, keys: list[bytes]) -> dict[bytes, numpy.ndarray]:
+        """
+        Get the stored embeddings of the keys in one read of the mapped matrix
+
+        Arguments:
+            keys (list[bytes]): The sha256 digests of the texts
+
+        Returns:
+            dict[bytes, numpy.ndarray]: The embedding of every key that's stored, copied out of the mapped file
+        """
+        with self._lock:
+            found: list[bytes] = [key for key in keys if key in self.index]
+            if not found:
+                return {}
+            vectors: numpy.ndarray = numpy.array(self._map()[[self.index[key] for key in found]])
+        return dict(zip(found, vectors))
+
+    def insert(self, keys: list[bytes], vectors: numpy.ndarray) -> None:
+        """
+        Append the embeddings of the keys that aren't stored yet
+
+        Arguments:
+            keys (list[bytes]): The sha256 digests of the texts
+            vectors (numpy.ndarray): The embeddings, one row per key
+        """
+        vectors = numpy.ascontiguousarray(vectors, dtype=numpy.float32)
+        with self._lock:
+            if not self.dimensions:
+                self.dimensions = vectors.shape[1]
+                self._write_meta()
+            new_rows: dict[bytes, int] = {}
+            for row, key in enumerate(keys):
+                if key not in self.index and key not in new_rows:
+                    new_rows[key] = row
+            if not new_rows:
+                return
+            with open(self._vectors_path(self.generation), "ab") as vectors_file:
+                vectors_file.write(vectors[list(new_rows.values())].tobytes())
+            with open(self._keys_path(self.generation), "ab") as keys_file:
+                keys_file.write(b"".join(new_rows))
+            for row, key in enumerate(new_rows, start=self.rows):
+                self.index[key] = row
+            self.rows += len(new_rows)
+            compact: bool = self.rows > self.max_entries * (100 + EmbeddingCacheDefaults.COMPACT_SLACK_PERCENT) // 100
+        if compact:
+            self.compact()
+
+    def compact(self) -> None:
+        """Rewrite the files with only the newest max_entries indexed rows, dropping the rest"""
+        with self._lock:
+            if not self.rows:
+                return
+            kept: list[tuple[int, bytes]] = sorted((row, key) for key, row in self.index.items())[-self.max_entries:]
+            vectors: numpy.memmap = self._map()
+            generation: int = self.generation + 1
+            with open(self._vectors_path(generation), "wb") as vectors_file:
+                for start in range(0, len(kept), _COMPACT_CHUNK_ROWS):
+                    chunk_rows: list[int] = [row for row, _ in kept[start:start + _COMPACT_CHUNK_ROWS]]
+                    vectors_file.write(numpy.ascontiguousarray(vectors[chunk_rows]).tobytes())
+            with open(self._keys_path(generation), "wb") as keys_file:
+                keys_file.write(b"".join(key for _, key in kept))
+            self._vectors = None
+            self.generation = generation
+            self._write_meta()
+            self._remove_other_generations()
+            dropped: int = self.rows - len(kept)
+            self.index = {key: row for row, (_, key) in enumerate(kept)}
+            self.rows = len(kept)
+        debug_print(f"Compacted embedding cache {self.folder}, dropped {dropped} rows...", DebugLevels.INFO)
+
+
+# CACHE
+@final
+class EmbeddingCache:
+    """
+    Content-addressed cache of embeddings on the model provider volume, with one store per model
+
+    Attributes:
+        max_entries (int): The most embeddings kept for each model
+        stores (dict[str, EmbeddingStore]): The opened store of each model
+
+    Methods:
+        configure(max_entries: int) -> None: Set the most embeddings kept for each model
+        lookup(model: str, texts: list[str]) -> dict[str, numpy.ndarray]: The cached embeddings of the texts
+        insert(model: str, texts: list[str], vectors: numpy.ndarray) -> None: Cache the embeddings of the texts
+        compact() -> None: Compact every opened store
+    """
+    def __init__(self) -> None:
+        self.max_entries: int = EmbeddingCacheDefaults.MAX_ENTRIES
+        self.stores: dict[str, EmbeddingStore] = {}
+        self._lock = Lock()
+
+    def _get_store(self, model: str) -> EmbeddingStore:
+        with self._lock:
+            store: Optional[EmbeddingStore] = self.stores.get(model)
+            if store is None:
+                store = self.stores[model] = EmbeddingStore(_model_folder(model), self.max_entries)
+            return store
+
+    def configure(self, max_entries: int) -> None:
+        self.max_entries = max(1, max_entries)
+        for store in self.stores.values():
+            store.max_entries = self.max_entries
+
+    def lookup(self, model: str, texts: list[str]) -> dict[str, numpy.ndarray]:
+        keys: dict[bytes, str] = {_text_key(text): text for text in texts}
+        return {keys[key]: vector for key, vector in self._get_store(model).lookup(list(keys)).items()}
+
+    def insert(self, model: str, texts: list[str], vectors: numpy.ndarray) -> None:
+        self._get_store(model).insert([_text_key(text) for text in texts], vectors)
+
+    def compact(self) -> None:
+        for store in list(self.stores.values()):
+            store.compact()
+
+
+# SHARED
+embedding_cache = EmbeddingCache()
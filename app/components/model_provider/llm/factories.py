@@ -2,15 +2,20 @@
 ## Built-In
 from copy import deepcopy
 from re import L
+from threading import Lock
+from typing import Optional
 ## Local
-from constants.model_provider import LLMKeys, LLMStackTypes, ModelTypes, Providers
+from constants.model_provider import EmbedderDefaults, LLMKeys, LLMStackTypes, ModelTypes, Providers, RerankerDefaults
+from constants.settings import DebugLevels
+from helpers import debug_print
 from .llms import (
     LLM, LLMDetails, OllamaDetails,
     ClaudeLLM, GroqLLM, OllamaLLM, OpenAILLM
 )
 from .rag import (
-    Embedder, Reranker, RAGDetails,
-    FastEmbed, Ragatouille, CrossEncoder
+    Embedder, Reranker, EmbedderDetails, RAGDetails,
+    FastEmbed, Ragatouille, CrossEncoder,
+    prune_by_similarity
 )
 
 
@@ -40,8 +45,10 @@ def _llm_factory(llm: str, llm_details: dict[str, str]) -> LLM:
             raise NotImplementedError(f"{llm} is not implemented...")
 
 def _embedder_factory(embedder: str, details: dict[str, str]) -> Embedder:
-    embedder_details = RAGDetails(
-        model=details[LLMKeys.MODEL]
+    embedder_details = EmbedderDetails(
+        model=details[LLMKeys.MODEL],
+        batch_size=details.get(LLMKeys.BATCH_SIZE, EmbedderDefaults.BATCH_SIZE),
+        threads=details.get(LLMKeys.THREADS, EmbedderDefaults.THREADS)
     )
     match embedder:
         case Providers.FAST_EMBED:
@@ -62,11 +69,45 @@ def _reranker_factory(reranker: str, details: dict[str, str]) -> Reranker:
             raise NotImplementedError(f"{reranker} is not implemented...")
 
 
+# VALIDATION
+_PROVIDERS_BY_MODEL_TYPE: dict[str, frozenset[str]] = {
+    ModelTypes.LLM: frozenset({Providers.CLAUDE, Providers.GROQ, Providers.OLLAMA, Providers.OPENAI}),
+    ModelTypes.EMBEDDER: frozenset({Providers.FAST_EMBED}),
+    ModelTypes.RERANKER: frozenset({Providers.RAGATOUILLE, Providers.CROSS_ENCODER})
+}
+
+_MODEL_TYPES_BY_STACK_TYPE: dict[str, str] = {
+    LLMStackTypes.GENERALIST: ModelTypes.LLM,
+    LLMStackTypes.EFFICIENT: ModelTypes.LLM,
+    LLMStackTypes.CODER: ModelTypes.LLM,
+    LLMStackTypes.FUNCTION_CALLER: ModelTypes.LLM,
+    LLMStackTypes.EMBEDDER: ModelTypes.EMBEDDER,
+    LLMStackTypes.RERANKER: ModelTypes.RERANKER
+}
+
+def _validate_provider_details(stack_type: str, provider_details: dict[str, str]) -> None:
+    """Raise for details the factories would reject, without building anything"""
+    for required_key in (LLMKeys.MODEL_TYPE, LLMKeys.PROVIDER_TYPE, LLMKeys.MODEL):
+        if required_key not in provider_details:
+            raise KeyError(f"The {stack_type} is missing its {required_key}...")
+    model_type: str = provider_details[LLMKeys.MODEL_TYPE]
+    provider_type: str = provider_details[LLMKeys.PROVIDER_TYPE]
+    if model_type not in _PROVIDERS_BY_MODEL_TYPE:
+        raise NotImplementedError(f"{model_type} is not implemented...")
+    if provider_type not in _PROVIDERS_BY_MODEL_TYPE[model_type]:
+        raise NotImplementedError(f"{provider_type} is not implemented...")
+    if model_type != _MODEL_TYPES_BY_STACK_TYPE[stack_type]:
+        raise ValueError(f"The {stack_type} needs the {_MODEL_TYPES_BY_STACK_TYPE[stack_type]} model type, not {model_type}...")
+
+
 # FULL MODEL PROVIDER
 class LLMStack:
     """
     A class that provides a stack of LLMs for use in the ace pipeline
 
+    Each member is built the first time it's used, so stack types a deployment never uses never load or connect.
+    The provider map is still validated up front, so an invalid config fails when the stack is created
+
     Arguments:
         provider_map (dict[str, dict[str, str]]): A map of different provider stacks. The details should include the following keys:
             - stack_type (str): The type of stack that is being used. There should be a dict for every value in `constants.model_provider.LLM_STACK_TYPES`
@@ -81,6 +122,11 @@ class LLMStack:
         function_caller (LLM): The LLM used for function calling
         embedder (Embedder): The model used for embedding
         reranker (Reranker): The model used for reranking
+
+    Methods:
+        is_built(stack_type: str) -> bool: Whether the member for the stack type has been built
+        close () -> None: Close the clients of every LLM that was built, after their in-flight generations finish
+        rerank_cascade(query: str, documents: frozenset[str], candidates: int, top_k: int, min_similarity: Optional[float]) -> tuple[str, ...]: Prune by embedding similarity, then rerank
     """
     __slots__: tuple[str, ...] = (
         LLMStackTypes.GENERALIST,
@@ -88,29 +134,86 @@ class LLMStack:
         LLMStackTypes.CODER,
         LLMStackTypes.FUNCTION_CALLER,
         LLMStackTypes.EMBEDDER,
-        LLMStackTypes.RERANKER
+        LLMStackTypes.RERANKER,
+        "_provider_map",
+        "_build_locks",
+        "_closed"
     )
-    def __init__(self, provider_map: dict[str, dict[str, str]]) -> None:  
-        llm_map: dict[str, LLM] = {}
-        embedder_map: dict[str, Embedder] = {}
-        reranker_map: dict[str, Reranker] = {}
-        for stack_type in LLMStackTypes.get_frozen_values():
-            provider_details: dict[str, str] = provider_map[stack_type]
-            model_type: str = provider_details.pop(LLMKeys.MODEL_TYPE)
-            provider_type: str = provider_details.pop(LLMKeys.PROVIDER_TYPE)
-            match model_type:
-                case ModelTypes.LLM:
-                    llm_map[stack_type] = _llm_factory(provider_type, provider_details)
-                case ModelTypes.EMBEDDER:
-                    embedder_map[stack_type] = _embedder_factory(provider_type, provider_details)
-                case ModelTypes.RERANKER:
-                    reranker_map[stack_type] = _reranker_factory(provider_type, provider_details)
-                case _:
-                    raise NotImplementedError(f"{model_type} is not implemented...") 
-            
-        self.generalist: LLM = llm_map[LLMStackTypes.GENERALIST]
-        self.efficient: LLM = llm_map[LLMStackTypes.EFFICIENT]
-        self.coder: LLM = llm_map[LLMStackTypes.CODER]
-        self.function_caller: LLM = llm_map[LLMStackTypes.FUNCTION_CALLER]
-        self.embedder: Embedder = embedder_map[LLMStackTypes.EMBEDDER]
-        self.reranker: Reranker = reranker_map[LLMStackTypes.RERANKER]
+    def __init__(self, provider_map: dict[str, dict[str, str]]) -> None:
+        # Copied so the caller's config can build other stacks
+        self._provider_map: dict[str, dict[str, str]] = {
+            stack_type: deepcopy(provider_map[stack_type]) for stack_type in LLMStackTypes.get_frozen_values()
+        }
+        for stack_type, provider_details in self._provider_map.items():
+            _validate_provider_details(stack_type, provider_details)
+        self._build_locks: dict[str, Lock] = {stack_type: Lock() for stack_type in self._provider_map}
+        self._closed: bool = False
+
+    def _build(self, stack_type: str) -> LLM | Embedder | Reranker:
+        provider_details: dict[str, str] = dict(self._provider_map[stack_type])
+        model_type: str = provider_details.pop(LLMKeys.MODEL_TYPE)
+        provider_type: str = provider_details.pop(LLMKeys.PROVIDER_TYPE)
+        match model_type:
+            case ModelTypes.LLM:
+                return _llm_factory(provider_type, provider_details)
+            case ModelTypes.EMBEDDER:
+                return _embedder_factory(provider_type, provider_details)
+            case ModelTypes.RERANKER:
+                return _reranker_factory(provider_type, provider_details)
+            case _:
+                raise NotImplementedError(f"{model_type} is not implemented...")
+
+    def __getattr__(self, stack_type: str) -> LLM | Embedder | Reranker:
+        """Only called while the stack type's slot is empty, so each member is built on first use"""
+        if stack_type not in LLMStackTypes.get_frozen_values():
+            raise AttributeError(f"{type(self).__name__} has no attribute {stack_type}")
+        with self._build_locks[stack_type]:
+            if self._closed:
+                raise RuntimeError(f"The LLM stack was closed, so its {stack_type} can't be built...")
+            if not self.is_built(stack_type):
+                debug_print(f"Building the {stack_type} of the LLM stack...", DebugLevels.INFO)
+                setattr(self, stack_type, self._build(stack_type))
+        return object.__getattribute__(self, stack_type)
+
+    def is_built(self, stack_type: str) -> bool:
+        try:
+            object.__getattribute__(self, stack_type)
+        except AttributeError:
+            return False
+        return True
+
+    def close(self) -> None:
+        """Stack types that were never used have nothing to close, and closed stacks don't build them afterwards"""
+        self._closed = True
+        built_llms: set[LLM] = set()
+        for stack_type in (LLMStackTypes.GENERALIST, LLMStackTypes.EFFICIENT, LLMStackTypes.CODER, LLMStackTypes.FUNCTION_CALLER):
+            # Waits for a build already underway, so its client is closed too
+            with self._build_locks[stack_type]:
+                if self.is_built(stack_type):
+                    built_llms.add(object.__getattribute__(self, stack_type))
+        for llm in built_llms:
+            llm.close()
+
+    def rerank_cascade(
+        self,
+        query: str,
+        documents: frozenset[str],
+        candidates: int = RerankerDefaults.CASCADE_CANDIDATES,
+        top_k: int = RerankerDefaults.CASCADE_TOP_K,
+        min_similarity: Optional[float] = None
+    ) -> tuple[str, ...]:
+        """
+        Rerank in two stages, so the reranker scores at most the candidates no matter how many documents there are
+
+        Arguments:
+            query (str): What the documents should be relevant to
+            documents (frozenset[str]): The documents to rerank
+            candidates (int): The most documents kept by embedding similarity for the reranker
+            top_k (int): The most documents to return
+            min_similarity (Optional[float]): The lowest cosine similarity to the query a document needs to be reranked, if any
+
+        Returns:
+            tuple[str, ...]: The most relevant documents, most relevant first
+        """
+        pruned_documents: frozenset[str] = prune_by_similarity(self.embedder, query, documents, candidates, min_similarity)
+        return self.reranker.rerank(query, pruned_documents, top_k=top_k)
@@ -1,13 +1,18 @@
 # DEPENDENCIES
 ## Built-In
 from abc import ABC, abstractmethod
-from typing import Any, Generic, Iterator, Mapping, TypeVar, Union
+from contextlib import contextmanager
+import json
+import os
+from threading import Lock
+from typing import Any, Generic, Iterator, Mapping, Optional, TypeVar, Union
 ## Third-Party
 from anthropic import Anthropic
 from anthropic import Stream as AnthropicStream
 from anthropic.types import MessageStreamEvent
 from groq import Groq
 from groq.types.chat import ChatCompletion as GroqChatCompletion
+import httpx
 import ollama
 from ollama import Options as OllamaOptions
 from openai import OpenAI
@@ -16,7 +21,7 @@ from openai.types.chat import ChatCompletionChunk as OpenAIChatCompletionChunk
 from pydantic import BaseModel
 ## Local
 from constants.generic import GenericKeys
-from constants.model_provider import LLMKeys
+from constants.model_provider import HTTPPoolDefaults, LLMKeys, OllamaAPI
 from constants.settings import DebugLevels
 from helpers import debug_print
 
@@ -33,6 +38,24 @@ class LLMDetails(BaseModel):
 GenericLLMDetails = TypeVar("GenericLLMDetails", bound=LLMDetails)
 """Hint to use a LLMDetails or a subclass of LLMDetails"""
 
+JSONSchema = dict[str, Any]
+
+POOL_LIMITS = httpx.Limits(
+    max_connections=HTTPPoolDefaults.MAX_CONNECTIONS,
+    max_keepalive_connections=HTTPPoolDefaults.MAX_KEEPALIVE_CONNECTIONS,
+    keepalive_expiry=HTTPPoolDefaults.KEEPALIVE_EXPIRY
+)
+"""Connection pool shared by the requests of one LLM, so keep-alive connections skip the TCP and TLS setup"""
+
+def _ollama_host() -> str:
+    """The Ollama server from the same environment variable the ollama library reads"""
+    host: str = os.getenv(OllamaAPI.HOST_VARIABLE) or OllamaAPI.DEFAULT_HOST
+    return host if "://" in host else f"http://{host}"
+
+def _pooled_http_client() -> httpx.Client:
+    # The SDKs apply their own default timeouts to clients left on the httpx default timeout
+    return httpx.Client(limits=POOL_LIMITS, follow_redirects=True)
+
 class LLM(ABC, Generic[GenericLLMDetails]):
     """
     Abstract Base Class for Language Model Managers
@@ -43,41 +66,102 @@ class LLM(ABC, Generic[GenericLLMDetails]):
         context (int): Number of tokens to use for context
         temperature (float): Temperature for the model
         rate_limit (int): Minimum time between requests in seconds
+        constrained_decoding (bool): Whether stream can constrain the output to a response schema
+        client (Any): The long-lived SDK client, created in `_custom_init` by providers that have one
     
     Methods:
         generate (system_prompt: str, assistant_begin: str) -> str: Generate a response to the system prompt
+        stream (system_prompt: str, assistant_begin: str, temperature: Optional[float], seed: Optional[int], response_schema: Optional[JSONSchema]) -> Iterator[str]: Stream the generated text as it is produced, without the assistant_begin
+        lease () -> Iterator[None]: Hold the client open while generating
+        close () -> None: Close the client once every lease is released
     """
     __slots__: tuple[str, ...] = (
         LLMKeys.API_KEY,
         LLMKeys.MODEL,
         LLMKeys.CONTEXT,
         LLMKeys.TEMPERATURE,
-        LLMKeys.RATE_LIMIT
+        LLMKeys.RATE_LIMIT,
+        LLMKeys.CLIENT
     )
+    constrained_decoding: bool = False
+
     def __init__(self, llm_details: GenericLLMDetails) -> None:
         self.api_key: str = llm_details.api_key
         self.model: str = llm_details.model
         self.context: int = llm_details.context
         self.temperature: float = llm_details.temperature
         self.rate_limit: int = llm_details.rate_limit
+        self.client: Any = None
+        self._leases: int = 0
+        self._closing: bool = False
+        self._lease_lock = Lock()
         self._custom_init(llm_details)
     
     def _custom_init(self, llm_details: GenericLLMDetails) -> None:
         pass
 
+    def _close_client(self) -> None:
+        if self.client is not None:
+            self.client.close()
+
+    @contextmanager
+    def lease(self) -> Iterator[None]:
+        with self._lease_lock:
+            self._leases += 1
+        try:
+            yield
+        finally:
+            with self._lease_lock:
+                self._leases -= 1
+                close: bool = self._closing and not self._leases
+            if close:
+                self._close_client()
+
+    def close(self) -> None:
+        """Close the client, waiting for generations still holding a lease to finish first"""
+        with self._lease_lock:
+            self._closing = True
+            close: bool = not self._leases
+        if close:
+            self._close_client()
+
     @abstractmethod
     def generate(self, system_prompt: str, assistant_begin: str) -> str:
         raise NotImplementedError
 
+    def stream(
+        self,
+        system_prompt: str,
+        assistant_begin: str,
+        temperature: Optional[float] = None,
+        seed: Optional[int] = None,
+        response_schema: Optional[JSONSchema] = None
+    ) -> Iterator[str]:
+        """Providers that can't stream yield the whole response at once, without the sampling overrides or response schema"""
+        response: str = self.generate(system_prompt=system_prompt, assistant_begin=assistant_begin)
+        yield response.removeprefix(assistant_begin)
+
 
 # CLAUDE
 class ClaudeLLM(LLM):
     """
     Language Model Manager for Claude
     """
+    def _custom_init(self, llm_details: LLMDetails) -> None:
+        self.client: Anthropic = Anthropic(api_key=self.api_key, http_client=_pooled_http_client())
+
     def generate(self, system_prompt: str, assistant_begin: str) -> str:
-        client = Anthropic(api_key=self.api_key)
-        stream: AnthropicStream[MessageStreamEvent] = client.messages.create(
+        return "".join((assistant_begin, *self.stream(system_prompt=system_prompt, assistant_begin=assistant_begin)))
+
+    def stream(
+        self,
+        system_prompt: str,
+        assistant_begin: str,
+        temperature: Optional[float] = None,
+        seed: Optional[int] = None,
+        response_schema: Optional[JSONSchema] = None
+    ) -> Iterator[str]:
+        stream: AnthropicStream[MessageStreamEvent] = self.client.messages.create(
             system=system_prompt,
             messages=[
                 {
@@ -87,13 +171,12 @@ class ClaudeLLM(LLM):
             ],
             model=self.model,
             max_tokens=self.context,
-            temperature=self.temperature,
+            temperature=self.temperature if temperature is None else temperature,
             stream=True,
         )
-        output: list[str] = [assistant_begin]
         for event in stream:
-            output.append(event.type)
-        return "".join(output)
+            if event.type == "content_block_delta":
+                yield event.delta.text
 
 
 # GROQ
@@ -101,9 +184,11 @@ class GroqLLM(LLM):
     """
     Language Model Manager for Groq
     """
+    def _custom_init(self, llm_details: LLMDetails) -> None:
+        self.client: Groq = Groq(api_key=self.api_key, http_client=_pooled_http_client())
+
     def generate(self, system_prompt: str, assistant_begin: str) -> str:
-        client = Groq(api_key=self.api_key)
-        chat_completion: GroqChatCompletion = client.chat.completions.create(
+        chat_completion: GroqChatCompletion = self.client.chat.completions.create(
             messages=[
                 {
                     "role": "system",
@@ -129,6 +214,10 @@ class OllamaLLM(LLM):
 
     Extra Attributes:
         low_vram (bool): Whether to run in low VRAM mode
+
+    Talks to the Ollama REST API through its own pooled HTTP client, as the pinned ollama library only accepts
+    "json" as the format. Constrains the output by sending the schema as the `format`, which needs an Ollama server
+    with structured output support. Older servers reject the schema, after which responses stop being constrained.
     """
     def _custom_init(self, llm_details: OllamaDetails) -> None:
         self.__slots__ = (
@@ -136,38 +225,77 @@ class OllamaLLM(LLM):
             LLMKeys.LOW_VRAM
         )
         self.low_vram: bool = llm_details.low_vram
+        self.constrained_decoding: bool = True
+        # Generations can take longer than any sensible timeout, as with the ollama library's own client
+        self.client: httpx.Client = httpx.Client(base_url=_ollama_host(), limits=POOL_LIMITS, timeout=None)
+
+    def _chat(self, payload: dict[str, Any]) -> Iterator[Mapping[str, Any]]:
+        with self.client.stream("POST", OllamaAPI.CHAT, json=payload) as response:
+            if response.is_error:
+                response.read()
+                raise ollama.ResponseError(response.text, response.status_code)
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                part: Mapping[str, Any] = json.loads(line)
+                if "error" in part:
+                    raise ollama.ResponseError(part["error"], response.status_code)
+                yield part
+
+    def _disable_constraints_on_error(self, stream: Iterator[Mapping[str, Any]]) -> Iterator[Mapping[str, Any]]:
+        try:
+            yield from stream
+        except ollama.ResponseError as error:
+            debug_print(f"{self.model} rejected the response schema, disabling constrained decoding: {error}", DebugLevels.WARNING)
+            self.constrained_decoding = False
+            raise error
 
     def generate(self, system_prompt: str, assistant_begin: str) -> str:
-        stream: Union[Mapping[str, Any], Iterator[Mapping[str, Any]]] = ollama.chat(
-            model=self.model,
-            messages=[
-                {
-                    "role": "system",
-                    "content": system_prompt
-                },
-                {
-                    "role": "assistant",
-                    "content": assistant_begin
-                }
-            ],
-            options=OllamaOptions(
-                num_ctx=self.context,
-                temperature=self.temperature,
-                low_vram=self.low_vram
-            ),
-            stream=True,
+        final_output: str = "".join((assistant_begin, *self.stream(system_prompt=system_prompt, assistant_begin=assistant_begin)))
+        print(f"Final Output: {final_output}")
+        return final_output
+
+    def stream(
+        self,
+        system_prompt: str,
+        assistant_begin: str,
+        temperature: Optional[float] = None,
+        seed: Optional[int] = None,
+        response_schema: Optional[JSONSchema] = None
+    ) -> Iterator[str]:
+        options: OllamaOptions = OllamaOptions(
+            num_ctx=self.context,
+            temperature=self.temperature if temperature is None else temperature,
+            low_vram=self.low_vram
         )
-        output: list[str] = [assistant_begin]
-        if isinstance(stream, Iterator):
-            for chunk in stream:
-                output.append(chunk["message"]["content"])
-                debug_print(chunk["message"]["content"], DebugLevels.INFO, end="")
-                print(chunk["message"]["content"], end="")
+        if seed is not None:
+            options["seed"] = seed
+        messages: list[dict[str, str]] = [
+            {
+                "role": "system",
+                "content": system_prompt
+            }
+        ]
+        output_format: Union[str, JSONSchema] = ""
+        if response_schema and self.constrained_decoding:
+            output_format = response_schema
         else:
-            output.append(stream["message"]["content"])
-        final_output: str = "".join(output)
-        print(f"Final Output: {final_output}")
-        return "".join(output)
+            messages.append({
+                "role": "assistant",
+                "content": assistant_begin
+            })
+        stream: Iterator[Mapping[str, Any]] = self._chat({
+            "model": self.model,
+            "messages": messages,
+            "format": output_format,
+            "options": options,
+            "stream": True
+        })
+        if output_format:
+            stream = self._disable_constraints_on_error(stream)
+        for chunk in stream:
+            debug_print(chunk["message"]["content"], DebugLevels.INFO, end="")
+            yield chunk["message"]["content"]
 
 
 # OPENAI
@@ -175,9 +303,21 @@ class OpenAILLM(LLM):
     """
     Language Model Manager for OpenAI
     """
+    def _custom_init(self, llm_details: LLMDetails) -> None:
+        self.client: OpenAI = OpenAI(api_key=self.api_key, http_client=_pooled_http_client())
+
     def generate(self, system_prompt: str, assistant_begin: str) -> str:
-        client = OpenAI(api_key=self.api_key)
-        stream: OpenAIStream[OpenAIChatCompletionChunk] = client.chat.completions.create(
+        return "".join((assistant_begin, *self.stream(system_prompt=system_prompt, assistant_begin=assistant_begin)))
+
+    def stream(
+        self,
+        system_prompt: str,
+        assistant_begin: str,
+        temperature: Optional[float] = None,
+        seed: Optional[int] = None,
+        response_schema: Optional[JSONSchema] = None
+    ) -> Iterator[str]:
+        stream: OpenAIStream[OpenAIChatCompletionChunk] = self.client.chat.completions.create(
             model=self.model,
             messages=[
                 {
@@ -190,10 +330,9 @@ class OpenAILLM(LLM):
                 }
             ],
             max_tokens=self.context,
-            temperature=self.temperature,
+            temperature=self.temperature if temperature is None else temperature,
+            seed=seed,
             stream=True,
         )
-        output: list[str] = [assistant_begin]
         for chunk in stream:
-            output.append(chunk.choices[0].delta.content or "")
-        return "".join(output)
+            yield chunk.choices[0].delta.content or ""
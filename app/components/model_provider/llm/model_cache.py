@@ -0,0 +1,154 @@
+# DEPENDENCIES
+## Built-In
+from collections import OrderedDict
+from dataclasses import dataclass
+import os
+from threading import Event, Lock, Thread
+from time import monotonic
+from typing import Any, Callable, final, Hashable, Optional
+## Local
+from constants.model_provider import ModelCacheDefaults
+from constants.settings import DebugLevels
+from helpers import debug_print
+
+
+# MEMORY
+_STATM_PATH: str = "/proc/self/statm"
+
+def _resident_memory_mb() -> float:
+    """The resident memory of the process, 0 where /proc isn't available"""
+    try:
+        with open(_STATM_PATH, "r", encoding="utf-8") as statm_file:
+            resident_pages: int = int(statm_file.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return 0.0
+    return resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+
+
+# TYPES
+@final
+@dataclass
+class ResidentModel:
+    """
+    Attributes:
+        model (Any): The loaded model
+        memory_mb (float): How much the resident memory grew while loading the model
+        last_used (float): The monotonic time the model was last handed out
+    """
+    model: Any
+    memory_mb: float
+    last_used: float
+
+
+# CACHE
+@final
+class ResidentModelCache:
+    """
+    Process-wide cache of loaded models, so each model is only loaded from disk once while it's in use
+
+    The least recently used models are unloaded to stay within the memory and model budgets,
+    and models left unused for the idle timeout are unloaded in the background
+
+    Attributes:
+        max_memory_mb (int): The most memory the loaded models may use
+        max_models (int): The most models kept loaded
+        idle_timeout (int): How long an unused model stays loaded in seconds
+        models (OrderedDict[Hashable, ResidentModel]): The loaded models, least recently used first
+
+    Methods:
+        configure(max_memory_mb: int, max_models: int, idle_timeout: int) -> None: Apply the budgets, unloading models over them
+        get(key: Hashable, load: Callable[[], Any]) -> Any: The loaded model for the key, loading it if it isn't resident
+        unload(key: Hashable) -> None: Unload a model
+    """
+    def __init__(self) -> None:
+        self.max_memory_mb: int = ModelCacheDefaults.MAX_MEMORY_MB
+        self.max_models: int = ModelCacheDefaults.MAX_MODELS
+        self.idle_timeout: int = ModelCacheDefaults.IDLE_TIMEOUT
+        self.models: OrderedDict[Hashable, ResidentModel] = OrderedDict()
+        self._lock = Lock()
+        self._load_locks: dict[Hashable, Lock] = {}
+        self._sweeper: Optional[Thread] = None
+        self._stop_sweeping = Event()
+
+    # Eviction
+    def _memory_mb(self) -> float:
+        return sum(resident_model.memory_mb for resident_model in self.models.values())
+
+    def _evict(self, keep: Optional[Hashable] = None) -> None:
+        while self.models and (len(self.models) > self.max_models or self._memory_mb() > self.max_memory_mb):
+            key: Hashable = next(iter(self.models))
+            if key == keep:
+                # The newest model is kept even when it alone is over budget
+                break
+            debug_print(f"Unloading {key} to stay within the model cache budget...", DebugLevels.INFO)
+            del self.models[key]
+
+    def _sweep(self) -> None:
+        while not self._stop_sweeping.wait(ModelCacheDefaults.SWEEP_INTERVAL):
+            now: float = monotonic()
+            with self._lock:
+                idle: list[Hashable] = [key for key, resident_model in self.models.items() if now - resident_model.last_used > self.idle_timeout]
+                for key in idle:
+                    debug_print(f"Unloading idle model {key}...", DebugLevels.INFO)
+                    del self.models[key]
+
+    def _start_sweeper(self) -> None:
+        """Called with the lock held, so only one sweeper is ever started"""
+        if self._sweeper is None:
+            self._sweeper = Thread(target=self._sweep, name="model_cache_sweeper", daemon=True)
+            self._sweeper.start()
+
+    # Interface
+    def configure(self, max_memory_mb: int, max_models: int, idle_timeout: int) -> None:
+        with self._lock:
+            self.max_memory_mb = max_memory_mb
+            self.max_models = max(1, max_models)
+            self.idle_timeout = idle_timeout
+            self._evict()
+
+    def get(self, key: Hashable, load: Callable[[], Any]) -> Any:
+        """
+        Get a loaded model, loading it at most once even when several threads ask for it at the same time
+
+        Arguments:
+            key (Hashable): Everything that decides how the model is loaded
+            load (Callable[[], Any]): Loads the model
+
+        Returns:
+            Any: The loaded model
+        """
+        with self._lock:
+            resident_model: Optional[ResidentModel] = self.models.get(key)
+            if resident_model:
+                resident_model.last_used = monotonic()
+                self.models.move_to_end(key)
+                return resident_model.model
+            load_lock: Lock = self._load_locks.setdefault(key, Lock())
+        with load_lock:
+            with self._lock:
+                resident_model = self.models.get(key)
+            if resident_model:
+                return resident_model.model
+            try:
+                debug_print(f"Loading {key}...", DebugLevels.INFO)
+                memory_before: float = _resident_memory_mb()
+                model: Any = load()
+                memory_mb: float = max(0.0, _resident_memory_mb() - memory_before)
+                with self._lock:
+                    self.models[key] = ResidentModel(model=model, memory_mb=memory_mb, last_used=monotonic())
+                    self._evict(keep=key)
+                    self._start_sweeper()
+            finally:
+                # A failed load leaves no lock behind, so the next get tries again with a fresh one
+                with self._lock:
+                    if self._load_locks.get(key) is load_lock:
+                        del self._load_locks[key]
+        return model
+
+    def unload(self, key: Hashable) -> None:
+        with self._lock:
+            self.models.pop(key, None)
+
+
+# SHARED
+resident_model_cache = ResidentModelCache()
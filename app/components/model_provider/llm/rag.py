@@ -1,87 +1,287 @@
 # DEPENDENCIES
 ## Built-In
 from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from hashlib import sha256
+from itertools import chain
+from threading import Lock
+from typing import final, Optional
 ## Third-Party
 from fastembed import TextEmbedding
+import numpy
 from numpy import ndarray
 from ragatouille import RAGPretrainedModel
 from sentence_transformers import CrossEncoder as SentenceCrossEncoder
 from pydantic import BaseModel
 ## Local
-from constants.model_provider import LLMKeys
+from constants.model_provider import EmbedderDefaults, LLMKeys, Providers, RerankerDefaults
+from .embedding_store import embedding_cache
+from .model_cache import resident_model_cache
 
 
+# HASHING
+def content_hash(text: str) -> str:
+    return sha256(text.encode("utf-8")).hexdigest()
+
+
+# GENERIC
 class RAGDetails(BaseModel):
     """data"""
     model: str
 
+class EmbedderDetails(RAGDetails):
+    """data"""
+    batch_size: int = EmbedderDefaults.BATCH_SIZE
+    threads: int = EmbedderDefaults.THREADS
+
 class Embedder(ABC):
     __slots__: tuple[str, ...] = (
         LLMKeys.MODEL,
+        LLMKeys.BATCH_SIZE,
+        LLMKeys.THREADS
     )
-    def __init__(self, embedder_details: RAGDetails) -> None:
+    def __init__(self, embedder_details: EmbedderDetails) -> None:
         self.model: str = embedder_details.model
+        self.batch_size: int = embedder_details.batch_size
+        self.threads: int = embedder_details.threads
 
     @abstractmethod
     def embed(self, documents: frozenset[str]) -> list[ndarray]:
         raise NotImplementedError
 
+    def embed_texts(self, texts: list[str]) -> ndarray:
+        """Embed the texts into a float32 matrix with one row per text, in the order given"""
+        documents: frozenset[str] = frozenset(texts)
+        # Embedders return the embeddings in the iteration order of the documents
+        embeddings: dict[str, ndarray] = dict(zip(documents, self.embed(documents)))
+        return numpy.asarray([embeddings[text] for text in texts], dtype=numpy.float32)
+
+@final
+@dataclass(frozen=True)
+class RerankQuery:
+    """
+    Attributes:
+        query (str): What the documents should be relevant to
+        documents (frozenset[str]): The documents to rerank
+        top_k (Optional[int]): The most documents to return, the reranker's own default if None
+    """
+    query: str
+    documents: frozenset[str]
+    top_k: Optional[int] = None
+
 class Reranker(ABC):
     __slots__: tuple[str, ...] = (
         LLMKeys.MODEL,
     )
     def __init__(self, reranker_details: RAGDetails) -> None:
         self.model: str = reranker_details.model
-    
+
+    def rerank(self, query: str, documents: frozenset[str], top_k: Optional[int] = None) -> tuple[str, ...]:
+        return self.rerank_many([RerankQuery(query=query, documents=documents, top_k=top_k)])[0]
+
     @abstractmethod
-    def rerank(self, query: str, documents: frozenset[str]) -> tuple[str, ...]:
+    def rerank_many(self, rerank_queries: list[RerankQuery]) -> list[tuple[str, ...]]:
+        """Rerank for several queries at once, in as few model invocations as the reranker allows"""
         raise NotImplementedError
 
 
 # EMBEDDERS
 class FastEmbed(Embedder):
+    """
+    The model is loaded on first use into the resident model cache, so it's shared by every FastEmbed with the same model and threads.
+    Embeddings are cached on disk by text, so only texts that were never embedded by the model are run through it
+    """
+    def _load_model(self) -> TextEmbedding:
+        return TextEmbedding(self.model, threads=self.threads or None)
+
     def embed(self, documents: frozenset[str]) -> list[ndarray]:
-        embedding_model = TextEmbedding(self.model)
-        embeddings = list(embedding_model.embed(documents))
-        return embeddings
+        texts: list[str] = list(documents)
+        embeddings: dict[str, ndarray] = embedding_cache.lookup(self.model, texts)
+        missing_texts: list[str] = [text for text in texts if text not in embeddings]
+        if missing_texts:
+            embedding_model: TextEmbedding = resident_model_cache.get((Providers.FAST_EMBED, self.model, self.threads), self._load_model)
+            new_embeddings: ndarray = numpy.asarray(list(embedding_model.embed(missing_texts, batch_size=self.batch_size)), dtype=numpy.float32)
+            embedding_cache.insert(self.model, missing_texts, new_embeddings)
+            embeddings.update(zip(missing_texts, new_embeddings))
+        return [embeddings[text] for text in texts]
 
 
 # RERANKERS
+@final
+@dataclass
+class _EncodedCollection:
+    """A resident ColBERT model and the hashes of the batch it last encoded"""
+    model: RAGPretrainedModel
+    hashes: set[str] = field(default_factory=set)
+    lock: Lock = field(default_factory=Lock)
+
 class Ragatouille(Reranker):
-    def rerank(self, query: str, documents: frozenset[str]) -> tuple[str, ...]:
-        reranker_model = RAGPretrainedModel.from_pretrained(self.model)
-        compatible_documents: list[str] = list(documents)
-        reranker_model.index(collection=compatible_documents, index_name="mockingbird")
-        results: list[dict[str, str | float]] = reranker_model.search(query)
-        reranker_model.clear_encoded_docs(force=True)
+    """
+    The model stays resident, and its in-memory collection only holds the documents of the batch being reranked,
+    so searches score the batch's candidates rather than everything encoded before.
+    A batch with the same documents as the last one searches the collection without encoding it again
+    """
+    def _load_collection(self) -> _EncodedCollection:
+        return _EncodedCollection(model=RAGPretrainedModel.from_pretrained(self.model))
+
+    def _encode(self, collection: _EncodedCollection, documents: set[str]) -> None:
+        candidates: dict[str, str] = {content_hash(document): document for document in documents}
+        if candidates.keys() == collection.hashes:
+            return
+        if collection.hashes:
+            collection.model.clear_encoded_docs(force=True)
+        collection.model.encode(list(candidates.values()))
+        collection.hashes = set(candidates)
+
+    @staticmethod
+    def _filter_results(results: list[dict[str, str | float]], documents: frozenset[str], top_k: int) -> tuple[str, ...]:
         reranked_documents: list[str] = []
         for result in results:
             content: str | float = result["content"]
             if isinstance(content, int | float):
                 continue
+            # The collection also holds the documents of the other queries in the batch
+            if content not in documents:
+                continue
             score: str | float = result["score"]
             if isinstance(score, str):
                 continue
             if score < 0:
                 continue
             reranked_documents.append(content)
+            if len(reranked_documents) == top_k:
+                break
         return tuple(reranked_documents)
 
+    def rerank_many(self, rerank_queries: list[RerankQuery]) -> list[tuple[str, ...]]:
+        documents: set[str] = set().union(*(rerank_query.documents for rerank_query in rerank_queries))
+        if not documents:
+            return [() for _ in rerank_queries]
+        collection: _EncodedCollection = resident_model_cache.get((Providers.RAGATOUILLE, self.model), self._load_collection)
+        reranked: list[tuple[str, ...]] = []
+        with collection.lock:
+            # The batch's documents are encoded in one pass before any of the searches
+            self._encode(collection, documents)
+            for rerank_query in rerank_queries:
+                if not rerank_query.documents:
+                    reranked.append(())
+                    continue
+                results: list[dict[str, str | float]] = collection.model.search_encoded_docs(rerank_query.query, k=len(collection.hashes))
+                top_k: int = rerank_query.top_k or RerankerDefaults.RAGATOUILLE_TOP_K
+                reranked.append(self._filter_results(results, rerank_query.documents, top_k))
+        return reranked
+
+@final
+@dataclass
+class _ScoredPairs:
+    """A resident cross encoder and its most recent (query hash, document hash) scores"""
+    model: SentenceCrossEncoder
+    scores: OrderedDict[tuple[str, str], float] = field(default_factory=OrderedDict)
+    lock: Lock = field(default_factory=Lock)
+
 class CrossEncoder(Reranker):
-    def rerank(self, query: str, documents: frozenset[str]) -> tuple[str, ...]:
-        # Load the model, here we use our base sized model
-        reranker_model = SentenceCrossEncoder(self.model)
-        compatible_documents: list[str] = list(documents)
-        results: list[dict[str, str | float]] = reranker_model.rank(query, compatible_documents, return_documents=True, top_k=3)
-        reranked_documents: list[str] = []
-        for result in results:
-            content: str | float = result["text"]
-            if isinstance(content, int | float):
-                continue
-            score: str | float = result["score"]
-            if isinstance(score, str):
-                continue
-            if score < 0:
-                continue
-            reranked_documents.append(content)
-        return tuple(reranked_documents)
+    """
+    Cross encoders score the query and document together, so there's no document encoding to reuse across queries.
+    The model stays resident instead, and only the query and document pairs it hasn't scored recently are scored
+    """
+    def _load_scorer(self) -> _ScoredPairs:
+        return _ScoredPairs(model=SentenceCrossEncoder(self.model))
+
+    def rerank_many(self, rerank_queries: list[RerankQuery]) -> list[tuple[str, ...]]:
+        if not any(rerank_query.documents for rerank_query in rerank_queries):
+            return [() for _ in rerank_queries]
+        scorer: _ScoredPairs = resident_model_cache.get((Providers.CROSS_ENCODER, self.model), self._load_scorer)
+        query_pairs: list[dict[tuple[str, str], str]] = []
+        texts: dict[tuple[str, str], tuple[str, str]] = {}
+        for rerank_query in rerank_queries:
+            query_hash: str = content_hash(rerank_query.query)
+            pairs: dict[tuple[str, str], str] = {(query_hash, content_hash(document)): document for document in rerank_query.documents}
+            query_pairs.append(pairs)
+            texts.update((pair, (rerank_query.query, document)) for pair, document in pairs.items())
+        scores: dict[tuple[str, str], float] = {}
+        with scorer.lock:
+            for pair in texts:
+                if pair in scorer.scores:
+                    scorer.scores.move_to_end(pair)
+                    scores[pair] = scorer.scores[pair]
+        new_pairs: list[tuple[str, str]] = [pair for pair in texts if pair not in scores]
+        if new_pairs:
+            # The new pairs of every query are scored in one prediction
+            new_scores: ndarray = scorer.model.predict([texts[pair] for pair in new_pairs])
+            scores.update(zip(new_pairs, (float(score) for score in new_scores)))
+            with scorer.lock:
+                for pair in new_pairs:
+                    scorer.scores[pair] = scores[pair]
+                while len(scorer.scores) > RerankerDefaults.MAX_CACHED_SCORES:
+                    scorer.scores.popitem(last=False)
+        reranked: list[tuple[str, ...]] = []
+        for rerank_query, pairs in zip(rerank_queries, query_pairs):
+            top_k: int = rerank_query.top_k or RerankerDefaults.CROSS_ENCODER_TOP_K
+            ranked_pairs: list[tuple[str, str]] = sorted(pairs, key=scores.__getitem__, reverse=True)[:top_k]
+            reranked.append(tuple(pairs[pair] for pair in ranked_pairs if scores[pair] >= 0))
+        return reranked
+
+
+# CASCADE
+@final
+@dataclass(frozen=True)
+class PruneQuery:
+    """
+    Attributes:
+        query (str): What the documents should be similar to
+        documents (frozenset[str]): The candidate documents
+        keep (Optional[int]): The most documents to keep, no limit if None
+        min_similarity (Optional[float]): The lowest cosine similarity kept, no threshold if None
+    """
+    query: str
+    documents: frozenset[str]
+    keep: Optional[int] = None
+    min_similarity: Optional[float] = None
+
+    @property
+    def needs_pruning(self) -> bool:
+        return self.min_similarity is not None or (self.keep is not None and len(self.documents) > self.keep)
+
+def prune_many_by_similarity(embedder: Embedder, prune_queries: list[PruneQuery]) -> list[frozenset[str]]:
+    """
+    Keep the documents most similar to each query by embedding, the cheap first stage before reranking.
+    Every query and document of the batch is embedded in one pass
+
+    Arguments:
+        embedder (Embedder): Embeds the queries and documents
+        prune_queries (list[PruneQuery]): The queries, their candidates and how to prune them
+
+    Returns:
+        list[frozenset[str]]: The kept documents of each query, in order
+    """
+    pruned_queries: list[PruneQuery] = [prune_query for prune_query in prune_queries if prune_query.needs_pruning]
+    if not pruned_queries:
+        return [prune_query.documents for prune_query in prune_queries]
+    texts: list[str] = list(dict.fromkeys(chain.from_iterable((prune_query.query, *prune_query.documents) for prune_query in pruned_queries)))
+    vectors: ndarray = embedder.embed_texts(texts)
+    vectors /= numpy.maximum(numpy.linalg.norm(vectors, axis=1, keepdims=True), numpy.finfo(numpy.float32).tiny)
+    rows: dict[str, int] = {text: row for row, text in enumerate(texts)}
+    kept_documents: list[frozenset[str]] = []
+    for prune_query in prune_queries:
+        if not prune_query.needs_pruning:
+            kept_documents.append(prune_query.documents)
+            continue
+        documents: list[str] = list(prune_query.documents)
+        similarities: ndarray = vectors[[rows[document] for document in documents]] @ vectors[rows[prune_query.query]]
+        kept: ndarray = numpy.argsort(-similarities)[:prune_query.keep]
+        if prune_query.min_similarity is not None:
+            kept = kept[similarities[kept] >= prune_query.min_similarity]
+        kept_documents.append(frozenset(documents[position] for position in kept))
+    return kept_documents
+
+def prune_by_similarity(
+    embedder: Embedder,
+    query: str,
+    documents: frozenset[str],
+    keep: Optional[int],
+    min_similarity: Optional[float] = None
+) -> frozenset[str]:
+    """Prune the documents of a single query, see prune_many_by_similarity"""
+    prune_query = PruneQuery(query=query, documents=documents, keep=keep, min_similarity=min_similarity)
+    return prune_many_by_similarity(embedder, [prune_query])[0]
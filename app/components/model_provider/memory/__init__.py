@@ -0,0 +1,2 @@
+from .engine import memory_engine, MemoryEngine
+from .index import VectorIndex
@@ -0,0 +1,137 @@
+# DEPENDENCIES
+## Built-In
+import json
+import os
+from threading import Lock
+from typing import final, Optional
+## Third-Party
+import numpy
+## Local
+from constants.model_provider import MemoryDefaults, ModelProviderPaths
+from constants.settings import DebugLevels
+from helpers import debug_print
+from ..llm.rag import Embedder, Reranker
+from .index import VectorIndex
+
+
+# CONSTANTS
+_LOAD_CHUNK: int = 1024
+
+
+# ENGINE
+@final
+class MemoryEngine:
+    """
+    Local long term memory, searched by embedding similarity and reranked
+
+    Memories are appended to a file on the model provider volume, and their embeddings are rebuilt from it on first
+    use and whenever the embedder's model changes, which the embedding cache serves from disk where it can
+
+    Attributes:
+        memories (list[str]): Every memory, in the order of their index rows
+        index (VectorIndex): The normalized embedding of every memory
+        embedding_model (Optional[str]): The model the index was embedded with, None until the memories are loaded
+
+    Methods:
+        add(embedder: Embedder, memories: list[str]) -> int: Embed and store the new memories, returning how many were new
+        query(embedder: Embedder, reranker: Reranker, context: str, top_k: int) -> tuple[str, ...]: The memories most relevant to the context
+    """
+    def __init__(self) -> None:
+        self.memories: list[str] = []
+        self.index = VectorIndex()
+        self.embedding_model: Optional[str] = None
+        self._known: set[str] = set()
+        self._lock = Lock()
+        self._load_lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self.memories)
+
+    # Storage
+    def _store(self, memories: list[str], vectors: numpy.ndarray) -> None:
+        self.index.add(vectors)
+        self.memories.extend(memories)
+        self._known.update(memories)
+
+    def _load(self, embedder: Embedder) -> None:
+        with self._load_lock:
+            if self.embedding_model == embedder.model:
+                return
+            with self._lock:
+                # Embeddings from different models can't share an index
+                self.memories = []
+                self.index = VectorIndex()
+                self._known = set()
+                self.embedding_model = None
+            saved: list[str] = []
+            if os.path.isfile(ModelProviderPaths.MEMORIES):
+                with open(ModelProviderPaths.MEMORIES, "r", encoding="utf-8") as memories_file:
+                    saved = list(dict.fromkeys(json.loads(line) for line in memories_file if line.strip()))
+            for start in range(0, len(saved), _LOAD_CHUNK):
+                chunk: list[str] = saved[start:start + _LOAD_CHUNK]
+                vectors: numpy.ndarray = embedder.embed_texts(chunk)
+                with self._lock:
+                    self._store(chunk, vectors)
+            with self._lock:
+                self.embedding_model = embedder.model
+            debug_print(f"Loaded {len(saved)} memories embedded with {embedder.model}...", DebugLevels.INFO)
+
+    # Interface
+    def add(self, embedder: Embedder, memories: list[str]) -> int:
+        """
+        Embed and store the memories that aren't stored yet
+
+        Arguments:
+            embedder (Embedder): The embedder of the current LLM stack
+            memories (list[str]): The memories to store
+
+        Returns:
+            int: The number of new memories stored
+        """
+        while True:
+            self._load(embedder)
+            new_memories: list[str] = [memory for memory in dict.fromkeys(memories) if memory not in self._known]
+            if not new_memories:
+                return 0
+            vectors: numpy.ndarray = embedder.embed_texts(new_memories)
+            with self._lock:
+                if self.embedding_model != embedder.model:
+                    # The index was rebuilt for another model while embedding
+                    continue
+                # Another add may have stored some of them while embedding
+                kept: list[int] = [position for position, memory in enumerate(new_memories) if memory not in self._known]
+                new_memories = [new_memories[position] for position in kept]
+                self._store(new_memories, vectors[kept])
+                os.makedirs(ModelProviderPaths.MEMORY, exist_ok=True)
+                with open(ModelProviderPaths.MEMORIES, "a", encoding="utf-8") as memories_file:
+                    memories_file.writelines(f"{json.dumps(memory)}\n" for memory in new_memories)
+            return len(new_memories)
+
+    def query(self, embedder: Embedder, reranker: Reranker, context: str, top_k: int = MemoryDefaults.TOP_K) -> tuple[str, ...]:
+        """
+        Find the memories most relevant to the context, by reranking the nearest memories by embedding
+
+        Arguments:
+            embedder (Embedder): The embedder of the current LLM stack
+            reranker (Reranker): The reranker of the current LLM stack
+            context (str): What the memories should be relevant to
+            top_k (int): The most memories to return
+
+        Returns:
+            tuple[str, ...]: The relevant memories, most relevant first
+        """
+        self._load(embedder)
+        if not self.memories:
+            return ()
+        query_vector: numpy.ndarray = embedder.embed_texts([context])[0]
+        with self._lock:
+            if self.embedding_model != embedder.model:
+                # The index is being rebuilt for another model
+                return ()
+            rows, _ = self.index.search(query_vector, max(top_k, MemoryDefaults.CANDIDATES))
+            candidates: frozenset[str] = frozenset(self.memories[row] for row in rows)
+        return reranker.rerank(context, candidates)[:top_k]
+
+
+# SHARED
+memory_engine = MemoryEngine()
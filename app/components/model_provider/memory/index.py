@@ -0,0 +1,146 @@
+# DEPENDENCIES
+## Built-In
+from itertools import chain
+from typing import final, Optional
+## Third-Party
+import numpy
+## Local
+from constants.model_provider import MemoryDefaults
+from constants.settings import DebugLevels
+from helpers import debug_print
+
+
+# HELPERS
+def normalize(vectors: numpy.ndarray) -> numpy.ndarray:
+    """Scale rows to unit length, so inner products are cosine similarities"""
+    vectors = numpy.asarray(vectors, dtype=numpy.float32)
+    norms: numpy.ndarray = numpy.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / numpy.maximum(norms, numpy.finfo(numpy.float32).tiny)
+
+def _top_k(scores: numpy.ndarray, k: int) -> numpy.ndarray:
+    """Positions of the k highest scores, highest first, without sorting every score"""
+    if k >= len(scores):
+        return numpy.argsort(-scores)
+    top: numpy.ndarray = numpy.argpartition(-scores, k)[:k]
+    return top[numpy.argsort(-scores[top])]
+
+def _nearest_centroids(vectors: numpy.ndarray, centroids: numpy.ndarray) -> numpy.ndarray:
+    assignments: numpy.ndarray = numpy.empty(len(vectors), dtype=numpy.int32)
+    for start in range(0, len(vectors), MemoryDefaults.ASSIGN_CHUNK_ROWS):
+        chunk: numpy.ndarray = vectors[start:start + MemoryDefaults.ASSIGN_CHUNK_ROWS]
+        assignments[start:start + len(chunk)] = numpy.argmax(chunk @ centroids.T, axis=1)
+    return assignments
+
+def _train_centroids(vectors: numpy.ndarray, list_count: int, generator: numpy.random.Generator) -> numpy.ndarray:
+    """Spherical k-means over a sample of the vectors"""
+    sample_size: int = min(len(vectors), list_count * MemoryDefaults.KMEANS_SAMPLES_PER_LIST)
+    sample: numpy.ndarray = vectors[generator.choice(len(vectors), sample_size, replace=False)]
+    centroids: numpy.ndarray = sample[generator.choice(sample_size, list_count, replace=False)].copy()
+    for _ in range(MemoryDefaults.KMEANS_ITERATIONS):
+        assignments: numpy.ndarray = _nearest_centroids(sample, centroids)
+        sums: numpy.ndarray = numpy.zeros_like(centroids)
+        numpy.add.at(sums, assignments, sample)
+        empty_lists: numpy.ndarray = numpy.flatnonzero(numpy.bincount(assignments, minlength=list_count) == 0)
+        # Empty lists are reseeded with random sample vectors
+        sums[empty_lists] = sample[generator.choice(sample_size, len(empty_lists))]
+        centroids = normalize(sums)
+    return centroids
+
+
+# INDEX
+@final
+class VectorIndex:
+    """
+    Array-backed index of normalized embeddings, searched by inner product
+
+    Searches score every vector at once until the index passes ivf_threshold, after which it's partitioned into
+    inverted lists around k-means centroids and searches only score the lists nearest the query.
+    The partitions are retrained whenever the index doubles in size since they were last trained
+
+    Attributes:
+        vectors (numpy.ndarray): The normalized vectors, with spare rows past size
+        size (int): The number of vectors held
+        ivf_threshold (int): The size above which searches use the inverted lists
+        centroids (Optional[numpy.ndarray]): The centroid of each inverted list, None while searches are exhaustive
+        lists (list[list[int]]): The rows assigned to each centroid
+
+    Methods:
+        add(vectors: numpy.ndarray) -> None: Normalize and append vectors
+        search(query: numpy.ndarray, k: int) -> tuple[numpy.ndarray, numpy.ndarray]: The rows and scores of the k nearest vectors
+    """
+    def __init__(self, ivf_threshold: int = MemoryDefaults.IVF_THRESHOLD) -> None:
+        self.vectors: numpy.ndarray = numpy.empty((0, 0), dtype=numpy.float32)
+        self.size: int = 0
+        self.ivf_threshold: int = ivf_threshold
+        self.centroids: Optional[numpy.ndarray] = None
+        self.lists: list[list[int]] = []
+        self._trained_size: int = 0
+        self._generator = numpy.random.default_rng(0)
+
+    def __len__(self) -> int:
+        return self.size
+
+    # Storage
+    def _reserve(self, rows: int, dimensions: int) -> None:
+        if not self.vectors.shape[1]:
+            self.vectors = numpy.empty((0, dimensions), dtype=numpy.float32)
+        if rows <= len(self.vectors):
+            return
+        capacity: int = max(rows, len(self.vectors) * MemoryDefaults.GROWTH_PERCENT // 100)
+        grown: numpy.ndarray = numpy.empty((capacity, dimensions), dtype=numpy.float32)
+        grown[:self.size] = self.vectors[:self.size]
+        self.vectors = grown
+
+    # Partitioning
+    def _train(self) -> None:
+        list_count: int = max(1, int(self.size ** 0.5))
+        debug_print(f"Partitioning {self.size} vectors into {list_count} lists...", DebugLevels.INFO)
+        active: numpy.ndarray = self.vectors[:self.size]
+        self.centroids = _train_centroids(active, list_count, self._generator)
+        assignments: numpy.ndarray = _nearest_centroids(active, self.centroids)
+        order: numpy.ndarray = numpy.argsort(assignments, kind="stable")
+        boundaries: numpy.ndarray = numpy.searchsorted(assignments[order], numpy.arange(list_count + 1))
+        self.lists = [order[boundaries[index]:boundaries[index + 1]].tolist() for index in range(list_count)]
+        self._trained_size = self.size
+
+    def _assign(self, start: int) -> None:
+        for offset, list_index in enumerate(_nearest_centroids(self.vectors[start:self.size], self.centroids)):
+            self.lists[list_index].append(start + offset)
+
+    # Interface
+    def add(self, vectors: numpy.ndarray) -> None:
+        vectors = normalize(vectors)
+        if not len(vectors):
+            return
+        start: int = self.size
+        self._reserve(start + len(vectors), vectors.shape[1])
+        self.vectors[start:start + len(vectors)] = vectors
+        self.size += len(vectors)
+        if self.size > self.ivf_threshold and self.size >= 2 * self._trained_size:
+            self._train()
+        elif self.centroids is not None:
+            self._assign(start)
+
+    def search(self, query: numpy.ndarray, k: int) -> tuple[numpy.ndarray, numpy.ndarray]:
+        """
+        Find the vectors nearest the query
+
+        Arguments:
+            query (numpy.ndarray): The query embedding, normalized here
+            k (int): The most results to return
+
+        Returns:
+            tuple[numpy.ndarray, numpy.ndarray]: The rows of the nearest vectors and their cosine similarities, most similar first
+        """
+        if not self.size:
+            return numpy.empty(0, dtype=numpy.int64), numpy.empty(0, dtype=numpy.float32)
+        query = normalize(query)
+        if self.centroids is None:
+            scores: numpy.ndarray = self.vectors[:self.size] @ query
+            top: numpy.ndarray = _top_k(scores, k)
+            return top, scores[top]
+        probed_lists: numpy.ndarray = _top_k(self.centroids @ query, MemoryDefaults.IVF_PROBES)
+        rows: numpy.ndarray = numpy.fromiter(chain.from_iterable(self.lists[index] for index in probed_lists), dtype=numpy.int64)
+        scores = self.vectors[rows] @ query
+        top = _top_k(scores, k)
+        return rows[top], scores[top]
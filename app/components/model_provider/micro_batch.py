@@ -0,0 +1,93 @@
+# DEPENDENCIES
+## Built-In
+import asyncio
+from typing import Callable, final, Generic, Optional, TypeVar
+## Third-Party
+from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
+## Local
+from constants.model_provider import MicroBatchDefaults
+
+
+# TYPES
+Request = TypeVar("Request")
+Result = TypeVar("Result")
+
+class MicroBatchStats(BaseModel):
+    """
+    Attributes:
+        requests (int): The requests submitted
+        batches (int): The model invocations they were gathered into
+        largest_batch (int): The most requests gathered into one invocation
+    """
+    requests: int
+    batches: int
+    largest_batch: int
+
+
+# MICRO BATCHING
+@final
+class MicroBatcher(Generic[Request, Result]):
+    """
+    Gathers the requests submitted within a short window, so concurrent requests share one model invocation
+
+    A batch runs once the window after its first request closes, or as soon as it's full.
+    A batch that fails fails every request in it
+
+    Attributes:
+        process (Callable[[list[Request]], list[Result]]): Runs a batch in the threadpool, returning a result per request in order
+        window_ms (int): How long a batch gathers requests after its first one
+        max_batch (int): The most requests in a batch
+
+    Methods:
+        submit(request: Request) -> Result: Add the request to the gathering batch and await its result
+        get_stats() -> MicroBatchStats: The request and batch counts
+    """
+    def __init__(
+        self,
+        process: Callable[[list[Request]], list[Result]],
+        window_ms: int = MicroBatchDefaults.WINDOW_MS,
+        max_batch: int = MicroBatchDefaults.MAX_BATCH
+    ) -> None:
+        self.process: Callable[[list[Request]], list[Result]] = process
+        self.window_ms: int = window_ms
+        self.max_batch: int = max_batch
+        self._gathering: list[tuple[Request, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._stats = MicroBatchStats(requests=0, batches=0, largest_batch=0)
+
+    def _flush(self) -> None:
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+        batch: list[tuple[Request, asyncio.Future]] = self._gathering
+        self._gathering = []
+        self._stats.batches += 1
+        self._stats.largest_batch = max(self._stats.largest_batch, len(batch))
+        asyncio.ensure_future(self._run(batch))
+
+    async def _run(self, batch: list[tuple[Request, asyncio.Future]]) -> None:
+        try:
+            results: list[Result] = await run_in_threadpool(self.process, [request for request, _ in batch])
+        except Exception as error:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(error)
+            return
+        for (_, future), result in zip(batch, results):
+            # Requests whose client disconnected were cancelled while waiting
+            if not future.done():
+                future.set_result(result)
+
+    async def submit(self, request: Request) -> Result:
+        future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self._gathering.append((request, future))
+        self._stats.requests += 1
+        if len(self._gathering) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.window_ms / 1000, self._flush)
+        return await future
+
+    def get_stats(self) -> MicroBatchStats:
+        return self._stats.model_copy()
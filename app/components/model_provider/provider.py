@@ -1,9 +1,11 @@
 # DEPENDENCIES
 ## Built-in
+from itertools import chain
 import os
 from time import sleep
-from typing import Any
+from typing import Any, Iterator, Optional
 ## Third-Party
+import numpy
 import toml
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEvent, FileSystemEventHandler
@@ -12,13 +14,17 @@ from constants.containers import VolumePaths
 from constants.generic import GenericKeys, TOMLConfig
 from constants.model_provider import (
     LLMKeys, LLMStackTypes, 
-    ModelProviderPaths, 
+    EmbeddingCacheDefaults, GenerationDefaults, ModelCacheDefaults, ModelProviderPaths, ResponseCacheDefaults,
     ModelTypes, Providers,
     OllamaModels, FastEmbedModels, RagatouilleModels
 )
 from constants.settings import DebugLevels
 from helpers import debug_print
-from .llm import LLMStack
+from .limiter import generation_limiter
+from .llm import embedding_cache, JSONSchema, LLM, LLMStack, prune_many_by_similarity, PruneQuery, RerankQuery, resident_model_cache
+from .memory import memory_engine
+from .resources import resource_engine
+from .response_cache import response_cache, ResponseCacheKey
 
 
 llm_stack: LLMStack
@@ -27,7 +33,8 @@ llm_stack: LLMStack
 # CONSTANTS
 BASE_CONFIG: TOMLConfig = {
     LLMKeys.BASE_INFORMATION: {
-        LLMKeys.CURRENT_MAPPING: GenericKeys.DEFAULT
+        LLMKeys.CURRENT_MAPPING: GenericKeys.DEFAULT,
+        LLMKeys.MAX_WAITING: GenerationDefaults.MAX_WAITING
     },
     GenericKeys.DEFAULT: {
         LLMStackTypes.GENERALIST: {
@@ -104,6 +111,28 @@ def _set_current_mapping(new_mapping: str) -> None:
     with open(ModelProviderPaths.CONFIG, "w", encoding="utf-8") as config_file:
         toml.dump(config, config_file)
 
+def _configure_base_information(config: TOMLConfig) -> None:
+    base_information: dict[str, Any] = config.get(LLMKeys.BASE_INFORMATION, {})
+    generation_limiter.configure(
+        limits=base_information.get(LLMKeys.CONCURRENCY, {}),
+        max_waiting=base_information.get(LLMKeys.MAX_WAITING, GenerationDefaults.MAX_WAITING)
+    )
+    cache_config: dict[str, Any] = base_information.get(LLMKeys.RESPONSE_CACHE, {})
+    response_cache.configure(
+        max_entries=cache_config.get(LLMKeys.MAX_ENTRIES, ResponseCacheDefaults.MAX_ENTRIES),
+        ttl=cache_config.get(LLMKeys.TTL, ResponseCacheDefaults.TTL),
+        cache_sampled=cache_config.get(LLMKeys.CACHE_SAMPLED, False),
+        persist=cache_config.get(LLMKeys.PERSIST, False)
+    )
+    model_cache_config: dict[str, Any] = base_information.get(LLMKeys.MODEL_CACHE, {})
+    resident_model_cache.configure(
+        max_memory_mb=model_cache_config.get(LLMKeys.MAX_MEMORY_MB, ModelCacheDefaults.MAX_MEMORY_MB),
+        max_models=model_cache_config.get(LLMKeys.MAX_MODELS, ModelCacheDefaults.MAX_MODELS),
+        idle_timeout=model_cache_config.get(LLMKeys.IDLE_TIMEOUT, ModelCacheDefaults.IDLE_TIMEOUT)
+    )
+    embedding_cache_config: dict[str, Any] = base_information.get(LLMKeys.EMBEDDING_CACHE, {})
+    embedding_cache.configure(max_entries=embedding_cache_config.get(LLMKeys.MAX_ENTRIES, EmbeddingCacheDefaults.MAX_ENTRIES))
+
 def _setup() -> None:
     global llm_stack
     
@@ -111,6 +140,7 @@ def _setup() -> None:
         print("Config file exists. Reading...", DebugLevels.INFO)
         with open(ModelProviderPaths.CONFIG, "r", encoding="utf-8") as config_file:
             existing_config: TOMLConfig = toml.load(config_file)
+            _configure_base_information(existing_config)
             base_information: dict[str, Any] = existing_config.get(LLMKeys.BASE_INFORMATION, {})
             current_mapping: str = base_information.get(LLMKeys.CURRENT_MAPPING, GenericKeys.NONE)
             if current_mapping in existing_config.keys():
@@ -158,6 +188,7 @@ class MonitorConfig(FileSystemEventHandler):
             return None
         try:
             print("Config file modified. Checking if valid...", DebugLevels.INFO)
+            _configure_base_information(self._get_config())
             if not self._valid_config_change():
                 print("Invalid config change. Restoring...", DebugLevels.INFO)
                 return
@@ -167,7 +198,9 @@ class MonitorConfig(FileSystemEventHandler):
             config: TOMLConfig = self._get_config()
             current_mapping: str = config[LLMKeys.BASE_INFORMATION][LLMKeys.CURRENT_MAPPING]
             provider_map: dict[str, dict[str, str]] = config[current_mapping]
+            previous_stack: LLMStack = llm_stack
             llm_stack = LLMStack(provider_map)
+            previous_stack.close()
         except Exception as error:
             raise error
 
@@ -178,6 +211,7 @@ def startup() -> None:
     observer = Observer()
     observer.schedule(event_handler=event_handler, path=f"{VolumePaths.HOST_MODEL_PROVIDER}", recursive=False)
     observer.start()
+    resource_engine.start(get_embedder=lambda: llm_stack.embedder)
     print("Listening for config changes...")
     try:
         while True:
@@ -189,8 +223,86 @@ def startup() -> None:
     finally:
         observer.stop()
         observer.join()
+        resource_engine.stop()
 
 
 # MAIN
+def _cache_key(llm: LLM, stack_type: str, system_prompt: str, assistant_begin: str) -> Optional[ResponseCacheKey]:
+    if not response_cache.is_cacheable(llm.temperature):
+        return None
+    return response_cache.make_key(stack_type, llm.model, llm.temperature, assistant_begin, system_prompt)
+
+def cached_response(stack_type: str, system_prompt: str, assistant_begin: str) -> Optional[str]:
+    """The cached response for the prompt if there is one, checked before waiting for a generation slot"""
+    cache_key: Optional[ResponseCacheKey] = _cache_key(getattr(llm_stack, stack_type), stack_type, system_prompt, assistant_begin)
+    if cache_key is None:
+        return None
+    response: Optional[str] = response_cache.get(cache_key)
+    if response is not None:
+        debug_print(f"Serving cached response for {stack_type}...", DebugLevels.INFO)
+    return response
+
 def generate_response(stack_type: str, system_prompt: str, assistant_begin: str) -> str:
-    return getattr(llm_stack, stack_type).generate(system_prompt=system_prompt, assistant_begin=assistant_begin)
+    """Always generates, the cache is checked with cached_response first, and the response is cached when it's cacheable"""
+    llm: LLM = getattr(llm_stack, stack_type)
+    with llm.lease():
+        response: str = llm.generate(system_prompt=system_prompt, assistant_begin=assistant_begin)
+    cache_key: Optional[ResponseCacheKey] = _cache_key(llm, stack_type, system_prompt, assistant_begin)
+    if cache_key is not None:
+        response_cache.put(cache_key, response)
+    return response
+
+def stream_response(
+    stack_type: str,
+    system_prompt: str,
+    assistant_begin: str,
+    temperature: Optional[float] = None,
+    seed: Optional[int] = None,
+    response_schema: Optional[JSONSchema] = None
+) -> Iterator[str]:
+    """Plain streams that complete are cached like generations, as the assistant_begin followed by the streamed text"""
+    llm: LLM = getattr(llm_stack, stack_type)
+    is_plain: bool = temperature is None and seed is None and not response_schema
+    cache_key: Optional[ResponseCacheKey] = _cache_key(llm, stack_type, system_prompt, assistant_begin) if is_plain else None
+    chunks: list[str] = []
+    with llm.lease():
+        for chunk in llm.stream(
+            system_prompt=system_prompt,
+            assistant_begin=assistant_begin,
+            temperature=temperature,
+            seed=seed,
+            response_schema=response_schema
+        ):
+            chunks.append(chunk)
+            yield chunk
+    # Streams closed before they complete never get here
+    if cache_key is not None:
+        response_cache.put(cache_key, "".join((assistant_begin, *chunks)))
+
+def remember(memories: list[str]) -> int:
+    return memory_engine.add(embedder=llm_stack.embedder, memories=memories)
+
+def recall(context: str, top_k: int) -> tuple[str, ...]:
+    return memory_engine.query(embedder=llm_stack.embedder, reranker=llm_stack.reranker, context=context, top_k=top_k)
+
+def find_resources(context: str, top_k: int) -> tuple[str, ...]:
+    return resource_engine.query(embedder=llm_stack.embedder, reranker=llm_stack.reranker, context=context, top_k=top_k)
+
+def embed_batch(text_batches: list[list[str]]) -> list[numpy.ndarray]:
+    """Embed several requests' texts in one pass, returning a float32 matrix per request"""
+    texts: list[str] = list(dict.fromkeys(chain.from_iterable(text_batches)))
+    if not texts:
+        return [numpy.empty((0, 0), dtype=numpy.float32) for _ in text_batches]
+    vectors: numpy.ndarray = llm_stack.embedder.embed_texts(texts)
+    rows: dict[str, int] = {text: row for row, text in enumerate(texts)}
+    return [vectors[[rows[text] for text in batch]] for batch in text_batches]
+
+def prune_batch(prune_queries: list[PruneQuery]) -> list[frozenset[str]]:
+    return prune_many_by_similarity(llm_stack.embedder, prune_queries)
+
+def rerank_batch(rerank_queries: list[RerankQuery]) -> list[tuple[str, ...]]:
+    return llm_stack.reranker.rerank_many(rerank_queries)
+
+def is_constrained(stack_type: str, response_schema: Optional[JSONSchema]) -> bool:
+    """Whether a response for the stack type will be constrained to the response schema"""
+    return bool(response_schema) and getattr(llm_stack, stack_type).constrained_decoding
@@ -0,0 +1,2 @@
+from .bm25 import BM25Index
+from .engine import resource_engine, ResourceEngine
@@ -0,0 +1,90 @@
+# DEPENDENCIES
+## Built-In
+from collections import Counter, defaultdict
+import heapq
+from math import log
+from operator import itemgetter
+import re
+from typing import final
+
+
+# CONSTANTS
+K1: float = 1.2
+B: float = 0.75
+_TOKEN_PATTERN = re.compile(r"\w+")
+
+
+# HELPERS
+def tokenize(text: str) -> list[str]:
+    return _TOKEN_PATTERN.findall(text.lower())
+
+
+# INDEX
+@final
+class BM25Index:
+    """
+    Inverted index scored with Okapi BM25, updated one document at a time instead of being rebuilt
+
+    Attributes:
+        postings (dict[str, dict[int, int]]): How often each term appears in each document containing it
+        lengths (dict[int, int]): The number of terms in each document
+        total_length (int): The number of terms across every document
+
+    Methods:
+        add(document: int, text: str) -> None: Index a document
+        remove(document: int) -> None: Remove a document from the index
+        search(query: str, k: int) -> list[tuple[int, float]]: The k best scoring documents and their scores
+    """
+    def __init__(self, k1: float = K1, b: float = B) -> None:
+        self.postings: dict[str, dict[int, int]] = {}
+        self.lengths: dict[int, int] = {}
+        self.total_length: int = 0
+        self._k1: float = k1
+        self._b: float = b
+        self._terms: dict[int, tuple[str, ...]] = {}
+
+    def __len__(self) -> int:
+        return len(self.lengths)
+
+    def add(self, document: int, text: str) -> None:
+        self.remove(document)
+        term_counts: Counter[str] = Counter(tokenize(text))
+        for term, count in term_counts.items():
+            self.postings.setdefault(term, {})[document] = count
+        self._terms[document] = tuple(term_counts)
+        self.lengths[document] = sum(term_counts.values())
+        self.total_length += self.lengths[document]
+
+    def remove(self, document: int) -> None:
+        for term in self._terms.pop(document, ()):
+            postings: dict[int, int] = self.postings[term]
+            del postings[document]
+            if not postings:
+                del self.postings[term]
+        self.total_length -= self.lengths.pop(document, 0)
+
+    def search(self, query: str, k: int) -> list[tuple[int, float]]:
+        """
+        Score the documents containing any of the query terms
+
+        Arguments:
+            query (str): The text to match
+            k (int): The most results to return
+
+        Returns:
+            list[tuple[int, float]]: The best scoring documents and their scores, best first
+        """
+        if not self.lengths:
+            return []
+        document_count: int = len(self.lengths)
+        average_length: float = max(self.total_length / document_count, 1.0)
+        scores: defaultdict[int, float] = defaultdict(float)
+        for term in set(tokenize(query)):
+            postings: dict[int, int] = self.postings.get(term, {})
+            if not postings:
+                continue
+            idf: float = log(1 + (document_count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for document, count in postings.items():
+                length_norm: float = self._k1 * (1 - self._b + self._b * self.lengths[document] / average_length)
+                scores[document] += idf * count * (self._k1 + 1) / (count + length_norm)
+        return heapq.nlargest(k, scores.items(), key=itemgetter(1))
@@ -0,0 +1,311 @@
+# DEPENDENCIES
+## Built-In
+from collections import defaultdict
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+import heapq
+import os
+import re
+from threading import Event, Lock, Thread
+from typing import Callable, final, Optional
+## Third-Party
+import numpy
+from watchdog.events import FileSystemEvent, FileSystemEventHandler, FileSystemMovedEvent
+from watchdog.observers import Observer
+## Local
+from constants.containers import VolumePaths
+from constants.model_provider import ModelProviderPaths, RESOURCE_EXTENSIONS, ResourceDefaults
+from constants.settings import DebugLevels
+from helpers import debug_print
+from ..llm.rag import Embedder, Reranker
+from ..memory import VectorIndex
+from .bm25 import BM25Index
+
+
+# PASSAGES
+_BLOCK_SEPARATOR = re.compile(r"\n\s*\n")
+
+def _split_passages(text: str) -> list[str]:
+    """Split text into passages of whole paragraphs where possible, up to the passage length"""
+    passages: list[str] = []
+    current: str = ""
+    for block in _BLOCK_SEPARATOR.split(text):
+        block = block.strip()
+        for start in range(0, len(block), ResourceDefaults.PASSAGE_CHARACTERS):
+            piece: str = block[start:start + ResourceDefaults.PASSAGE_CHARACTERS]
+            if current and len(current) + len(piece) + 2 > ResourceDefaults.PASSAGE_CHARACTERS:
+                passages.append(current)
+                current = piece
+            else:
+                current = f"{current}\n\n{piece}" if current else piece
+    if current:
+        passages.append(current)
+    return passages
+
+def _read_passages(path: str) -> list[str]:
+    """The passages of a resource file, none for files that aren't indexed"""
+    if not path.endswith(RESOURCE_EXTENSIONS):
+        return []
+    try:
+        if os.path.getsize(path) > ResourceDefaults.MAX_FILE_BYTES:
+            return []
+        with open(path, "r", encoding="utf-8", errors="replace") as resource_file:
+            return _split_passages(resource_file.read())
+    except OSError:
+        # Removed before it could be read, its own event removes it
+        return []
+
+
+# TYPES
+@final
+@dataclass
+class Passage:
+    """
+    Attributes:
+        path (str): The file the passage is from
+        text (str): The passage
+    """
+    path: str
+    text: str
+
+
+# EVENTS
+@final
+class _ResourceEvents(FileSystemEventHandler):
+    def __init__(self, on_change: Callable[[str], None]) -> None:
+        self.on_change: Callable[[str], None] = on_change
+
+    def on_created(self, event: FileSystemEvent) -> None:
+        self.on_change(event.src_path)
+
+    def on_modified(self, event: FileSystemEvent) -> None:
+        # Directories are modified whenever their files are, which have their own events
+        if not event.is_directory:
+            self.on_change(event.src_path)
+
+    def on_deleted(self, event: FileSystemEvent) -> None:
+        self.on_change(event.src_path)
+
+    def on_moved(self, event: FileSystemMovedEvent) -> None:
+        self.on_change(event.src_path)
+        self.on_change(event.dest_path)
+
+
+# ENGINE
+@final
+class ResourceEngine:
+    """
+    Local retrieval over the files in the resource folders, combining a BM25 index and an embedding index
+
+    The indexes are kept up to date from file system events, so only new, changed and removed files are indexed again.
+    Queries search both indexes in parallel, fuse the results with reciprocal rank fusion and rerank the best of them
+
+    Attributes:
+        folders (tuple[str, ...]): The folders whose files are indexed
+        passages (dict[int, Passage]): Every indexed passage by ID
+        lexical_index (BM25Index): The passages by term
+        vector_index (VectorIndex): The passage embeddings, including the rows of removed passages
+        embedding_model (Optional[str]): The model the passages were embedded with
+
+    Methods:
+        start(get_embedder: Callable[[], Embedder]) -> None: Index the resource folders and watch them for changes
+        stop() -> None: Stop watching the resource folders
+        notify(path: str) -> None: Queue a file or folder to be indexed again
+        query(embedder: Embedder, reranker: Reranker, context: str, top_k: int) -> tuple[str, ...]: The passages most relevant to the context
+    """
+    def __init__(self, folders: tuple[str, ...] = (ModelProviderPaths.RESOURCES,)) -> None:
+        self.folders: tuple[str, ...] = tuple(os.path.abspath(folder) for folder in folders)
+        self.passages: dict[int, Passage] = {}
+        self.lexical_index = BM25Index()
+        self.vector_index = VectorIndex()
+        self.embedding_model: Optional[str] = None
+        self._file_passages: dict[str, list[int]] = {}
+        self._row_passages: list[Optional[int]] = []
+        self._passage_rows: dict[int, int] = {}
+        self._next_passage: int = 0
+        self._lock = Lock()
+        self._searches = ThreadPoolExecutor(max_workers=ResourceDefaults.SEARCH_THREADS, thread_name_prefix="resource_search")
+        self._get_embedder: Optional[Callable[[], Embedder]] = None
+        self._pending: set[str] = set()
+        self._pending_lock = Lock()
+        self._has_pending = Event()
+        self._stopping = Event()
+        self._indexer: Optional[Thread] = None
+        self._observer: Optional[Observer] = None
+
+    # Storage
+    def _remove_file(self, path: str) -> None:
+        for passage_id in self._file_passages.pop(path, []):
+            self.lexical_index.remove(passage_id)
+            self._row_passages[self._passage_rows.pop(passage_id)] = None
+            del self.passages[passage_id]
+
+    def _add_file(self, path: str, texts: list[str], vectors: numpy.ndarray) -> None:
+        passage_ids: list[int] = list(range(self._next_passage, self._next_passage + len(texts)))
+        self._next_passage += len(texts)
+        for passage_id, text in zip(passage_ids, texts):
+            self.passages[passage_id] = Passage(path=path, text=text)
+            self.lexical_index.add(passage_id, text)
+            self._passage_rows[passage_id] = len(self._row_passages)
+            self._row_passages.append(passage_id)
+        self.vector_index.add(vectors)
+        self._file_passages[path] = passage_ids
+
+    def _rebuild_vector_index(self) -> None:
+        live_rows: list[int] = [row for row, passage_id in enumerate(self._row_passages) if passage_id is not None]
+        debug_print(f"Rebuilding the resource vector index around {len(live_rows)} passages...", DebugLevels.INFO)
+        vector_index = VectorIndex()
+        vector_index.add(self.vector_index.vectors[live_rows])
+        self.vector_index = vector_index
+        self._row_passages = [self._row_passages[row] for row in live_rows]
+        self._passage_rows = {passage_id: row for row, passage_id in enumerate(self._row_passages)}
+
+    def _clear(self) -> None:
+        self.passages.clear()
+        self.lexical_index = BM25Index()
+        self.vector_index = VectorIndex()
+        self._file_passages.clear()
+        self._row_passages.clear()
+        self._passage_rows.clear()
+
+    # Indexing
+    def _index_file(self, embedder: Embedder, path: str) -> None:
+        texts: list[str] = _read_passages(path)
+        # Unchanged passages of changed files are served by the embedding cache
+        vectors: numpy.ndarray = embedder.embed_texts(texts) if texts else numpy.empty((0, 0), dtype=numpy.float32)
+        with self._lock:
+            self._remove_file(path)
+            if texts:
+                self._add_file(path, texts, vectors)
+
+    def _refresh(self, embedder: Embedder, path: str) -> None:
+        if os.path.isfile(path):
+            self._index_file(embedder, path)
+            return
+        folder_prefix: str = f"{path}{os.sep}"
+        with self._lock:
+            removed: list[str] = [indexed_path for indexed_path in self._file_passages if indexed_path.startswith(folder_prefix)]
+            self._remove_file(path)
+            for indexed_path in removed:
+                self._remove_file(indexed_path)
+        # New folders, including ones moved in, only have an event for the folder itself
+        for folder, _, file_names in os.walk(path):
+            for file_name in file_names:
+                self._index_file(embedder, os.path.join(folder, file_name))
+
+    def _take_pending(self) -> set[str]:
+        with self._pending_lock:
+            pending: set[str] = self._pending
+            self._pending = set()
+            self._has_pending.clear()
+        return pending
+
+    def _index_pending(self) -> None:
+        while self._has_pending.wait() and not self._stopping.is_set():
+            # Waiting lets a burst of events for the same files collapse into one pass
+            if self._stopping.wait(ResourceDefaults.DEBOUNCE_MS / 1000):
+                return
+            embedder: Embedder = self._get_embedder()
+            pending: set[str] = self._take_pending()
+            if embedder.model != self.embedding_model:
+                # Embeddings from different models can't share an index, so everything is indexed again
+                with self._lock:
+                    self._clear()
+                    self.embedding_model = embedder.model
+                pending = set(self.folders)
+            for path in sorted(pending):
+                try:
+                    self._refresh(embedder, path)
+                except Exception as error:
+                    debug_print(f"Failed to index {path}: {error}...", DebugLevels.ERROR)
+            with self._lock:
+                dead_rows: int = len(self._row_passages) - len(self._passage_rows)
+                if dead_rows * 100 > len(self._row_passages) * ResourceDefaults.REBUILD_DEAD_PERCENT:
+                    self._rebuild_vector_index()
+            debug_print(f"Indexed {len(self.passages)} resource passages...", DebugLevels.INFO)
+
+    # Searching
+    def _lexical_search(self, context: str) -> list[int]:
+        with self._lock:
+            return [passage_id for passage_id, _ in self.lexical_index.search(context, ResourceDefaults.CANDIDATES)]
+
+    def _vector_search(self, embedder: Embedder, context: str) -> list[int]:
+        query_vector: numpy.ndarray = embedder.embed_texts([context])[0]
+        with self._lock:
+            if embedder.model != self.embedding_model:
+                if self.embedding_model is not None:
+                    # Wakes the indexer to index everything again with the new model
+                    self._has_pending.set()
+                return []
+            # Removed passages keep their rows until the index is rebuilt, so enough extra rows are searched to skip them
+            dead_rows: int = len(self._row_passages) - len(self._passage_rows)
+            rows, _ = self.vector_index.search(query_vector, ResourceDefaults.CANDIDATES + dead_rows)
+            passage_ids: list[int] = [self._row_passages[row] for row in rows if self._row_passages[row] is not None]
+        return passage_ids[:ResourceDefaults.CANDIDATES]
+
+    @staticmethod
+    def _fuse(*rankings: list[int]) -> list[int]:
+        """Reciprocal rank fusion, which needs no calibration between the scores of different searches"""
+        fused_scores: defaultdict[int, float] = defaultdict(float)
+        for ranking in rankings:
+            for rank, passage_id in enumerate(ranking, start=1):
+                fused_scores[passage_id] += 1 / (ResourceDefaults.RRF_K + rank)
+        return heapq.nlargest(ResourceDefaults.FUSED_CANDIDATES, fused_scores, key=fused_scores.__getitem__)
+
+    # Interface
+    def start(self, get_embedder: Callable[[], Embedder]) -> None:
+        self._get_embedder = get_embedder
+        self._stopping.clear()
+        self._observer = Observer()
+        for folder in self.folders:
+            os.makedirs(folder, exist_ok=True)
+            self._observer.schedule(event_handler=_ResourceEvents(self.notify), path=folder, recursive=True)
+        self._observer.start()
+        self._indexer = Thread(target=self._index_pending, name="resource_indexer", daemon=True)
+        self._indexer.start()
+        self.notify(*self.folders)
+
+    def stop(self) -> None:
+        self._stopping.set()
+        self._has_pending.set()
+        if self._observer:
+            self._observer.stop()
+            self._observer.join()
+        if self._indexer:
+            self._indexer.join()
+
+    def notify(self, *paths: str) -> None:
+        with self._pending_lock:
+            self._pending.update(os.path.abspath(path) for path in paths)
+            self._has_pending.set()
+
+    def query(self, embedder: Embedder, reranker: Reranker, context: str, top_k: int = ResourceDefaults.TOP_K) -> tuple[str, ...]:
+        """
+        Find the passages most relevant to the context, by reranking the fused results of a lexical and a vector search
+
+        Arguments:
+            embedder (Embedder): The embedder of the current LLM stack
+            reranker (Reranker): The reranker of the current LLM stack
+            context (str): What the passages should be relevant to
+            top_k (int): The most passages to return
+
+        Returns:
+            tuple[str, ...]: The relevant passages prefixed by their file, most relevant first
+        """
+        lexical_search: Future = self._searches.submit(self._lexical_search, context)
+        vector_ranking: list[int] = self._vector_search(embedder, context)
+        fused_ranking: list[int] = self._fuse(lexical_search.result(), vector_ranking)
+        with self._lock:
+            candidates: dict[str, Passage] = {}
+            for passage_id in fused_ranking:
+                passage: Optional[Passage] = self.passages.get(passage_id)
+                if passage:
+                    candidates.setdefault(passage.text, passage)
+        if not candidates:
+            return ()
+        ranked_texts: tuple[str, ...] = reranker.rerank(context, frozenset(candidates))[:top_k]
+        return tuple(f"{os.path.relpath(candidates[text].path, VolumePaths.HOST)}: {text}" for text in ranked_texts)
+
+
+# SHARED
+resource_engine = ResourceEngine()
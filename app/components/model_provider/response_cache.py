@@ -0,0 +1,181 @@
+# DEPENDENCIES
+## Built-In
+from collections import OrderedDict
+from hashlib import sha256
+import json
+import os
+from threading import Lock
+from time import time
+from typing import final, Optional
+## Third-Party
+from pydantic import BaseModel
+## Local
+from constants.model_provider import ModelProviderPaths, ResponseCacheDefaults
+from constants.settings import DebugLevels
+from helpers import debug_print
+
+
+# TYPES
+ResponseCacheKey = tuple[str, str, float, str, str]
+"""(stack type, model, temperature, assistant_begin, prompt hash)"""
+
+CachedResponse = tuple[str, float]
+"""(response, time cached)"""
+
+class ResponseCacheStats(BaseModel):
+    """
+    Attributes:
+        entries (int): The responses held
+        max_entries (int): The most responses held before the least recently used are evicted
+        hits (int): The generations served from the cache
+        misses (int): The cacheable generations that had to be generated
+        evictions (int): The responses evicted to stay under max_entries
+        expirations (int): The responses dropped for being older than the TTL
+    """
+    entries: int
+    max_entries: int
+    hits: int
+    misses: int
+    evictions: int
+    expirations: int
+
+
+# CACHE
+@final
+class ResponseCache:
+    """
+    LRU cache of generated responses with a TTL, keyed by everything that decides the response
+
+    Only responses generated at temperature 0 are served from the cache, unless cache_sampled is set
+
+    Attributes:
+        max_entries (int): The most responses held, 0 disables the cache
+        ttl (int): How long a response is served for in seconds
+        cache_sampled (bool): Whether responses generated at a temperature above 0 are also served
+        persist (bool): Whether responses are saved to the model provider volume, so restarts start warm
+        responses (OrderedDict[ResponseCacheKey, CachedResponse]): The cached responses, least recently used first
+
+    Methods:
+        configure(max_entries: int, ttl: int, cache_sampled: bool, persist: bool) -> None: Apply the cache settings, loading saved responses if persisted
+        make_key(stack_type: str, model: str, temperature: float, assistant_begin: str, system_prompt: str) -> ResponseCacheKey: Key a generation
+        is_cacheable(temperature: float) -> bool: Whether generations at the temperature use the cache
+        get(key: ResponseCacheKey) -> Optional[str]: The cached response, if there is a fresh one
+        put(key: ResponseCacheKey, response: str) -> None: Cache a response
+        save() -> None: Save the cached responses to the model provider volume
+        get_stats() -> ResponseCacheStats: The hit, miss and eviction counts
+    """
+    def __init__(self) -> None:
+        self.max_entries: int = ResponseCacheDefaults.MAX_ENTRIES
+        self.ttl: int = ResponseCacheDefaults.TTL
+        self.cache_sampled: bool = False
+        self.persist: bool = False
+        self.responses: OrderedDict[ResponseCacheKey, CachedResponse] = OrderedDict()
+        self.hits: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
+        self.expirations: int = 0
+        self._unsaved: int = 0
+        self._lock = Lock()
+
+    # Settings
+    def configure(self, max_entries: int, ttl: int, cache_sampled: bool, persist: bool) -> None:
+        with self._lock:
+            self.max_entries = max(0, max_entries)
+            self.ttl = ttl
+            self.cache_sampled = cache_sampled
+            load: bool = persist and not self.persist
+            self.persist = persist
+            self._evict()
+        if load:
+            self._load()
+
+    @staticmethod
+    def make_key(stack_type: str, model: str, temperature: float, assistant_begin: str, system_prompt: str) -> ResponseCacheKey:
+        prompt_hash: str = sha256(system_prompt.encode("utf-8")).hexdigest()
+        return (stack_type, model, float(temperature), assistant_begin, prompt_hash)
+
+    def is_cacheable(self, temperature: float) -> bool:
+        return self.max_entries > 0 and (temperature == 0 or self.cache_sampled)
+
+    # Eviction
+    def _evict(self) -> None:
+        while len(self.responses) > self.max_entries:
+            self.responses.popitem(last=False)
+            self.evictions += 1
+
+    def _is_fresh(self, cached: CachedResponse, now: float) -> bool:
+        return now - cached[1] < self.ttl
+
+    # Interface
+    def get(self, key: ResponseCacheKey) -> Optional[str]:
+        with self._lock:
+            cached: Optional[CachedResponse] = self.responses.get(key)
+            if cached is None:
+                self.misses += 1
+                return None
+            if not self._is_fresh(cached, time()):
+                del self.responses[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self.responses.move_to_end(key)
+            self.hits += 1
+            return cached[0]
+
+    def put(self, key: ResponseCacheKey, response: str) -> None:
+        with self._lock:
+            self.responses[key] = (response, time())
+            self.responses.move_to_end(key)
+            self._evict()
+            self._unsaved += 1
+            save: bool = self.persist and self._unsaved >= ResponseCacheDefaults.PERSIST_EVERY
+        if save:
+            self.save()
+
+    def get_stats(self) -> ResponseCacheStats:
+        with self._lock:
+            return ResponseCacheStats(
+                entries=len(self.responses),
+                max_entries=self.max_entries,
+                hits=self.hits,
+                misses=self.misses,
+                evictions=self.evictions,
+                expirations=self.expirations
+            )
+
+    # Persistence
+    def save(self) -> None:
+        """Write the fresh responses atomically, so a crash mid-save never leaves a corrupt cache"""
+        if not self.persist:
+            return
+        with self._lock:
+            now: float = time()
+            saved: list[list] = [[*key, *cached] for key, cached in self.responses.items() if self._is_fresh(cached, now)]
+            self._unsaved = 0
+        os.makedirs(ModelProviderPaths.CACHE, exist_ok=True)
+        temporary_path: str = f"{ModelProviderPaths.RESPONSE_CACHE}.tmp"
+        with open(temporary_path, "w", encoding="utf-8") as cache_file:
+            json.dump(saved, cache_file)
+        os.replace(temporary_path, ModelProviderPaths.RESPONSE_CACHE)
+        debug_print(f"Saved {len(saved)} cached responses...", DebugLevels.INFO)
+
+    def _load(self) -> None:
+        if not os.path.isfile(ModelProviderPaths.RESPONSE_CACHE):
+            return
+        try:
+            with open(ModelProviderPaths.RESPONSE_CACHE, "r", encoding="utf-8") as cache_file:
+                saved: list[list] = json.load(cache_file)
+        except (OSError, ValueError) as error:
+            debug_print(f"Could not load the response cache, starting cold: {error}", DebugLevels.WARNING)
+            return
+        now: float = time()
+        with self._lock:
+            for stack_type, model, temperature, assistant_begin, prompt_hash, response, cached_at in saved:
+                if now - cached_at < self.ttl:
+                    self.responses[(stack_type, model, temperature, assistant_begin, prompt_hash)] = (response, cached_at)
+            self._evict()
+        debug_print(f"Loaded {len(self.responses)} cached responses...", DebugLevels.INFO)
+
+
+# SHARED
+response_cache = ResponseCache()
@@ -0,0 +1,189 @@
+# DEPENDENCIES
+## Built-In
+import asyncio
+from typing import Any, AsyncIterator, Awaitable, Callable, final, Hashable, Optional, TypeVar
+## Third-Party
+from pydantic import BaseModel
+## Local
+from constants.settings import DebugLevels
+from helpers import debug_print
+
+
+# TYPES
+Result = TypeVar("Result")
+
+class SingleFlightStats(BaseModel):
+    """
+    Attributes:
+        in_flight (int): The calls and streams running now
+        started (int): The calls and streams that were started
+        joined (int): The requests that attached to one already running instead of starting their own
+    """
+    in_flight: int
+    started: int
+    joined: int
+
+
+# SHARED STREAMS
+@final
+class _SharedStream:
+    def __init__(self, start: Callable[[], AsyncIterator[str]], on_done: Callable[["_SharedStream"], None]) -> None:
+        self.start: Callable[[], AsyncIterator[str]] = start
+        self.on_done: Callable[[_SharedStream], None] = on_done
+        self.chunks: list[str] = []
+        self.done: bool = False
+        self.cancelled: bool = False
+        self.error: Optional[BaseException] = None
+        self.subscribers: int = 0
+        self.changed = asyncio.Condition()
+        self.task: Optional[asyncio.Task] = None
+
+    async def _produce(self) -> None:
+        try:
+            async for chunk in self.start():
+                async with self.changed:
+                    self.chunks.append(chunk)
+                    self.changed.notify_all()
+        except Exception as error:
+            self.error = error
+        finally:
+            self.done = True
+            self.on_done(self)
+            async with self.changed:
+                self.changed.notify_all()
+
+    def join(self) -> None:
+        if self.cancelled:
+            raise RuntimeError("The shared stream was cancelled before this request joined it!")
+        self.subscribers += 1
+
+    def leave(self) -> None:
+        self.subscribers -= 1
+        if not self.subscribers and not self.done:
+            self.cancelled = True
+            self.on_done(self)
+            if self.task:
+                self.task.cancel()
+
+    async def iterate(self) -> AsyncIterator[str]:
+        """
+        The stream only starts once a subscriber starts iterating, so requests that never stream start nothing.
+        Late subscribers get every chunk produced so far before the new ones
+        """
+        if self.task is None:
+            self.task = asyncio.ensure_future(self._produce())
+        index: int = 0
+        while True:
+            async with self.changed:
+                await self.changed.wait_for(lambda: index < len(self.chunks) or self.done)
+            while index < len(self.chunks):
+                yield self.chunks[index]
+                index += 1
+            if self.done:
+                if self.error:
+                    raise self.error
+                return
+
+
+@final
+class StreamSubscription:
+    """
+    A request's place in a shared stream, counted from when the request joins rather than from when its body starts,
+    so the stream isn't cancelled under requests that joined but haven't started iterating yet
+
+    The subscription is released when its iteration ends or when it's closed, whichever comes first,
+    so responses whose body never starts still release it by closing it once they finish
+
+    Methods:
+        close() -> None: Release the subscription, cancelling the stream if it was the last one
+        aclose() -> None: close for async cleanups
+    """
+    def __init__(self, shared_stream: _SharedStream) -> None:
+        shared_stream.join()
+        self._shared_stream: _SharedStream = shared_stream
+        self._released: bool = False
+
+    async def __aiter__(self) -> AsyncIterator[str]:
+        try:
+            async for chunk in self._shared_stream.iterate():
+                yield chunk
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        if self._released:
+            return
+        self._released = True
+        self._shared_stream.leave()
+
+    async def aclose(self) -> None:
+        self.close()
+
+
+# SINGLE FLIGHT
+@final
+class SingleFlight:
+    """
+    Coalesces identical concurrent requests, so they share one running call or stream instead of each running their own
+
+    Only requests that arrive while the first is still running are coalesced, finished results are not kept
+
+    Attributes:
+        started (int): The calls and streams that were started
+        joined (int): The requests that attached to one already running
+
+    Methods:
+        call(key: Hashable, start: Callable[[], Awaitable[Result]]) -> Result: Await the running call for the key, or start it
+        stream(key: Hashable, start: Callable[[], AsyncIterator[str]]) -> StreamSubscription: Subscribe to the running stream for the key, or start it
+        is_streaming(key: Hashable) -> bool: Whether a stream for the key is running to join
+        get_stats() -> SingleFlightStats: The running, started and joined counts
+    """
+    def __init__(self) -> None:
+        self.started: int = 0
+        self.joined: int = 0
+        self._calls: dict[Hashable, asyncio.Task] = {}
+        self._streams: dict[Hashable, _SharedStream] = {}
+
+    async def call(self, key: Hashable, start: Callable[[], Awaitable[Result]]) -> Result:
+        task: Optional[asyncio.Task] = self._calls.get(key)
+        if task is None:
+            self.started += 1
+            task = self._calls[key] = asyncio.ensure_future(start())
+            task.add_done_callback(lambda done_task: self._remove(self._calls, key, done_task))
+        else:
+            self.joined += 1
+            debug_print("Joining a running generation...", DebugLevels.INFO)
+        # Shielded so a caller disconnecting doesn't cancel the call for the others
+        return await asyncio.shield(task)
+
+    def stream(self, key: Hashable, start: Callable[[], AsyncIterator[str]]) -> StreamSubscription:
+        shared_stream: Optional[_SharedStream] = self._streams.get(key)
+        if shared_stream is None:
+            self.started += 1
+            shared_stream = self._streams[key] = _SharedStream(
+                start=start,
+                on_done=lambda done_stream: self._remove(self._streams, key, done_stream)
+            )
+        else:
+            self.joined += 1
+            debug_print("Joining a running stream...", DebugLevels.INFO)
+        return StreamSubscription(shared_stream)
+
+    def is_streaming(self, key: Hashable) -> bool:
+        return key in self._streams
+
+    @staticmethod
+    def _remove(flights: dict[Hashable, Any], key: Hashable, flight: Any) -> None:
+        if flights.get(key) is flight:
+            del flights[key]
+
+    def get_stats(self) -> SingleFlightStats:
+        return SingleFlightStats(
+            in_flight=len(self._calls) + len(self._streams),
+            started=self.started,
+            joined=self.joined
+        )
+
+
+# SHARED
+single_flight = SingleFlight()
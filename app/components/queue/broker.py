@@ -1,22 +1,37 @@
 # DEPENDENCIES
 ## Built-in
-from typing import Awaitable, Callable
+import asyncio
+from asyncio import Task
+from typing import Awaitable, Callable, Optional, Union
 ## Third-Party
 import nats
 from nats.aio.client import Client as NatsClient
 from nats.js.client import JetStreamContext
 from nats.aio.msg import Msg as NatsMsg
-from nats.errors import TimeoutError
+from nats.errors import ConnectionClosedError, TimeoutError
 from tenacity import retry, wait_exponential, retry_if_exception_type
 ## Local
+from constants.queue import BusKeys, BUSSES_DOWN, BUSSES_UP, ConsumerDefaults
 from constants.settings import DebugLevels
 from helpers import debug_print
 
 
 @retry(retry=retry_if_exception_type(ConnectionRefusedError), wait=wait_exponential(multiplier=1, max=10))
-async def connect(ip_address: str = "127.0.0.1") -> tuple[NatsClient, JetStreamContext]:
+async def connect(
+    ip_address: str = "127.0.0.1",
+    max_reconnect_attempts: int = 60,
+    disconnected_cb: Optional[Callable[[], Awaitable[None]]] = None,
+    reconnected_cb: Optional[Callable[[], Awaitable[None]]] = None,
+    closed_cb: Optional[Callable[[], Awaitable[None]]] = None
+) -> tuple[NatsClient, JetStreamContext]:
     print(f"Connecting to NATS Client on {ip_address}...")
-    nats_client: NatsClient = await nats.connect(f"nats://{ip_address}:4222")
+    nats_client: NatsClient = await nats.connect(
+        f"nats://{ip_address}:4222",
+        max_reconnect_attempts=max_reconnect_attempts,
+        disconnected_cb=disconnected_cb,
+        reconnected_cb=reconnected_cb,
+        closed_cb=closed_cb
+    )
     stream: JetStreamContext = nats_client.jetstream()
     print("Connected Successfully!")
     return nats_client, stream
@@ -35,22 +50,94 @@ async def establish_queues(stream: JetStreamContext, queues: frozenset[str]) ->
         debug_print(f"Established queue: {queue}...")
     print("Established all queues!")
 
-async def subscribe(stream: JetStreamContext, handler: Callable[[NatsMsg], Awaitable[None]], queue: str) -> None:
+def get_bus_queue(bus_direction: str, source_queue: str) -> str:
+    """
+    Resolve which queue a message from the source queue should be sent to on the bus
+
+    Arguments:
+        bus_direction (str): The direction of the bus, one of `constants.queue.BusKeys`
+        source_queue (str): The queue the message is being sent from
+
+    Returns:
+        str: The destination queue, or an empty string if the source queue cannot send in that direction
+    """
+    queue_mapping: dict[str, str] = BUSSES_DOWN if bus_direction == BusKeys.DOWN else BUSSES_UP
+    return queue_mapping.get(source_queue, "")
+
+async def _keep_in_progress(message: NatsMsg) -> None:
+    while True:
+        await asyncio.sleep(ConsumerDefaults.IN_PROGRESS_INTERVAL)
+        await message.in_progress()
+
+async def _handle_message(handler: Callable[[NatsMsg], Awaitable[None]], message: NatsMsg) -> None:
+    heartbeat: Task = asyncio.create_task(_keep_in_progress(message))
+    try:
+        await handler(message)
+        heartbeat.cancel()
+        await message.ack()
+    except Exception as error:
+        heartbeat.cancel()
+        debug_print(f"Handler failed on {message.subject}, redelivering: {error}...", DebugLevels.ERROR)
+        try:
+            await message.nak(delay=ConsumerDefaults.NAK_DELAY)
+        except Exception as nak_error:
+            debug_print(f"Unable to nak message on {message.subject}: {nak_error}...", DebugLevels.ERROR)
+
+async def subscribe(
+    stream: JetStreamContext,
+    handler: Callable[[NatsMsg], Awaitable[None]],
+    queue: str,
+    batch_size: int = ConsumerDefaults.BATCH_SIZE,
+    max_in_flight: int = ConsumerDefaults.MAX_IN_FLIGHT,
+    reconnect: Optional[Callable[[], Awaitable[JetStreamContext]]] = None
+) -> None:
+    """
+    Consume a queue in batches, running up to max_in_flight handlers at once.
+    Messages are acked once their handler returns, and nakked for redelivery if it raises.
+
+    Arguments:
+        stream (JetStreamContext): The stream to consume from
+        handler (Callable[[NatsMsg], Awaitable[None]]): The handler to run for each message
+        queue (str): The queue to consume
+        batch_size (int): The maximum number of messages to fetch at once
+        max_in_flight (int): The maximum number of handlers running at once
+        reconnect (Optional[Callable[[], Awaitable[JetStreamContext]]]): Returns a new stream when the connection is closed
+    """
     print(f"Subscribing to {queue}...")
-    sub = await stream.subscribe(queue, durable=queue)
+    sub: JetStreamContext.PullSubscription = await stream.pull_subscribe(queue, durable=queue)
     print(f"Subscribed to {queue}...")
+    in_flight: set[Task] = set()
     while True:
+        if len(in_flight) >= max_in_flight:
+            await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
         try:
-            message: NatsMsg = await sub.next_msg()
-            await handler(message)
+            messages: list[NatsMsg] = await sub.fetch(
+                batch=min(batch_size, max_in_flight - len(in_flight)),
+                timeout=ConsumerDefaults.FETCH_TIMEOUT
+            )
         except TimeoutError:
             continue
-        except ConnectionRefusedError:
-            _, stream = await connect()
+        except (ConnectionClosedError, ConnectionRefusedError) as error:
+            debug_print(f"Lost connection while consuming {queue}: {error}...", DebugLevels.WARNING)
+            stream = await reconnect() if reconnect else (await connect())[1]
+            sub = await stream.pull_subscribe(queue, durable=queue)
+            print(f"Resubscribed to {queue}...")
+            continue
+        debug_print(f"Fetched {len(messages)} messages from {queue}...", DebugLevels.DEBUG)
+        for message in messages:
+            task: Task = asyncio.create_task(_handle_message(handler, message))
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
 
-async def publish(stream: JetStreamContext, queue: str, message: str) -> None:
+async def publish(
+    stream: JetStreamContext,
+    queue: str,
+    message: Union[str, bytes],
+    headers: Optional[dict[str, str]] = None
+) -> None:
     print(f"Publishing {message} to {queue}...", DebugLevels.DEBUG)
-    ack = await stream.publish(queue, message.encode())
+    payload: bytes = message.encode() if isinstance(message, str) else message
+    ack = await stream.publish(queue, payload, headers=headers)
 
 async def request(nats_client: NatsClient, queue: str, message: str, timeout: float = 30) -> None:
     print(f"Requesting {message} from {queue}...", DebugLevels.DEBUG)
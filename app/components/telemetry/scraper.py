@@ -8,7 +8,7 @@ from typing import Callable, Optional
 ## Third-Party
 import httpx
 ## Local
-from components.model_provider.api import ModelPrompt, ModelResponse
+from components.model_provider.api import MemoryQuery, MemoryResponse, ModelPrompt, ModelResponse, ResourceQuery, ResourceResponse
 from constants.containers import ComponentPorts
 from constants.model_provider import LLMStackTypes
 from constants.telemetry import TelemetryKeys, TelemetrySystemPrompts, TelemetryTypes
@@ -31,6 +31,18 @@ async def _model_response(system_prompt: str) -> ModelResponse:
     response_validated = ModelResponse.model_validate_json(response)
     return response_validated
 
+async def _memory_response(context: str) -> MemoryResponse:
+    memory_query = MemoryQuery(context=context)
+    response: str = await get_api(api_port=ComponentPorts.MODEL_PROVIDER, endpoint="memory", payload=memory_query)
+    response_validated = MemoryResponse.model_validate_json(response)
+    return response_validated
+
+async def _resources_response(context: str) -> ResourceResponse:
+    resource_query = ResourceQuery(context=context)
+    response: str = await get_api(api_port=ComponentPorts.MODEL_PROVIDER, endpoint="resources", payload=resource_query)
+    response_validated = ResourceResponse.model_validate_json(response)
+    return response_validated
+
 
 class TelemetryTypesRef():
     """Enum"""
@@ -125,10 +137,30 @@ def _get_system_processes() -> str:
     return "system processes"
 
 def _get_resources(context: str) -> str:
-    return "resources"
+    try:
+        with futures.ThreadPoolExecutor() as executor:
+            event_loop = asyncio.new_event_loop()
+            future = executor.submit(lambda: event_loop.run_until_complete(_resources_response(context)))
+            response: ResourceResponse = future.result()
+    except Exception as error:
+        print(f"Resources error occurred: {error}")
+        return "Resources unavailable"
+    if not response.resources:
+        return "No relevant resources"
+    return "\n\n".join(response.resources)
 
 def _get_memory(context: str) -> str:
-    return "memory"
+    try:
+        with futures.ThreadPoolExecutor() as executor:
+            event_loop = asyncio.new_event_loop()
+            future = executor.submit(lambda: event_loop.run_until_complete(_memory_response(context)))
+            response: MemoryResponse = future.result()
+    except Exception as error:
+        print(f"Memory error occurred: {error}")
+        return "Memory unavailable"
+    if not response.memories:
+        return "No relevant memories"
+    return "\n".join(response.memories)
 
 def _get_visual() -> str:
     return "visual"
@@ -26,9 +26,22 @@ class LayerKeys(BaseEnum):
     BASE_INFORMATION: str = "base_information"
     CURRENT_ACE: str = "current_ace"
     MISSION: str = "ace_mission"
+    ROUTING_MODE: str = "routing_mode"
+    WIRE_CODEC: str = "wire_codec"
+    COALESCING: str = "coalescing"
+    WINDOW_MS: str = "window_ms"
+    MAX_MESSAGES: str = "max_messages"
+    MESSAGE_STORE: str = "message_store"
+    MAX_HEADING_ITEMS: str = "max_heading_items"
+    MAX_ITEMS: str = "max_items"
+    EVICTION_POLICY: str = "eviction_policy"
+    HEADING_PRIORITIES: str = "heading_priorities"
+    SPECULATION: str = "speculation"
+    SAMPLES: str = "samples"
 
     # Prompt Files
     BASE_PROMPT: str = "base_prompt"
+    OUTPUT_TEMPLATE: str = "output_template"
 
     # State
     FIRST_RUN: str = "first_run"
@@ -37,6 +50,15 @@ class LayerKeys(BaseEnum):
     DEFAULT_GUIDANCE: str = "default_guidance"
     HAS_DATA: str = "has_data"
     DEFAULT_DATA: str = "default_data"
+    STREAM: str = "stream"
+    INBOX: str = "inbox"
+    WORKER: str = "worker"
+    COALESCE_WINDOW: str = "coalesce_window"
+    COALESCE_MAX_MESSAGES: str = "coalesce_max_messages"
+    GUIDANCE_STORE: str = "guidance_store"
+    DATA_STORE: str = "data_store"
+    TOKEN_BUDGET: str = "token_budget"
+    SPECULATIVE_SAMPLES: str = "speculative_samples"
 
     # Message Types
     COMMANDS: str = "commands"
@@ -48,6 +70,36 @@ class LayerKeys(BaseEnum):
     # Sub Message Types
     ACTIONS: str = "actions"
 
+# The layer attributes prompts can use as variables, runtime state like streams and stores stays out of them
+PROMPT_VARIABLES: tuple[str, ...] = (
+    LayerKeys.NAME,
+    LayerKeys.TYPE,
+    LayerKeys.BASE_PROMPT,
+    LayerKeys.GUIDANCE,
+    LayerKeys.DATA,
+    LayerKeys.TELEMETRY,
+    LayerKeys.FIRST_RUN,
+    LayerKeys.PROCESSING,
+    LayerKeys.MAX_RETRIES,
+    LayerKeys.DEFAULT_GUIDANCE,
+    LayerKeys.HAS_DATA,
+    LayerKeys.DEFAULT_DATA
+)
+
+class LayerDefaults(BaseEnum):
+    """Enum"""
+    INBOX_SIZE: int = 64
+    COALESCE_WINDOW: int = 500 # Milliseconds
+    COALESCE_MAX_MESSAGES: int = 16
+    MAX_HEADING_ITEMS: int = 32
+    MAX_ITEMS: int = 128
+    SPECULATIVE_SAMPLES: int = 1
+
+class EvictionPolicies(BaseEnum):
+    """Enum"""
+    OLDEST: str = "oldest"
+    PRIORITY: str = "priority"
+
 class LayerPaths(BaseEnum):
     """Enum"""
     CONFIG: str = f"{VolumePaths.HOST_LAYERS}/.config"
@@ -16,6 +16,18 @@ class LLMKeys(BaseEnum):
     # Config
     BASE_INFORMATION: str = "base_information"
     CURRENT_MAPPING: str = "current_mapping"
+    CONCURRENCY: str = "concurrency"
+    MAX_WAITING: str = "max_waiting"
+    RESPONSE_CACHE: str = "response_cache"
+    MAX_ENTRIES: str = "max_entries"
+    TTL: str = "ttl"
+    CACHE_SAMPLED: str = "cache_sampled"
+    PERSIST: str = "persist"
+    MODEL_CACHE: str = "model_cache"
+    MAX_MEMORY_MB: str = "max_memory_mb"
+    MAX_MODELS: str = "max_models"
+    IDLE_TIMEOUT: str = "idle_timeout"
+    EMBEDDING_CACHE: str = "embedding_cache"
 
     # Provider Details
     API_KEY: str = "api_key"
@@ -24,10 +36,19 @@ class LLMKeys(BaseEnum):
     TEMPERATURE: str = "temperature"
     RATE_LIMIT: str = "rate_limit"
     LOW_VRAM: str = "low_vram"
+    CLIENT: str = "client"
+    BATCH_SIZE: str = "batch_size"
+    THREADS: str = "threads"
 
 class ModelProviderPaths(BaseEnum):
     """Enum"""
     CONFIG: str = f"{VolumePaths.HOST_MODEL_PROVIDER}/.config"
+    CACHE: str = f"{VolumePaths.HOST_MODEL_PROVIDER}/cache"
+    RESPONSE_CACHE: str = f"{CACHE}/responses.json"
+    EMBEDDING_CACHE: str = f"{CACHE}/embeddings"
+    MEMORY: str = f"{VolumePaths.HOST_MODEL_PROVIDER}/memory"
+    MEMORIES: str = f"{MEMORY}/memories.jsonl"
+    RESOURCES: str = VolumePaths.HOST_OUTPUT
 
 class LLMStackTypes(BaseEnum):
     """Enum"""
@@ -44,6 +65,104 @@ class ModelTypes(BaseEnum):
     EMBEDDER: str = "embedder"
     RERANKER: str = "reranker"
 
+class OllamaAPI(BaseEnum):
+    """Enum"""
+    HOST_VARIABLE: str = "OLLAMA_HOST"
+    DEFAULT_HOST: str = "http://127.0.0.1:11434"
+    CHAT: str = "/api/chat"
+
+class ResponseFormats(BaseEnum):
+    """Enum"""
+    TEXT: str = "text"
+    JSON: str = "json"
+
+class ModelProviderHeaders(BaseEnum):
+    """Enum"""
+    RESPONSE_FORMAT: str = "Ace-Response-Format"
+    QUEUE_WAIT: str = "Ace-Queue-Wait-Ms"
+    EMBEDDING_COUNT: str = "Ace-Embedding-Count"
+    EMBEDDING_DIMENSIONS: str = "Ace-Embedding-Dimensions"
+
+class EmbeddingEncodings(BaseEnum):
+    """Enum"""
+    BASE64: str = "base64" # JSON with the float32 matrix in base64
+    BINARY: str = "binary" # The raw float32 matrix
+
+class HTTPPoolDefaults(BaseEnum):
+    """Enum"""
+    MAX_CONNECTIONS: int = 32
+    MAX_KEEPALIVE_CONNECTIONS: int = 16
+    KEEPALIVE_EXPIRY: int = 120 # Seconds
+
+class GenerationDefaults(BaseEnum):
+    """Enum"""
+    MAX_RUNNING: int = 2
+    MAX_WAITING: int = 16
+
+class ResponseCacheDefaults(BaseEnum):
+    """Enum"""
+    MAX_ENTRIES: int = 1024
+    TTL: int = 3600 # Seconds
+    PERSIST_EVERY: int = 32 # New responses between saves
+
+class ModelCacheDefaults(BaseEnum):
+    """Enum"""
+    MAX_MEMORY_MB: int = 4096
+    MAX_MODELS: int = 4
+    IDLE_TIMEOUT: int = 900 # Seconds
+    SWEEP_INTERVAL: int = 30 # Seconds
+
+class RerankerDefaults(BaseEnum):
+    """Enum"""
+    RAGATOUILLE_TOP_K: int = 10
+    CROSS_ENCODER_TOP_K: int = 3
+    MAX_CACHED_SCORES: int = 16384
+    CASCADE_CANDIDATES: int = 32 # Documents kept by embedding similarity for the reranker to score
+    CASCADE_TOP_K: int = 5
+
+class EmbeddingCacheDefaults(BaseEnum):
+    """Enum"""
+    MAX_ENTRIES: int = 200000
+    COMPACT_SLACK_PERCENT: int = 25 # Rows allowed over max_entries before compacting
+
+class MemoryDefaults(BaseEnum):
+    """Enum"""
+    TOP_K: int = 5
+    CANDIDATES: int = 32 # Vector search hits passed to the reranker
+    IVF_THRESHOLD: int = 20000
+    IVF_PROBES: int = 16
+    KMEANS_ITERATIONS: int = 8
+    KMEANS_SAMPLES_PER_LIST: int = 32
+    ASSIGN_CHUNK_ROWS: int = 8192
+    GROWTH_PERCENT: int = 150
+
+class MicroBatchDefaults(BaseEnum):
+    """Enum"""
+    WINDOW_MS: int = 5
+    MAX_BATCH: int = 64
+
+class ResourceDefaults(BaseEnum):
+    """Enum"""
+    TOP_K: int = 5
+    CANDIDATES: int = 32 # Hits taken from each of the lexical and vector searches
+    FUSED_CANDIDATES: int = 16 # Fused hits passed to the reranker
+    RRF_K: int = 60
+    PASSAGE_CHARACTERS: int = 1200
+    MAX_FILE_BYTES: int = 1048576
+    DEBOUNCE_MS: int = 500
+    SEARCH_THREADS: int = 4
+    REBUILD_DEAD_PERCENT: int = 50 # Share of removed passages at which the vector index is rebuilt
+
+RESOURCE_EXTENSIONS: tuple[str, ...] = (
+    ".txt", ".md", ".rst", ".log", ".csv", ".json", ".jsonl", ".toml", ".yaml", ".yml", ".ini", ".cfg", ".xml", ".html",
+    ".py", ".js", ".ts", ".sh", ".c", ".h", ".cpp", ".rs", ".go", ".java"
+)
+
+class EmbedderDefaults(BaseEnum):
+    """Enum"""
+    BATCH_SIZE: int = 64
+    THREADS: int = 0 # Let ONNX Runtime decide
+
 
 # PROVIDERS
 class Providers(BaseEnum):
@@ -38,3 +38,8 @@ class PromptFilePaths(BaseEnum):
     RESPONSE_FORMAT: str = f"{_RESPONSE_SCHEMAS}/response_format"
     EXTRA_RULES: str = f"{_RESPONSE_SCHEMAS}/extra_rules"
     SCHEMAS: str = f"{_RESPONSE_SCHEMAS}/schemas"
+
+class TokenBudgetDefaults(BaseEnum):
+    """Enum"""
+    MAX_PROMPT_TOKENS: int = 4000
+    CHARS_PER_TOKEN: int = 4
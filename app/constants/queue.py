@@ -47,3 +47,45 @@ BUSSES_UP: dict[str, str] = {
     Queues.AGENT_MODEL: Queues.GLOBAL_STRATEGY,
     Queues.GLOBAL_STRATEGY: Queues.ASPIRATIONAL,
 }
+
+class RoutingModes(BaseEnum):
+    """Enum"""
+    CONTROLLER: str = "controller"
+    DIRECT: str = "direct"
+
+
+# WIRE FORMAT
+class WireCodecs(BaseEnum):
+    """Enum"""
+    JSON: str = "json"
+    MSGPACK: str = "msgpack"
+
+class BusHeaders(BaseEnum):
+    """Enum"""
+    CODEC: str = "Ace-Codec"
+
+
+# PUBLISHING
+class PublisherDefaults(BaseEnum):
+    """Enum"""
+    MAX_PENDING: int = 1024
+    MAX_BATCH: int = 64
+    MAX_RETRIES: int = 5
+    RETRY_WAIT: int = 1 # Seconds
+    SHUTDOWN_TIMEOUT: int = 5 # Seconds
+
+
+# CONSUMING
+class ConsumerDefaults(BaseEnum):
+    """Enum"""
+    BATCH_SIZE: int = 10
+    MAX_IN_FLIGHT: int = 4
+    FETCH_TIMEOUT: int = 5 # Seconds
+    IN_PROGRESS_INTERVAL: int = 10 # Seconds
+    NAK_DELAY: int = 2 # Seconds
+
+class ConsumerKeys(BaseEnum):
+    """Enum"""
+    CONSUMERS: str = "consumers"
+    BATCH_SIZE: str = "batch_size"
+    MAX_IN_FLIGHT: str = "max_in_flight"
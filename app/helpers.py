@@ -1,10 +1,11 @@
 # DEPENDENCIES
 ## Built-in
+import codecs
 import subprocess
 from subprocess import Popen
 import sys
 from time import time
-from typing import Any, IO, Optional
+from typing import Any, AsyncIterator, IO, Optional
 ## Third-Party
 import aiohttp
 import httpx
@@ -146,6 +147,42 @@ async def post_api(api_port: str, endpoint: str, payload: BaseModel) -> str:
             print("Body:", html, "...")
             return html
 
+async def stream_api(
+    api_port: str,
+    endpoint: str,
+    payload: BaseModel,
+    response_headers: Optional[dict[str, str]] = None
+) -> AsyncIterator[str]:
+    """
+    Sends a POST request to the specified API endpoint with the provided payload and yields the response text as it streams in.
+    Closing the iterator early closes the connection
+
+    Arguments:
+        api_port (str): The API port to send the request to
+        endpoint (str): The API endpoint to send the request to
+        payload (BaseModel): The payload to send in the request
+        response_headers (Optional[dict[str, str]]): Filled with the response headers before the first chunk is yielded
+
+    Yields:
+        str: The next chunk of response text
+    """
+    if api_port not in ComponentPorts.get_frozen_values():
+        raise ValueError(f"Invalid API Port: {api_port}")
+    async with aiohttp.ClientSession() as session:
+        async with session.post(
+            url=f"http://127.0.0.1:{api_port}{APIRoutes.VONE}/{endpoint}",
+            data=payload.model_dump_json(),
+            headers={'Content-Type': 'application/json'}
+        ) as response:
+            response.raise_for_status()
+            if response_headers is not None:
+                response_headers.update(response.headers)
+            decoder = codecs.getincrementaldecoder("utf-8")()
+            async for chunk in response.content.iter_any():
+                text: str = decoder.decode(chunk)
+                if text:
+                    yield text
+
 def check_internet_access() -> bool:
     """
     Check if the device has internet access